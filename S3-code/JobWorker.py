@@ -6,10 +6,21 @@ import time
 import shutil
 import signal
 import sys
+import math
+import uuid
+import socket
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 # --- Configuration (Must be set via environment variables on EC2) ---
 # Ensure these variables are correctly injected via the User Data script (Bash)
 SQS_QUEUE_URL = os.environ.get('SQS_QUEUE_URL') 
+# Scheduling lanes: JSON {"priority": url, "standard": url, "bulk": url} (the segmentation service's
+# TRANSCODING_JOB_QUEUE_URLS), pulled by weighted round-robin. Without it only SQS_QUEUE_URL is polled.
+JOB_QUEUE_LANES = json.loads(os.environ.get('SQS_QUEUE_URLS') or '{}') or ({'standard': SQS_QUEUE_URL} if SQS_QUEUE_URL else {})
+LANE_WEIGHTS = json.loads(os.environ.get('LANE_WEIGHTS') or '{"priority": 6, "standard": 3, "bulk": 1}')
+IDLE_WAIT_SECONDS = 20 # An idle worker long-polls the lanes in rotation, sharing this wait between them
 DYNAMODB_TABLE_NAME = os.environ.get('DYNAMODB_TABLE_NAME')
 PROCESSED_S3_BUCKET = os.environ.get('PROCESSED_S3_BUCKET')
 CLOUDFRONT_DOMAIN = os.environ.get('CLOUDFRONT_DOMAIN')
@@ -17,6 +28,7 @@ RAW_S3_BUCKET = os.environ.get('RAW_S3_BUCKET')
 FINALIZER_SQS_URL = os.environ.get('FINALIZER_SQS_URL')
 AWS_REGION = os.environ.get('AWS_REGION', 'eu-north-1') 
 FFMPEG_BIN = '/usr/local/bin/ffmpeg'
+FFPROBE_BIN = '/usr/local/bin/ffprobe'
 
 # Define the Master Bitrate Ladder
 MASTER_BITRATE_LADDER = {
@@ -26,12 +38,36 @@ MASTER_BITRATE_LADDER = {
     '360p':  {'height': 360,  'vbr': '600k',  'abr': '64k'}
 }
 
+# Pipeline tracing (span lines on stdout, see the DUPLICATE section below)
+TRACE_SPANS = os.environ.get('TRACE_SPANS', 'true').lower() == 'true'
+TRACE_METRICS_NAMESPACE = os.environ.get('TRACE_METRICS_NAMESPACE', 'MovieVerse/Pipeline')
+
+# Fleet scaling signal: estimated queue drain time, published every METRICS_INTERVAL_SEC to CloudWatch
+# (target-tracking metric, see ops/worker_scaling_policy.py) and served on http://<host>:METRICS_PORT/metrics
+WORKER_METRICS_NAMESPACE = os.environ.get('WORKER_METRICS_NAMESPACE', 'MovieVerse/Transcoding')
+METRICS_INTERVAL_SEC = int(os.environ.get('METRICS_INTERVAL_SEC', '60'))
+METRICS_PORT = int(os.environ.get('METRICS_PORT', '9102')) # 0 disables the HTTP endpoint
+AUTOSCALING_GROUP_NAME = os.environ.get('AUTOSCALING_GROUP_NAME') # Fleet size = the group's InService instances
+WORKER_FLEET_SIZE = int(os.environ.get('WORKER_FLEET_SIZE', '1')) # Fleet size when not in an Auto Scaling group
+WORKER_ID = os.environ.get('WORKER_ID') or socket.gethostname()
+DEFAULT_CHUNK_SECONDS = float(os.environ.get('DEFAULT_CHUNK_SECONDS', '120')) # Estimate until this worker has timed chunks
+CHUNK_SAMPLE_WINDOW = 50 # Recent chunk durations the estimate is based on
+JOBS_PER_WORKER = 1 # main() processes one message at a time
+
+# Trick-play thumbnails (one sprite sheet + WebVTT track per chunk)
+THUMBNAIL_INTERVAL_SEC = 2
+THUMBNAIL_WIDTH = 160
+THUMBNAIL_HEIGHT = 90
+SPRITE_COLUMNS = 5
+
 # --- Global Clients (Explicitly pass region and handle startup failure) ---
 try:
     SQS = boto3.client('sqs', region_name=AWS_REGION)
     S3 = boto3.client('s3', region_name=AWS_REGION)
     DYNAMODB = boto3.resource('dynamodb', region_name=AWS_REGION)
     FINALIZER_SQS = boto3.client('sqs', region_name=AWS_REGION)
+    CLOUDWATCH = boto3.client('cloudwatch', region_name=AWS_REGION)
+    AUTOSCALING = boto3.client('autoscaling', region_name=AWS_REGION) if AUTOSCALING_GROUP_NAME else None
 except Exception as e:
     print(f"FATAL BOTO3 CLIENT ERROR during startup in region {AWS_REGION}: {e}")
     sys.stdout.flush()
@@ -40,6 +76,359 @@ except Exception as e:
 # Global flag to handle graceful exit signals
 RECEIVED_SIGNAL = False
 
+# --- DUPLICATE of backend/common/tracing.py (this worker is deployed as a single file) ---
+# Span lines are also CloudWatch EMF documents (SpanDuration by Stage/Span); ops/trace_report.py aggregates them.
+
+def extract_trace(message):
+    """Trace context of a received message body (keyed by VideoID when the sender did not trace)."""
+    trace = message.get('Trace') or {}
+    return {
+        'TraceID': trace.get('TraceID') or message.get('VideoID'),
+        'ParentSpanID': trace.get('ParentSpanID'),
+        'SentAt': trace.get('SentAt')
+    }
+
+def inject_trace(message, context):
+    """Stamps the context and the send time into a message body."""
+    message['Trace'] = {'TraceID': context['TraceID'], 'ParentSpanID': context.get('ParentSpanID'), 'SentAt': time.time()}
+    return message
+
+def write_span(record):
+    print(json.dumps(record, default=str))
+    sys.stdout.flush()
+
+def emit_span(name, context, start, end, span_id=None, error=None, **attributes):
+    """Writes a finished span. start/end are epoch seconds."""
+    if not TRACE_SPANS or not context.get('TraceID'):
+        return
+    record = {
+        '_aws': {
+            'Timestamp': int(end * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': TRACE_METRICS_NAMESPACE,
+                'Dimensions': [['Stage', 'Span']],
+                'Metrics': [{'Name': 'SpanDuration', 'Unit': 'Milliseconds'}]
+            }]
+        },
+        'Stage': name.split('.', 1)[0],
+        'Span': name,
+        'SpanDuration': round((end - start) * 1000, 3),
+        'TraceID': context['TraceID'],
+        'SpanID': span_id or uuid.uuid4().hex[:16],
+        'ParentSpanID': context.get('ParentSpanID'),
+        'Start': round(start, 6),
+        'End': round(end, 6)
+    }
+    if error:
+        record['Error'] = error
+    if attributes:
+        record['Attributes'] = attributes
+    write_span(record)
+
+def record_queue_wait(stage, context, **attributes):
+    """Emits '<stage>.queue_wait' from the sender's SentAt to now."""
+    if context.get('SentAt'):
+        emit_span(f"{stage}.queue_wait", context, float(context['SentAt']), time.time(), **attributes)
+
+class Span:
+    """Context manager timing one unit of work; exceptions are recorded on the span and re-raised."""
+
+    def __init__(self, name, context, **attributes):
+        self.name = name
+        self.parent = context
+        self.attributes = attributes
+        self.span_id = uuid.uuid4().hex[:16]
+        self.start = None
+        self.error = None
+
+    @property
+    def context(self):
+        return {'TraceID': self.parent['TraceID'], 'ParentSpanID': self.span_id}
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, error):
+        self.error = str(error)
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        error = f"{exc_type.__name__}: {exc}" if exc_type else self.error
+        emit_span(self.name, self.parent, self.start, time.time(), span_id=self.span_id, error=error, **self.attributes)
+        return False
+# ------------------------------------------------------------------------------------------------
+
+# --- Fleet Scaling Signal ---
+
+class WorkerStats:
+    """This worker's job timings, shared by the polling loop, the metrics thread and the HTTP endpoint."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.chunk_seconds = deque(maxlen=CHUNK_SAMPLE_WINDOW) # Wall time of recent successful chunk jobs
+        self.in_flight = {} # job key -> start time
+        self.completed = 0
+        self.failed = 0
+        self.signal = {} # Last computed scaling signal (queue attributes + estimate)
+
+    def job_started(self, key):
+        with self.lock:
+            self.in_flight[key] = time.time()
+
+    def job_finished(self, key, succeeded):
+        with self.lock:
+            started = self.in_flight.pop(key, None)
+            if succeeded:
+                self.completed += 1
+                if started is not None:
+                    self.chunk_seconds.append(time.time() - started)
+            else:
+                self.failed += 1
+
+    def chunk_estimate(self):
+        """Mean recent chunk job time (seconds): what one more queued chunk costs this fleet."""
+        with self.lock:
+            samples = list(self.chunk_seconds)
+        return sum(samples) / len(samples) if samples else DEFAULT_CHUNK_SECONDS
+
+    def snapshot(self):
+        with self.lock:
+            samples = sorted(self.chunk_seconds)
+            return {
+                'in_flight': len(self.in_flight),
+                'completed': self.completed,
+                'failed': self.failed,
+                'chunk_samples': len(samples),
+                'chunk_p50': round(samples[len(samples) // 2], 3) if samples else None,
+                'chunk_p95': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3) if samples else None,
+                'signal': dict(self.signal)
+            }
+
+WORKER_STATS = WorkerStats()
+
+def get_fleet_size():
+    """InService instances of the worker's Auto Scaling group (WORKER_FLEET_SIZE outside a group)."""
+    if not AUTOSCALING:
+        return max(1, WORKER_FLEET_SIZE)
+    groups = AUTOSCALING.describe_auto_scaling_groups(AutoScalingGroupNames=[AUTOSCALING_GROUP_NAME])['AutoScalingGroups']
+    instances = groups[0]['Instances'] if groups else []
+    return max(1, sum(1 for i in instances if i.get('LifecycleState') == 'InService'))
+
+def compute_scaling_signal(visible, not_visible, fleet_size, chunk_seconds):
+    """
+    Estimated seconds for the current fleet to drain the job queue. Waiting chunks cost a full chunk time,
+    in-flight (not visible) ones about half of one. Doubling the fleet halves it, which is what a
+    target-tracking policy needs.
+    """
+    remaining_work_sec = (visible + 0.5 * not_visible) * chunk_seconds
+    return {
+        'visible': visible,
+        'not_visible': not_visible,
+        'fleet_size': fleet_size,
+        'chunk_seconds': round(chunk_seconds, 3),
+        'backlog_per_instance': round((visible + not_visible) / fleet_size, 3),
+        'estimated_drain_seconds': round(remaining_work_sec / (fleet_size * JOBS_PER_WORKER), 3),
+        'computed_at': time.time()
+    }
+
+def collect_scaling_signal():
+    """Scaling signal over every lane's queue (the whole backlog is the fleet's work)."""
+    lanes = {}
+    for lane, queue_url in JOB_QUEUE_LANES.items():
+        attributes = SQS.get_queue_attributes(
+            QueueUrl=queue_url,
+            AttributeNames=['ApproximateNumberOfMessages', 'ApproximateNumberOfMessagesNotVisible']
+        )['Attributes']
+        lanes[lane] = {'visible': int(attributes.get('ApproximateNumberOfMessages', 0)),
+                       'not_visible': int(attributes.get('ApproximateNumberOfMessagesNotVisible', 0))}
+    signal_data = compute_scaling_signal(
+        sum(l['visible'] for l in lanes.values()),
+        sum(l['not_visible'] for l in lanes.values()),
+        get_fleet_size(),
+        WORKER_STATS.chunk_estimate()
+    )
+    signal_data['lanes'] = lanes
+    with WORKER_STATS.lock:
+        WORKER_STATS.signal = signal_data
+    return signal_data
+
+def publish_scaling_signal(signal_data):
+    """
+    Fleet metrics carry the Auto Scaling group (or queue) dimension; every worker publishes the same
+    estimate, so the policy's Average statistic is the fleet value. Per-worker metrics carry WorkerID.
+    """
+    fleet_dimension = ([{'Name': 'AutoScalingGroupName', 'Value': AUTOSCALING_GROUP_NAME}] if AUTOSCALING_GROUP_NAME
+                       else [{'Name': 'QueueName', 'Value': next(iter(JOB_QUEUE_LANES.values())).rstrip('/').rsplit('/', 1)[-1]}])
+    worker_dimension = [{'Name': 'WorkerID', 'Value': WORKER_ID}]
+    stats = WORKER_STATS.snapshot()
+    CLOUDWATCH.put_metric_data(Namespace=WORKER_METRICS_NAMESPACE, MetricData=[
+        {'MetricName': 'EstimatedDrainSeconds', 'Dimensions': fleet_dimension,
+         'Value': signal_data['estimated_drain_seconds'], 'Unit': 'Seconds'},
+        {'MetricName': 'BacklogPerInstance', 'Dimensions': fleet_dimension,
+         'Value': signal_data['backlog_per_instance'], 'Unit': 'Count'},
+        {'MetricName': 'InFlightJobs', 'Dimensions': worker_dimension, 'Value': stats['in_flight'], 'Unit': 'Count'},
+        {'MetricName': 'ChunkSeconds', 'Dimensions': worker_dimension, 'Value': signal_data['chunk_seconds'], 'Unit': 'Seconds'},
+    ])
+
+def metrics_reporter():
+    """Metrics thread: recomputes and publishes the scaling signal every METRICS_INTERVAL_SEC."""
+    while not RECEIVED_SIGNAL:
+        try:
+            signal_data = collect_scaling_signal()
+            publish_scaling_signal(signal_data)
+            print(f"Scaling signal: {signal_data['visible']} queued, {signal_data['not_visible']} in flight, "
+                  f"{signal_data['fleet_size']} worker(s), {signal_data['chunk_seconds']:.1f}s/chunk -> "
+                  f"drain {signal_data['estimated_drain_seconds']:.0f}s")
+        except Exception as e:
+            # Non-fatal: scaling falls back to the last published datapoints
+            print(f"WARNING: Could not publish the scaling signal: {e}")
+        time.sleep(METRICS_INTERVAL_SEC)
+
+def render_prometheus():
+    """Prometheus text format of the worker stats and the last scaling signal."""
+    stats = WORKER_STATS.snapshot()
+    signal_data = stats['signal']
+    lines = []
+
+    def metric(name, kind, value, labels=''):
+        if value is None:
+            return
+        if not any(l.startswith(f"# TYPE {name} ") for l in lines):
+            lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name}{labels} {value}")
+
+    metric('jobworker_in_flight_jobs', 'gauge', stats['in_flight'])
+    metric('jobworker_jobs_completed_total', 'counter', stats['completed'])
+    metric('jobworker_jobs_failed_total', 'counter', stats['failed'])
+    metric('jobworker_chunk_seconds', 'summary', stats['chunk_p50'], '{quantile="0.5"}')
+    metric('jobworker_chunk_seconds', 'summary', stats['chunk_p95'], '{quantile="0.95"}')
+    for lane, depth in signal_data.get('lanes', {}).items():
+        metric('jobworker_queue_visible_messages', 'gauge', depth['visible'], f'{{lane="{lane}"}}')
+        metric('jobworker_queue_not_visible_messages', 'gauge', depth['not_visible'], f'{{lane="{lane}"}}')
+    metric('jobworker_fleet_size', 'gauge', signal_data.get('fleet_size'))
+    metric('jobworker_backlog_per_instance', 'gauge', signal_data.get('backlog_per_instance'))
+    metric('jobworker_estimated_drain_seconds', 'gauge', signal_data.get('estimated_drain_seconds'))
+    return '\n'.join(lines) + '\n'
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """GET /metrics (Prometheus text) and /healthz (JSON snapshot)."""
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            body, content_type = render_prometheus().encode('utf-8'), 'text/plain; version=0.0.4'
+        elif self.path == '/healthz':
+            body, content_type = json.dumps(dict(WORKER_STATS.snapshot(), worker=WORKER_ID)).encode('utf-8'), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Scrapes would flood the worker log
+
+def start_metrics():
+    """Starts the metrics thread and, unless METRICS_PORT is 0, the HTTP endpoint (both daemon threads)."""
+    threading.Thread(target=metrics_reporter, name='metrics-reporter', daemon=True).start()
+    if METRICS_PORT:
+        server = ThreadingHTTPServer(('0.0.0.0', METRICS_PORT), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+        print(f"Metrics endpoint listening on :{METRICS_PORT}/metrics")
+
+# --- Lane Scheduling ---
+
+class LaneScheduler:
+    """
+    Smooth weighted round-robin over the lanes: with weights 6/3/1, every 10 turns pick priority 6 times,
+    standard 3 times and bulk once, interleaved. An empty lane passes its turn on to the others, so
+    capacity is never left idle while any lane has work.
+    """
+
+    def __init__(self, lanes, weights):
+        self.lanes = list(lanes)
+        self.weights = {lane: max(1, int(weights.get(lane, 1))) for lane in self.lanes}
+        self.credit = {lane: 0 for lane in self.lanes}
+        self.next_idle = 0
+        self.lock = threading.Lock()
+
+    def order(self):
+        """Lanes to try this turn: the round-robin pick, then the rest by weight."""
+        with self.lock:
+            for lane in self.lanes:
+                self.credit[lane] += self.weights[lane]
+            pick = max(self.lanes, key=lambda lane: self.credit[lane])
+            self.credit[pick] -= sum(self.weights.values())
+        return [pick] + sorted((lane for lane in self.lanes if lane != pick), key=lambda lane: -self.weights[lane])
+
+    def idle_lane(self):
+        """The lane to long-poll next while idle: every lane in turn, so none waits on the others' polls."""
+        with self.lock:
+            lane = self.lanes[self.next_idle % len(self.lanes)]
+            self.next_idle += 1
+        return lane
+
+LANE_SCHEDULER = LaneScheduler(JOB_QUEUE_LANES, LANE_WEIGHTS)
+
+def receive_from_lane(lane, wait_seconds):
+    response = SQS.receive_message(
+        QueueUrl=JOB_QUEUE_LANES[lane],
+        MaxNumberOfMessages=1,
+        WaitTimeSeconds=wait_seconds,
+        VisibilityTimeout=1800
+    )
+    return response['Messages'][0] if response.get('Messages') else None
+
+POLL_STATE = threading.local() # Per polling thread: did the last receive find a job?
+
+def receive_job(wait_seconds=IDLE_WAIT_SECONDS):
+    """
+    Next job as (lane, message), or None.
+    While jobs keep coming, the lanes are short-polled in scheduler order. Once a receive came back
+    empty, the worker is idle: each call long-polls one lane, in rotation, for an equal share of
+    wait_seconds. Every lane is then long-polled (which, unlike a short poll, cannot miss a lone
+    message on a standard queue) with one ReceiveMessage call per lane per wait_seconds.
+    """
+    if getattr(POLL_STATE, 'busy', True):
+        for lane in LANE_SCHEDULER.order():
+            message = receive_from_lane(lane, 0)
+            if message:
+                return lane, message
+        POLL_STATE.busy = False
+        return None
+
+    lane = LANE_SCHEDULER.idle_lane()
+    lane_wait = max(1, round(wait_seconds / len(LANE_SCHEDULER.lanes))) if wait_seconds else 0
+    message = receive_from_lane(lane, lane_wait)
+    if message:
+        POLL_STATE.busy = True
+        return lane, message
+    return None
+
+def poll_once(wait_seconds=IDLE_WAIT_SECONDS):
+    """Receives and runs at most one job. Returns its job data, or None when every lane was empty."""
+    job = receive_job(wait_seconds)
+    if not job:
+        return None
+    lane, message = job
+    job_data = json.loads(message['Body'])
+    job_data.setdefault('Lane', lane)
+
+    if transcode_video(job_data):
+        # DELETE message ONLY after successful processing
+        SQS.delete_message(
+            QueueUrl=JOB_QUEUE_LANES[lane],
+            ReceiptHandle=message['ReceiptHandle']
+        )
+        print(f"Job successfully completed and message deleted ({lane} lane).")
+    # If transcode_video returns False, the job message remains for retry.
+    return job_data
+
 # --- Helper Functions ---
 def update_dynamo_status(video_id, status, cdn_path=None):
     """Updates the video status in the DynamoDB table."""
@@ -63,7 +452,197 @@ def update_dynamo_status(video_id, status, cdn_path=None):
         # CRITICAL DEBUG: If DynamoDB fails, log the full error
         print(f"ERROR: Failed to update DynamoDB for {video_id}. Full Error: {e}")
 
+def get_codec_string(stream):
+    """Builds the RFC 6381 codec string (e.g. avc1.64001f, mp4a.40.2) for an ffprobe stream."""
+    codec_name = stream.get('codec_name')
+
+    if codec_name == 'h264':
+        # avc1.PPCCLL -> profile_idc, constraint flags, level_idc (hex)
+        profile_map = {
+            'Constrained Baseline': '42E0',
+            'Baseline': '4200',
+            'Main': '4D40',
+            'High': '6400'
+        }
+        profile = profile_map.get(stream.get('profile'), '6400')
+        level = int(stream.get('level', 31))
+        return f"avc1.{profile}{level:02X}".lower()
+
+    if codec_name == 'aac':
+        # HE-AAC is object type 5, everything else we encode is AAC-LC (2)
+        return 'mp4a.40.5' if stream.get('profile') == 'HE-AAC' else 'mp4a.40.2'
+
+    return None
+
+def probe_rendition(segment_path):
+    """
+    Runs ffprobe on an encoded segment and returns the real output resolution and codecs.
+    The Finalizer uses this to write RESOLUTION and CODECS into the master manifest.
+    """
+    cmd = [
+        FFPROBE_BIN,
+        '-v', 'error',
+        '-print_format', 'json',
+        '-show_streams',
+        segment_path
+    ]
+    result = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    streams = json.loads(result.stdout).get('streams', [])
+
+    video_stream = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    codecs = [c for c in (get_codec_string(s) for s in streams) if c]
+
+    return {
+        'Resolution': f"{video_stream['width']}x{video_stream['height']}" if video_stream else None,
+        'Codecs': ','.join(codecs)
+    }
+
+def read_chunk_playlist(manifest_path):
+    """Returns the (segment file, duration) list of a chunk manifest written by FFmpeg."""
+    segments = []
+    duration = None
+    with open(manifest_path) as f:
+        for line in f.read().splitlines():
+            if line.startswith('#EXTINF:'):
+                duration = float(line[len('#EXTINF:'):].split(',')[0])
+            elif line.endswith('.ts'):
+                segments.append((line, duration))
+    return segments
+
+def get_keyframe_offsets(segment_path):
+    """
+    Runs ffprobe over a segment's video packets and returns [(pts_time, byte offset, byte length)]
+    for every keyframe. The length runs up to the next video packet so the range covers the full frame.
+    """
+    cmd = [
+        FFPROBE_BIN,
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,pos,flags',
+        '-print_format', 'json',
+        segment_path
+    ]
+    result = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    packets = [p for p in json.loads(result.stdout).get('packets', []) if p.get('pos') not in (None, 'N/A')]
+    segment_size = os.path.getsize(segment_path)
+
+    keyframes = []
+    for i, packet in enumerate(packets):
+        if 'K' not in packet.get('flags', ''):
+            continue
+        offset = int(packet['pos'])
+        next_offset = int(packets[i + 1]['pos']) if i + 1 < len(packets) else segment_size
+        # The first keyframe of a segment also takes the PAT/PMT at the start of the file
+        if not keyframes:
+            offset = 0
+        keyframes.append((float(packet['pts_time']), offset, next_offset - offset))
+    return keyframes
+
+def write_iframe_playlist(output_folder_q, chunk_id):
+    """
+    Writes chunk_{chunk_id}_iframes.m3u8 next to the chunk manifest: one #EXTINF/#EXT-X-BYTERANGE entry
+    per keyframe. The Finalizer stitches these into the rendition's EXT-X-I-FRAMES-ONLY playlist.
+    """
+    segments = read_chunk_playlist(os.path.join(output_folder_q, f"chunk_{chunk_id}.m3u8"))
+    chunk_length = sum(duration for _, duration in segments)
+
+    keyframes = []
+    for segment_file, _ in segments:
+        for pts_time, offset, length in get_keyframe_offsets(os.path.join(output_folder_q, segment_file)):
+            keyframes.append((pts_time, offset, length, segment_file))
+
+    if not keyframes:
+        raise ValueError(f"No keyframes found in chunk {chunk_id}")
+
+    first_pts = keyframes[0][0]
+    lines = []
+    for i, (pts_time, offset, length, segment_file) in enumerate(keyframes):
+        # Each I-frame is displayed until the next one (or the end of the chunk)
+        next_pts = keyframes[i + 1][0] if i + 1 < len(keyframes) else first_pts + chunk_length
+        lines.append(f"#EXTINF:{max(next_pts - pts_time, 0.001):.3f},")
+        lines.append(f"#EXT-X-BYTERANGE:{length}@{offset}")
+        lines.append(segment_file)
+
+    with open(os.path.join(output_folder_q, f"chunk_{chunk_id}_iframes.m3u8"), 'w') as f:
+        f.write('\n'.join(lines))
+
+def format_vtt_timestamp(seconds):
+    """Formats seconds as a WebVTT HH:MM:SS.mmm timestamp."""
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millis:03d}"
+
+def generate_thumbnail_sprite(local_raw_path, start_time, chunk_duration, chunk_id, output_folder):
+    """
+    Grabs one low-res frame every THUMBNAIL_INTERVAL_SEC of the chunk, tiles them into a single JPEG
+    sprite sheet and writes the matching WebVTT cues (absolute video time, #xywh= sprite regions).
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    sprite_name = f"sprite_{chunk_id}.jpg"
+    tile_count = max(1, math.ceil(chunk_duration / THUMBNAIL_INTERVAL_SEC))
+    rows = math.ceil(tile_count / SPRITE_COLUMNS)
+
+    video_filter = (
+        f"fps=1/{THUMBNAIL_INTERVAL_SEC},"
+        f"scale={THUMBNAIL_WIDTH}:{THUMBNAIL_HEIGHT}:force_original_aspect_ratio=decrease,"
+        f"pad={THUMBNAIL_WIDTH}:{THUMBNAIL_HEIGHT}:(ow-iw)/2:(oh-ih)/2,"
+        f"tile={SPRITE_COLUMNS}x{rows}"
+    )
+    ffmpeg_command = [
+        FFMPEG_BIN,
+        '-ss', str(start_time),
+        '-i', local_raw_path,
+        '-t', str(chunk_duration),
+        '-an',
+        '-vf', video_filter,
+        '-frames:v', '1',
+        '-q:v', '5',
+        '-y', os.path.join(output_folder, sprite_name)
+    ]
+    subprocess.run(ffmpeg_command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # Cue image paths are relative to the stitched processed/{video_id}/thumbnails.vtt
+    cues = []
+    for i in range(tile_count):
+        cue_start = start_time + i * THUMBNAIL_INTERVAL_SEC
+        cue_end = min(cue_start + THUMBNAIL_INTERVAL_SEC, start_time + chunk_duration)
+        x = (i % SPRITE_COLUMNS) * THUMBNAIL_WIDTH
+        y = (i // SPRITE_COLUMNS) * THUMBNAIL_HEIGHT
+        cues.append(
+            f"{format_vtt_timestamp(cue_start)} --> {format_vtt_timestamp(cue_end)}\n"
+            f"thumbs/{sprite_name}#xywh={x},{y},{THUMBNAIL_WIDTH},{THUMBNAIL_HEIGHT}"
+        )
+
+    with open(os.path.join(output_folder, f"chunk_{chunk_id}.vtt"), 'w') as f:
+        f.write("WEBVTT\n\n" + '\n\n'.join(cues) + '\n')
+
+def chunk_label(job_data):
+    """Chunk ID as used in object names and finalizer signals ("0000-0060")."""
+    return f"{int(job_data['Start']):04d}-{int(job_data['End']):04d}"
+
 def transcode_video(job_data):
+    """
+    Runs one chunk job inside a 'transcode.chunk' span (after the job's 'transcode.queue_wait').
+    Returns True when the message can be deleted.
+    """
+    trace = extract_trace(job_data)
+    chunk_id = chunk_label(job_data)
+    job_key = f"{job_data['VideoID']}/{chunk_id}"
+    record_queue_wait('transcode', trace, Chunk=chunk_id, Lane=job_data.get('Lane'))
+    WORKER_STATS.job_started(job_key)
+    succeeded = False
+    try:
+        with Span('transcode.chunk', trace, Chunk=chunk_id) as chunk_span:
+            succeeded = transcode_chunk(job_data, chunk_span)
+            if not succeeded:
+                chunk_span.fail('chunk failed (see worker log)')
+    finally:
+        WORKER_STATS.job_finished(job_key, succeeded)
+    return succeeded
+
+def transcode_chunk(job_data, chunk_span):
     """Handles the time-sliced transcoding job and dynamically filters the Bitrate Ladder."""
     video_id = job_data['VideoID']
     raw_s3_key = job_data['RawS3Key']
@@ -74,7 +653,7 @@ def transcode_video(job_data):
     total_chunks = job_data.get('TotalChunks')
     
     chunk_duration = end_time - start_time
-    chunk_id = f"{int(start_time):04d}-{int(end_time):04d}"
+    chunk_id = chunk_label(job_data)
     print(f"\n--- START CHUNK {chunk_id} ({chunk_duration:.2f}s) ---")
     
     # --- Local Setup ---
@@ -87,7 +666,8 @@ def transcode_video(job_data):
         # 1. Download Raw File (CRITICAL BOTO3 CHECK)
         print(f"Downloading s3://{raw_s3_bucket}/{raw_s3_key}...")
         try:
-            S3.download_file(raw_s3_bucket, raw_s3_key, local_raw_path)
+            with Span('transcode.download', chunk_span.context):
+                S3.download_file(raw_s3_bucket, raw_s3_key, local_raw_path)
             print(f"Download complete.")
         except Exception as e:
             # Explicitly catch S3 download failure (e.g., AccessDenied)
@@ -109,6 +689,7 @@ def transcode_video(job_data):
 
         # --- 3. FFmpeg Transcoding Loop ---
         for quality, settings in dynamic_ladder.items():
+            rendition_started = time.time()
             output_folder_q = os.path.join(job_dir, quality)
             os.makedirs(output_folder_q, exist_ok=True)
             output_manifest_name = f"chunk_{chunk_id}.m3u8"
@@ -146,7 +727,23 @@ def transcode_video(job_data):
                 update_dynamo_status(video_id, 'FAILED_TRANSCODE')
                 return False
 
-            # 4. Upload Processed Files to S3 (CRITICAL BOTO3 CHECK)
+            # 4. Describe the real output (resolution + codecs) for the master manifest
+            segment_files = sorted(f for f in os.listdir(output_folder_q) if f.endswith('.ts'))
+            try:
+                rendition_info = probe_rendition(os.path.join(output_folder_q, segment_files[0]))
+                with open(os.path.join(output_folder_q, 'rendition.json'), 'w') as f:
+                    json.dump(rendition_info, f)
+            except Exception as e:
+                # Non-fatal: the Finalizer falls back to the nominal ladder values
+                print(f"WARNING: Could not probe rendition {quality} for chunk {chunk_id}: {e}")
+
+            try:
+                write_iframe_playlist(output_folder_q, chunk_id)
+            except Exception as e:
+                # Non-fatal: the Finalizer omits the I-frame playlist for this rendition
+                print(f"WARNING: Could not build I-frame playlist {quality} for chunk {chunk_id}: {e}")
+
+            # 5. Upload Processed Files to S3 (CRITICAL BOTO3 CHECK)
             processed_key_prefix = f"processed/{video_id}/{quality}/" 
             
             try:
@@ -158,21 +755,36 @@ def transcode_video(job_data):
                 
                 print(f"Chunk {chunk_id} segments uploaded successfully for {quality}.")
                 completed_qualities.append(quality) # Track only successful uploads
+                # Encode + probe + I-frame playlist + upload of this rendition
+                emit_span('transcode.rendition', chunk_span.context, rendition_started, time.time(), Quality=quality)
             except Exception as e:
                 # Explicitly catch S3 upload failure (e.g., PutObject AccessDenied)
                 print(f"CRITICAL UPLOAD FAILURE for {quality}: Cannot write to {PROCESSED_S3_BUCKET}. Error: {e}")
                 update_dynamo_status(video_id, 'FAILED_UPLOAD')
                 return False
 
-        # 5. Final Status Hand-off (CRITICAL SQS CHECK)
+        # 6. Trick-play thumbnails (sprite sheet + WebVTT cues for this chunk)
+        thumbs_folder = os.path.join(job_dir, 'thumbs')
+        try:
+            thumbnails_started = time.time()
+            generate_thumbnail_sprite(local_raw_path, start_time, chunk_duration, chunk_id, thumbs_folder)
+            for file in os.listdir(thumbs_folder):
+                S3.upload_file(os.path.join(thumbs_folder, file), PROCESSED_S3_BUCKET, f"processed/{video_id}/thumbs/{file}")
+            print(f"Chunk {chunk_id} thumbnail sprite uploaded.")
+            emit_span('transcode.thumbnails', chunk_span.context, thumbnails_started, time.time())
+        except Exception as e:
+            # Non-fatal: seek previews are optional, playback is not affected
+            print(f"WARNING: Thumbnail sprite generation failed for chunk {chunk_id}: {e}")
+
+        # 7. Final Status Hand-off (CRITICAL SQS CHECK)
         if FINALIZER_SQS_URL:
             try:
-                finalizer_message = {
+                finalizer_message = inject_trace({
                     "VideoID": video_id,
                     "ChunkID": chunk_id,
                     "TotalChunks": total_chunks,
                     "CompletedQualities": completed_qualities
-                }
+                }, chunk_span.context)
 
                 FINALIZER_SQS.send_message(
                     QueueUrl=FINALIZER_SQS_URL,
@@ -193,7 +805,7 @@ def transcode_video(job_data):
         update_dynamo_status(video_id, 'FAILED_INIT_OR_UNKNOWN')
         return False
     finally:
-        # 6. Clean up temporary directory (CRUCIAL)
+        # 8. Clean up temporary directory (CRUCIAL)
         shutil.rmtree(job_dir, ignore_errors=True)
         print(f"Cleaned up {job_dir}")
         
@@ -204,49 +816,28 @@ def signal_handler(signum, frame):
     RECEIVED_SIGNAL = True
 
 def main():
-    """Worker loop that continuously polls SQS."""
-    if not SQS_QUEUE_URL:
-        print("FATAL: SQS_QUEUE_URL environment variable is missing. Cannot start.")
+    """Worker loop that continuously polls the lane queues."""
+    if not JOB_QUEUE_LANES:
+        print("FATAL: SQS_QUEUE_URL(S) environment variable is missing. Cannot start.")
         return
     
     # Initialize necessary environment check logs
-    print(f"ENV CHECK: AWS Region={AWS_REGION}, SQS URL={SQS_QUEUE_URL}, DYNAMO DB={DYNAMODB_TABLE_NAME}")
+    print(f"ENV CHECK: AWS Region={AWS_REGION}, SQS lanes={JOB_QUEUE_LANES}, weights={LANE_SCHEDULER.weights}, DYNAMO DB={DYNAMODB_TABLE_NAME}")
     
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     
+    start_metrics()
     print("Transcoder worker started. Polling SQS...")
     
     while not RECEIVED_SIGNAL:
         try:
-            # SQS Long Polling
-            response = SQS.receive_message(
-                QueueUrl=SQS_QUEUE_URL,
-                MaxNumberOfMessages=1,
-                WaitTimeSeconds=20, 
-                VisibilityTimeout=1800 
-            )
-
-            if 'Messages' in response:
-                message = response['Messages'][0]
-                receipt_handle = message['ReceiptHandle']
-                
-                job_data = json.loads(message['Body'])
-                
-                if transcode_video(job_data):
-                    # DELETE message ONLY after successful processing
-                    SQS.delete_message(
-                        QueueUrl=SQS_QUEUE_URL,
-                        ReceiptHandle=receipt_handle
-                    )
-                    print("Job successfully completed and message deleted.")
-                # If transcode_video returns False, the job message remains for retry.
-            else:
-                print("Queue is empty. Polling again...")
+            if not poll_once():
+                print("Queues are empty. Polling again...")
                 
         except Exception as e:
             print(f"CRITICAL SQS polling error: {e}. Retrying in 5s.")
             time.sleep(5)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
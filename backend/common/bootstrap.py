@@ -0,0 +1,142 @@
+"""
+Shared Lambda bootstrap: lazily created, reused AWS clients and init-duration reporting.
+
+Copied into every function's deployment package as common/ by the deploy workflow; import it FIRST
+in lambda_function.py so INIT_STARTED is taken before the function's own imports:
+
+    from common import bootstrap
+
+    S3 = bootstrap.client('s3')          # boto3 is imported, and the client built, on first use
+    ...
+    bootstrap.init_complete('ContentListingService')   # last line of the module
+
+boto3/botocore come from the Lambda runtime; they are not packaged with the functions (except where a
+function's requirements.txt pins a newer SDK for an API parameter the runtime may lack).
+"""
+import os
+import sys
+import json
+import time
+import threading
+from functools import wraps
+
+INIT_STARTED = time.perf_counter()
+
+# --- Configuration (Lambda Environment Variables) ---
+FUNCTION_NAME = os.environ.get('AWS_LAMBDA_FUNCTION_NAME')
+METRICS_NAMESPACE = os.environ.get('INIT_METRICS_NAMESPACE', 'MovieVerse/Lambda')
+
+_clients = {} # (service, region, endpoint, config) -> boto3 client, shared by all threads
+_clients_lock = threading.Lock()
+_thread_local = threading.local() # boto3 resources are NOT thread-safe: one per thread
+_session = None # One boto3 Session for all resources (creating a Session reloads the service models)
+_session_lock = threading.Lock() # Sessions are not thread-safe either: resources are built one at a time
+_state = {'function': FUNCTION_NAME, 'init_ms': None, 'cold': True}
+
+
+# --- Clients ---
+
+def get_client(service, region=None, endpoint_url=None, **config):
+    """
+    Returns the shared boto3 client for these settings, creating it on first use.
+    Keyword arguments other than region/endpoint_url become a botocore Config (e.g. signature_version='s3v4').
+    """
+    key = (service, region, endpoint_url, json.dumps(config, sort_keys=True))
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                import boto3
+                options = {'region_name': region, 'endpoint_url': endpoint_url}
+                if config:
+                    from botocore.config import Config
+                    options['config'] = Config(**config)
+                client = _clients[key] = boto3.client(service, **options)
+    return client
+
+
+class LazyClient:
+    """Module-level stand-in for a boto3 client: the real client is created on first attribute access."""
+
+    def __init__(self, service, **settings):
+        self._service = service
+        self._settings = settings
+
+    def __getattr__(self, name):
+        return getattr(get_client(self._service, **self._settings), name)
+
+    def __repr__(self):
+        return f"LazyClient({self._service!r})"
+
+
+def client(service, **settings):
+    """Lazy client for module-level constants (S3 = bootstrap.client('s3'))."""
+    return LazyClient(service, **settings)
+
+
+def table(name, region=None):
+    """
+    The calling thread's DynamoDB Table. Every thread gets its own resource, but all of them are built
+    (one at a time) from one shared Session, so a new thread costs a resource, not a Session.
+    """
+    global _session
+    tables = getattr(_thread_local, 'tables', None)
+    if tables is None:
+        tables = _thread_local.tables = {}
+    if (name, region) not in tables:
+        with _session_lock:
+            if _session is None:
+                import boto3
+                _session = boto3.session.Session()
+            tables[(name, region)] = _session.resource('dynamodb', region_name=region).Table(name)
+    return tables[(name, region)]
+
+
+# --- Init / cold-start reporting ---
+
+def emit_metric(name, value_ms, function):
+    """Writes one CloudWatch Embedded Metric Format line (turned into a metric from the log, no API call)."""
+    print(json.dumps({
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['Function']],
+                'Metrics': [{'Name': name, 'Unit': 'Milliseconds'}]
+            }]
+        },
+        'Function': function,
+        name: round(value_ms, 2)
+    }))
+    sys.stdout.flush()
+
+
+def init_complete(service_name):
+    """
+    Call at the end of the handler module. Records the module's init duration (bootstrap import to here)
+    as the InitDuration metric. Returns it in milliseconds.
+    """
+    init_ms = (time.perf_counter() - INIT_STARTED) * 1000
+    _state['function'] = FUNCTION_NAME or service_name
+    _state['init_ms'] = init_ms
+    emit_metric('InitDuration', init_ms, _state['function'])
+    return init_ms
+
+
+def measure_cold_start(handler):
+    """
+    Decorator for lambda_handler: the first invocation of a container is reported as ColdInvokeDuration.
+    It includes the lazy client creation that init no longer does.
+    """
+    @wraps(handler)
+    def wrapper(event, context):
+        if not _state['cold']:
+            return handler(event, context)
+        _state['cold'] = False
+        started = time.perf_counter()
+        try:
+            return handler(event, context)
+        finally:
+            emit_metric('ColdInvokeDuration', (time.perf_counter() - started) * 1000, _state['function'] or 'unknown')
+    return wrapper
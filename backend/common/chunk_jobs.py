@@ -0,0 +1,72 @@
+"""
+Chunk jobs as segmentation_service sends them and sweeper_service re-sends them: the lane configuration,
+the chunk ID format and the job message, plus the DynamoDB number conversions of the ChunkPlan.
+
+    JOB_QUEUE_LANES = chunk_jobs.load_job_queue_lanes()      # {"priority": url, ...}
+    body = chunk_jobs.build_chunk_message(video, plan, chunk)
+"""
+import os
+import json
+from decimal import Decimal
+
+LANES = ['priority', 'standard', 'bulk']
+
+
+def load_job_queue_lanes():
+    """
+    Scheduling lanes from TRANSCODING_JOB_QUEUE_URLS (JSON {"priority": url, "standard": url, "bulk": url}).
+    JobWorkers pull from them by weighted round-robin (SQS_QUEUE_URLS / LANE_WEIGHTS). Without it every
+    chunk goes to TRANSCODING_JOB_QUEUE_URL, as the 'standard' lane.
+    """
+    lanes = json.loads(os.environ.get('TRANSCODING_JOB_QUEUE_URLS') or '{}')
+    if lanes:
+        return lanes
+    queue_url = os.environ.get('TRANSCODING_JOB_QUEUE_URL')
+    return {'standard': queue_url} if queue_url else {}
+
+
+def lane_queue_url(lanes, lane):
+    """Queue of the lane, else the standard (or any configured) lane's queue."""
+    return lanes.get(lane) or lanes.get('standard') or next(iter(lanes.values()))
+
+
+def chunk_label(start, end):
+    """Chunk ID as the JobWorker names it and the finalizer records it in CompletedChunks ("0000-0060")."""
+    return f"{int(start):04d}-{int(end):04d}"
+
+
+def build_chunk_message(video, plan, chunk):
+    """Chunk job body. video is the segmentation job or the video item (VideoID, RawS3Key, RawS3Bucket)."""
+    return {
+        "VideoID": video['VideoID'],
+        "RawS3Key": video['RawS3Key'],
+        "RawS3Bucket": video['RawS3Bucket'],
+        "Start": chunk['Start'],
+        "End": chunk['End'],
+        "ChunkID": chunk['Index'],
+        "TotalChunks": plan['TotalChunks'],
+        "MaxResolution": plan['MaxResolution'], # RESOLUTION INJECTED HERE
+        "Lane": plan['Lane']
+    }
+
+
+def to_dynamo(value):
+    """Floats -> Decimal (boto3 rejects floats), recursively."""
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {k: to_dynamo(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [to_dynamo(v) for v in value]
+    return value
+
+
+def from_dynamo(value):
+    """Decimal -> int/float, recursively (for JSON message bodies)."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, dict):
+        return {k: from_dynamo(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [from_dynamo(v) for v in value]
+    return value
@@ -0,0 +1,78 @@
+"""
+Reliable SQS fan-out: entries are sent in batches of 10, the batches concurrently, and only the entries a
+response reports as Failed are sent again (with jittered exponential backoff). A throttled or erroring
+batch call is retried as a whole. Entries with a sender fault (too large, malformed) are not retried.
+
+    failed = fanout.send_all(SQS, queue_url, entries)   # [] when every entry was accepted
+    if failed:
+        raise RuntimeError(...)                          # or record them for a later retry
+"""
+import time
+import random
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger()
+
+MAX_BATCH_ENTRIES = 10 # SendMessageBatch limit
+DEFAULT_CONCURRENCY = 8
+DEFAULT_MAX_ATTEMPTS = 5
+BASE_DELAY_SEC = 0.1
+MAX_DELAY_SEC = 5.0
+
+
+def backoff(attempt):
+    """Full-jitter delay before retry number attempt (1, 2, ...)."""
+    return random.uniform(0, min(MAX_DELAY_SEC, BASE_DELAY_SEC * 2 ** attempt))
+
+
+def send_batch(sqs, queue_url, entries, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Sends one batch (<= 10 entries), re-sending failed entries until they are accepted or max_attempts
+    is reached. Returns (failed entries as [{'Id', 'Code', 'Message'}], retries made).
+    """
+    pending = list(entries)
+    failed = []
+    retries = 0
+    for attempt in range(1, max_attempts + 1):
+        try:
+            response = sqs.send_message_batch(QueueUrl=queue_url, Entries=pending)
+            errors = response.get('Failed', [])
+        except Exception as e:
+            # Throttling, timeouts, 5xx: nothing in this call is known to be accepted
+            errors = [{'Id': entry['Id'], 'Code': type(e).__name__, 'Message': str(e), 'SenderFault': False} for entry in pending]
+
+        by_id = {entry['Id']: entry for entry in pending}
+        failed += [e for e in errors if e.get('SenderFault')]
+        pending = [by_id[e['Id']] for e in errors if not e.get('SenderFault') and e['Id'] in by_id]
+        if not pending:
+            break
+        if attempt < max_attempts:
+            retries += 1
+            logger.warning(f"{len(pending)} SQS batch entries failed ({errors[0].get('Code')}); retry {attempt} of {max_attempts - 1}.")
+            time.sleep(backoff(attempt))
+    else:
+        failed += [{'Id': entry['Id'], 'Code': 'RetriesExhausted', 'Message': f"not accepted after {max_attempts} attempts"}
+                   for entry in pending]
+    return [{'Id': e['Id'], 'Code': e.get('Code'), 'Message': e.get('Message')} for e in failed], retries
+
+
+def send_all(sqs, queue_url, entries, max_concurrency=DEFAULT_CONCURRENCY, max_attempts=DEFAULT_MAX_ATTEMPTS, stats=None):
+    """
+    Sends every entry ([{'Id', 'MessageBody', ...}], Ids unique) with up to max_concurrency batches in
+    flight. Returns the entries that could not be sent (empty list on success). stats, if given, gets
+    'batches' and 'retries'.
+    """
+    batches = [entries[i:i + MAX_BATCH_ENTRIES] for i in range(0, len(entries), MAX_BATCH_ENTRIES)]
+    if not batches:
+        return []
+    if len(batches) == 1:
+        results = [send_batch(sqs, queue_url, batches[0], max_attempts)]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(batches))) as executor:
+            results = list(executor.map(lambda batch: send_batch(sqs, queue_url, batch, max_attempts), batches))
+
+    if stats is not None:
+        stats['batches'] = len(batches)
+        stats['retries'] = sum(retries for _, retries in results)
+    return [entry for failed, _ in results for entry in failed]
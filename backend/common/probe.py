@@ -0,0 +1,138 @@
+"""
+Streaming ffprobe of an S3 object, shared by content_metadata_service and segmentation_service.
+
+The ranged S3 body is piped straight into ffprobe's stdin (no /tmp copy). ffprobe exits as soon as it
+has found the streams, which closes the pipe and stops the download. The byte budget adapts per file
+extension: it follows what recent probes actually consumed, and doubles only after a probe that used
+the whole budget and still came up short (a probe that stopped early will not do better with more bytes).
+
+    data = probe.probe_s3_object(S3, bucket, key, FFPROBE_PATH)   # ffprobe JSON
+"""
+import os
+import json
+import logging
+import threading
+import subprocess
+
+logger = logging.getLogger()
+
+PROBE_CHUNK_BYTES = 256 * 1024
+PROBE_MIN_BYTES = 512 * 1024
+PROBE_MAX_BYTES = 32 * 1024 * 1024
+PROBE_DEFAULT_BUDGETS = {'.mp4': 2 * 1024 * 1024, '.m4v': 2 * 1024 * 1024, '.mov': 2 * 1024 * 1024,
+                         '.mkv': 1024 * 1024, '.webm': 1024 * 1024, '.ts': 4 * 1024 * 1024}
+PROBE_FALLBACK_BUDGET = 5 * 1024 * 1024
+PRESIGNED_URL_EXPIRY = 300
+
+probe_budgets = {} # extension -> learned budget (bytes), kept while the container is warm
+probe_budget_lock = threading.Lock()
+
+
+def get_probe_budget(extension):
+    with probe_budget_lock:
+        return probe_budgets.get(extension) or PROBE_DEFAULT_BUDGETS.get(extension, PROBE_FALLBACK_BUDGET)
+
+
+def budget_exhausted(consumed_bytes, budget):
+    """True when a probe read everything it was given, i.e. more bytes might have helped."""
+    return consumed_bytes >= budget
+
+
+def record_probe_usage(extension, consumed_bytes, budget, succeeded):
+    """
+    Adapts the extension's budget: 2x what a successful probe consumed, or double after a failure that
+    exhausted the budget. A failure that stopped short of the budget leaves it unchanged.
+    """
+    if not succeeded and not budget_exhausted(consumed_bytes, budget):
+        return
+    with probe_budget_lock:
+        current = probe_budgets.get(extension) or PROBE_DEFAULT_BUDGETS.get(extension, PROBE_FALLBACK_BUDGET)
+        target = consumed_bytes * 2 if succeeded else current * 2
+        probe_budgets[extension] = max(PROBE_MIN_BYTES, min(PROBE_MAX_BYTES, target))
+
+
+def run_ffprobe_on(ffprobe_path, source, stdin=None):
+    """Starts ffprobe on a path/URL (or 'pipe:0' with stdin=PIPE)."""
+    cmd = [
+        ffprobe_path,
+        '-v', 'error',
+        '-print_format', 'json',
+        '-show_format',
+        '-show_streams',
+        source
+    ]
+    return subprocess.Popen(cmd, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def pipe_s3_range(s3, bucket, key, budget, stdin, result):
+    """Streams bytes [0, budget) of the object into ffprobe's stdin; result gets 'written' (and 'error')."""
+    try:
+        body = s3.get_object(Bucket=bucket, Key=key, Range=f'bytes=0-{budget - 1}')['Body']
+        try:
+            for chunk in body.iter_chunks(PROBE_CHUNK_BYTES):
+                stdin.write(chunk)
+                result['written'] += len(chunk)
+        except (BrokenPipeError, ValueError):
+            pass # ffprobe has what it needs and closed its end
+        finally:
+            body.close()
+    except Exception as e:
+        result['error'] = e
+    finally:
+        try:
+            stdin.close()
+        except BrokenPipeError:
+            pass
+
+
+def probe_pipe(s3, bucket, key, budget, ffprobe_path):
+    """One streaming probe attempt. Returns (ffprobe JSON or None, bytes consumed)."""
+    process = run_ffprobe_on(ffprobe_path, 'pipe:0', stdin=subprocess.PIPE)
+    result = {'written': 0, 'error': None}
+    feeder = threading.Thread(target=pipe_s3_range, args=(s3, bucket, key, budget, process.stdin, result))
+    feeder.start()
+    # -v error keeps stderr tiny, so reading stdout first cannot dead-lock
+    stdout = process.stdout.read()
+    stderr = process.stderr.read()
+    process.wait()
+    feeder.join()
+
+    if result['error'] is not None:
+        raise result['error'] # S3 errors (missing object, access) are not a probe-budget problem
+    if process.returncode != 0:
+        logger.info(f"Streaming probe of {key} failed with {budget} bytes: {stderr.decode('utf-8', 'replace').strip()}")
+        return None, result['written']
+    data = json.loads(stdout)
+    if not float(data.get('format', {}).get('duration') or 0):
+        # Unseekable input without a duration in the header (e.g. moov atom at the end)
+        return None, result['written']
+    return data, result['written']
+
+
+def probe_s3_object(s3, bucket, key, ffprobe_path):
+    """
+    Technical metadata (ffprobe JSON) of an S3 object without staging it on disk.
+    Tries the adaptive-budget pipe (once more with twice the bytes if the first attempt used them all),
+    then falls back to letting ffprobe read a presigned URL with range requests, which also handles
+    index-at-the-end files.
+    """
+    extension = os.path.splitext(key)[1].lower()
+    budget = get_probe_budget(extension)
+
+    for attempt in range(2):
+        data, consumed = probe_pipe(s3, bucket, key, budget, ffprobe_path)
+        record_probe_usage(extension, consumed, budget, data is not None)
+        if data is not None:
+            logger.info(f"Probed {key} from {consumed} streamed bytes (budget {budget}).")
+            return data
+        if not budget_exhausted(consumed, budget) or budget >= PROBE_MAX_BYTES:
+            break # More bytes would not help
+        budget = min(PROBE_MAX_BYTES, budget * 2)
+
+    logger.info(f"Streaming probe of {key} was inconclusive. Probing via presigned URL.")
+    url = s3.generate_presigned_url('get_object', Params={'Bucket': bucket, 'Key': key}, ExpiresIn=PRESIGNED_URL_EXPIRY)
+    process = run_ffprobe_on(ffprobe_path, url)
+    stdout, stderr = process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffprobe failed for s3://{bucket}/{key}: {stderr.decode('utf-8', 'replace').strip()}")
+    return json.loads(stdout)
@@ -0,0 +1,139 @@
+"""
+Pipeline tracing keyed by VideoID: spans written as JSON log lines, trace context carried in SQS messages.
+
+Every stage wraps its work in spans. A span line is also a CloudWatch Embedded Metric Format document,
+so the SpanDuration metric (dimensions Stage, Span) gets CloudWatch percentiles without an API call.
+ops/trace_report.py reads the same lines back for per-stage percentiles and critical-path reports.
+
+    trace = tracing.extract(job_data)                    # context of the message that started this work
+    tracing.record_queue_wait('segmentation', trace)     # SentAt -> now
+    with tracing.span('segmentation', trace) as span:
+        message = tracing.inject({...}, span.context)    # next stage's parent is this span
+        with tracing.span('segmentation.probe', span.context):
+            ...
+
+The trace ID is the VideoID, so the spans of one upload can be found without a lookup.
+S3-code/JobWorker.py carries a DUPLICATE of this module (it is deployed to EC2 as a single file).
+"""
+import os
+import sys
+import json
+import time
+import uuid
+
+# --- Configuration (Environment Variables) ---
+TRACE_SPANS = os.environ.get('TRACE_SPANS', 'true').lower() == 'true'
+METRICS_NAMESPACE = os.environ.get('TRACE_METRICS_NAMESPACE', 'MovieVerse/Pipeline')
+TRACE_FIELD = 'Trace' # Message body key holding {TraceID, ParentSpanID, SentAt}
+
+
+def new_span_id():
+    return uuid.uuid4().hex[:16]
+
+
+# --- Trace context ---
+
+def start_trace(video_id):
+    """Root context for a new upload (content_metadata_service)."""
+    return {'TraceID': video_id, 'ParentSpanID': None}
+
+
+def extract(message):
+    """
+    Trace context of a received message body. Messages from before tracing (or from a stage that does not
+    trace) still get a context keyed by their VideoID, without a parent or a send time.
+    """
+    trace = message.get(TRACE_FIELD) or {}
+    return {
+        'TraceID': trace.get('TraceID') or message.get('VideoID'),
+        'ParentSpanID': trace.get('ParentSpanID'),
+        'SentAt': trace.get('SentAt')
+    }
+
+
+def inject(message, context):
+    """Stamps the context (and the send time, for the receiver's queue-wait span) into a message body."""
+    message[TRACE_FIELD] = {'TraceID': context['TraceID'], 'ParentSpanID': context.get('ParentSpanID'), 'SentAt': time.time()}
+    return message
+
+
+# --- Spans ---
+
+def write_span(record):
+    """One span per line on stdout (CloudWatch Logs). Replaced by the pipeline benchmark to collect spans."""
+    print(json.dumps(record, default=str))
+    sys.stdout.flush()
+
+
+def emit_span(name, context, start, end, span_id=None, error=None, **attributes):
+    """Writes a finished span. start/end are epoch seconds; attributes are kept as span properties."""
+    if not TRACE_SPANS or not context.get('TraceID'):
+        return
+    stage = name.split('.', 1)[0]
+    record = {
+        '_aws': {
+            'Timestamp': int(end * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['Stage', 'Span']],
+                'Metrics': [{'Name': 'SpanDuration', 'Unit': 'Milliseconds'}]
+            }]
+        },
+        'Stage': stage,
+        'Span': name,
+        'SpanDuration': round((end - start) * 1000, 3),
+        'TraceID': context['TraceID'],
+        'SpanID': span_id or new_span_id(),
+        'ParentSpanID': context.get('ParentSpanID'),
+        'Start': round(start, 6),
+        'End': round(end, 6)
+    }
+    if error:
+        record['Error'] = error
+    if attributes:
+        record['Attributes'] = attributes
+    write_span(record)
+
+
+def record_queue_wait(stage, context, **attributes):
+    """Emits '<stage>.queue_wait' from the sender's SentAt to now (nothing if the message had no send time)."""
+    sent_at = context.get('SentAt')
+    if sent_at:
+        emit_span(f"{stage}.queue_wait", context, float(sent_at), time.time(), **attributes)
+
+
+class Span:
+    """Context manager timing one unit of work; exceptions are recorded on the span and re-raised."""
+
+    def __init__(self, name, context, **attributes):
+        self.name = name
+        self.parent = context
+        self.attributes = attributes
+        self.span_id = new_span_id()
+        self.start = None
+        self.error = None
+
+    @property
+    def context(self):
+        """Context for child spans and for messages sent from inside this span."""
+        return {'TraceID': self.parent['TraceID'], 'ParentSpanID': self.span_id}
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, error):
+        """Marks the span failed for work that reports errors instead of raising them."""
+        self.error = str(error)
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        error = f"{exc_type.__name__}: {exc}" if exc_type else self.error
+        emit_span(self.name, self.parent, self.start, time.time(), span_id=self.span_id, error=error, **self.attributes)
+        return False
+
+
+def span(name, context, **attributes):
+    return Span(name, context, **attributes)
@@ -0,0 +1,210 @@
+import json
+import gzip
+import os
+import time
+import random
+import logging
+from botocore.exceptions import ClientError
+
+from common import bootstrap
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# --- Configuration (Lambda Environment Variables) ---
+REGION = os.environ.get('AWS_REGION')
+# Bucket holding the materialized catalog (defaults to the raw video bucket)
+CATALOG_BUCKET_NAME = os.environ.get('CATALOG_BUCKET_NAME') or os.environ.get('RAWVIDEO_BUCKET_NAME')
+CATALOG_SNAPSHOT_KEY = os.environ.get('CATALOG_SNAPSHOT_KEY', 'catalog/snapshot.json.gz')
+SNAPSHOT_REFRESH_SECONDS = 30 # How often a warm container re-checks the snapshot's S3 ETag
+MAX_WRITE_ATTEMPTS = 5 # Optimistic-concurrency retries when two updaters race
+
+# Only the attributes the catalog cards need are kept in the snapshot (and read by the listing Query)
+LISTING_FIELDS = ['VideoID', 'title', 'Title', 'synopsis', 'ThumbnailKey', 'Status', 'CreatedAt', 'SourceVideoID',
+                  'ThumbnailVariants']
+
+# --- Clients ---
+S3 = bootstrap.client('s3', region=REGION)
+
+# Warm-container copy of the snapshot
+snapshot_cache = {'etag': None, 'checked_at': 0, 'snapshot': None}
+
+# --- Helper Functions ---
+
+def catalog_entry(item):
+    """
+    Reduces a video item to its catalog fields, or None if it does not belong in the catalog.
+    Descriptive fields from the uploader's CSV (stored with lowercase keys) are kept for search.
+    """
+    if not item or item.get('Status') != 'READY':
+        return None
+    entry = {field: item[field] for field in LISTING_FIELDS if item.get(field) is not None}
+    entry.update({k: v for k, v in item.items() if k.islower() and isinstance(v, str)})
+    # Same form as after a round trip through the snapshot file (Decimals become strings), so entries compare equal
+    return json.loads(json.dumps(entry, default=str))
+
+def empty_snapshot():
+    return {'version': 0, 'generatedAt': None, 'videos': {}}
+
+def read_snapshot():
+    """Reads the snapshot document from S3. Returns (snapshot, etag), or (None, None) if it does not exist yet."""
+    try:
+        response = S3.get_object(Bucket=CATALOG_BUCKET_NAME, Key=CATALOG_SNAPSHOT_KEY)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None, None
+        raise
+    snapshot = json.loads(gzip.decompress(response['Body'].read()))
+    return snapshot, response['ETag']
+
+def write_snapshot(snapshot, expected_etag):
+    """
+    Writes the snapshot only if nobody else replaced it since we read it (S3 conditional write).
+    Raises ClientError 'PreconditionFailed' when we lost the race.
+    """
+    snapshot['version'] += 1
+    snapshot['generatedAt'] = int(time.time())
+
+    params = {
+        'Bucket': CATALOG_BUCKET_NAME,
+        'Key': CATALOG_SNAPSHOT_KEY,
+        'Body': gzip.compress(json.dumps(snapshot, default=str, separators=(',', ':')).encode('utf-8')),
+        'ContentType': 'application/json',
+        'ContentEncoding': 'gzip'
+    }
+    if expected_etag:
+        params['IfMatch'] = expected_etag
+    else:
+        params['IfNoneMatch'] = '*'
+
+    S3.put_object(**params)
+    logger.info(f"Catalog snapshot v{snapshot['version']} written ({len(snapshot['videos'])} videos).")
+
+def is_lost_race(error):
+    return error.response['Error']['Code'] in ('PreconditionFailed', 'ConditionalRequestConflict')
+
+def apply_changes(changed_items, removed_ids=()):
+    """
+    Incrementally updates the catalog snapshot with changed video items (full DynamoDB items,
+    already deserialized) and deleted VideoIDs. Items that are no longer READY are dropped.
+    Nothing is written when the snapshot would not change (e.g. a counter update of a READY video), nor
+    when no snapshot exists: the listing's first request rebuilds the whole catalog from the index, which
+    a partial snapshot built from these changes alone would keep it from doing.
+    This is the local hook; stream_handler feeds it from DynamoDB Streams.
+    """
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        snapshot, etag = read_snapshot()
+        if snapshot is None:
+            logger.info("No catalog snapshot yet. Leaving it to the next full rebuild.")
+            return None
+        videos = snapshot['videos']
+        changed = False
+
+        for item in changed_items:
+            entry = catalog_entry(item)
+            if entry and videos.get(item['VideoID']) != entry:
+                videos[item['VideoID']] = entry
+                changed = True
+            elif not entry and item['VideoID'] in videos:
+                del videos[item['VideoID']]
+                changed = True
+        for video_id in removed_ids:
+            if videos.pop(video_id, None) is not None:
+                changed = True
+
+        if not changed:
+            return snapshot
+        try:
+            write_snapshot(snapshot, etag)
+            return snapshot
+        except ClientError as e:
+            if not is_lost_race(e):
+                raise
+            logger.warning(f"Catalog snapshot changed concurrently (attempt {attempt + 1}). Retrying.")
+            time.sleep(random.uniform(0, 0.1 * 2 ** attempt))
+
+    raise RuntimeError("Could not update the catalog snapshot: too many concurrent writers.")
+
+def rebuild_snapshot(items):
+    """
+    Builds a fresh snapshot from an iterable of video items (used when none exists yet).
+    Losing the race to another container that built it at the same time is fine: theirs is served.
+    """
+    _, etag = read_snapshot()
+    snapshot = empty_snapshot()
+    for item in items:
+        entry = catalog_entry(item)
+        if entry:
+            snapshot['videos'][item['VideoID']] = entry
+    try:
+        write_snapshot(snapshot, etag)
+    except ClientError as e:
+        if not is_lost_race(e):
+            raise
+        logger.info("Catalog snapshot was materialized concurrently. Using that one.")
+    return snapshot
+
+def load_snapshot():
+    """
+    Returns (snapshot, etag) for serving, re-reading S3 at most every SNAPSHOT_REFRESH_SECONDS.
+    (None, None) means no snapshot has been materialized yet.
+    """
+    now = time.time()
+    if snapshot_cache['snapshot'] is not None and now - snapshot_cache['checked_at'] < SNAPSHOT_REFRESH_SECONDS:
+        return snapshot_cache['snapshot'], snapshot_cache['etag']
+
+    try:
+        head = S3.head_object(Bucket=CATALOG_BUCKET_NAME, Key=CATALOG_SNAPSHOT_KEY)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None, None
+        raise
+
+    # Only download again when the object actually changed
+    if head['ETag'] != snapshot_cache['etag']:
+        snapshot, etag = read_snapshot()
+        snapshot_cache['snapshot'] = snapshot
+        snapshot_cache['etag'] = etag
+
+    snapshot_cache['checked_at'] = now
+    return snapshot_cache['snapshot'], snapshot_cache['etag']
+
+@bootstrap.measure_cold_start
+def stream_handler(event, context):
+    """
+    DynamoDB Streams trigger (NEW_AND_OLD_IMAGES, or NEW_IMAGE) on the video table (deployed from the
+    listing package as CatalogSnapshotUpdater, handler catalog_snapshot.stream_handler).
+    Applies every changed/removed video of the batch to the snapshot in one conditional write.
+    Most writes to the table are pipeline bookkeeping (chunk counters, fan-out and sweep state) of videos
+    that are not in the catalog, or do not touch a catalog field. With old images those records are
+    dropped here, and a batch of only such records does not read or write the snapshot at all.
+    """
+    from boto3.dynamodb.types import TypeDeserializer # Only the stream trigger needs it
+    deserializer = TypeDeserializer()
+    changed_items = {}
+    removed_ids = set()
+
+    for record in event['Records']:
+        keys = {k: deserializer.deserialize(v) for k, v in record['dynamodb']['Keys'].items()}
+        video_id = keys['VideoID']
+
+        old_image = record['dynamodb'].get('OldImage')
+        old_entry = catalog_entry({k: deserializer.deserialize(v) for k, v in old_image.items()}) if old_image else None
+
+        if record['eventName'] == 'REMOVE':
+            if old_image and old_entry is None:
+                continue # Was never in the catalog
+            removed_ids.add(video_id)
+            changed_items.pop(video_id, None)
+        else:
+            new_item = {k: deserializer.deserialize(v) for k, v in record['dynamodb'].get('NewImage', {}).items()}
+            # INSERTs have no old image either, and a non-READY one is not in the catalog
+            if (old_image or record['eventName'] == 'INSERT') and catalog_entry(new_item) == old_entry:
+                continue # Nothing visible in the catalog changed (e.g. non-READY -> non-READY)
+            changed_items[video_id] = new_item
+            removed_ids.discard(video_id)
+
+    if changed_items or removed_ids:
+        apply_changes(list(changed_items.values()), removed_ids)
+    return {'statusCode': 200, 'body': json.dumps({'changed': len(changed_items), 'removed': len(removed_ids)})}
@@ -1,65 +1,420 @@
+from common import bootstrap # First import: starts the init timer
+
 import json
-import boto3
+import base64
 import os
-from botocore.config import Config
+import time
+import gzip
+import hashlib
+import logging
+from collections import OrderedDict
+
+import catalog_snapshot
+from catalog_snapshot import LISTING_FIELDS
+from search_index import SearchIndex
+
+# Optional: brotli is only used when it is packaged with the function
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
 
 # Configuration for AWS resources
 REGION = os.environ.get('AWS_REGION')
 TABLE_NAME = os.environ.get('VIDEO_METADATA_TABLE_NAME') # Set this in Env Vars
 BUCKET_NAME = os.environ.get('RAWVIDEO_BUCKET_NAME') # Set this in Env Vars
 
+# GSI with partition key 'Status' and sort key 'CreatedAt'.
+# It must project (INCLUDE or ALL) every attribute in LISTING_FIELDS.
+# Items without CreatedAt are not in the index: ops/backfill_created_at.py stamps older items
+# (once, at the cutover: a manual deploy run with backfill_created_at).
+STATUS_INDEX_NAME = os.environ.get('STATUS_INDEX_NAME', 'Status-CreatedAt-index')
+
+# Statuses the admin listing (admin_handler) may query. The public listing only ever serves READY.
+ADMIN_STATUSES = ['READY', 'PROCESSING', 'SKIPPED', 'FAILED_DOWNLOAD', 'FAILED_TRANSCODE', 'FAILED_UPLOAD',
+                  'FAILED_FINALIZER_SIGNAL', 'FAILED_INIT_OR_UNKNOWN', 'FAILED_STUCK']
+
+# Pagination
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Search
+DEFAULT_SEARCH_RESULTS = 20
+MAX_SEARCH_RESULTS = 100
+
+# Serve full-catalog requests (no limit/cursor) from the materialized snapshot
+CATALOG_SNAPSHOT_ENABLED = os.environ.get('CATALOG_SNAPSHOT_ENABLED', 'true').lower() == 'true'
+
+# Signed thumbnail URL cache (lives as long as the warm container)
+THUMBNAIL_URL_TTL = 3600 # Minimum lifetime of a freshly signed URL
+THUMBNAIL_URL_BUCKET = 900 # Expiries are aligned to the end of a 15-minute bucket
+THUMBNAIL_URL_MIN_REMAINING = 1800 # Re-sign once a cached URL has less than this left
+THUMBNAIL_URL_CACHE_SIZE = int(os.environ.get('THUMBNAIL_URL_CACHE_SIZE', '20000')) # ~12 derivative URLs per card
+LISTING_MAX_AGE = 300 # Cache-Control max-age; every URL in a response outlives it by > THUMBNAIL_URL_MIN_REMAINING
+FALLBACK_THUMBNAIL_WIDTH = 320 # Width of the JPEG derivative used as thumbnailUrl
+
+thumbnail_url_cache = OrderedDict() # thumb_key -> (signed url, expires_at), in LRU order
+
+# Rendered catalog response, reused until the snapshot changes or the thumbnail URL expiry bucket moves on
+rendered_catalog = {'snapshot_etag': None, 'url_bucket': None, 'rendered_at': 0, 'hash': None, 'body': None, 'encoded': {}}
+
+# Search index built from the snapshot, rebuilt lazily when the snapshot's ETag changes
+search_index_cache = {'snapshot_etag': None, 'index': None}
+
 #Endpoint URL
 ENDPOINT_URL = f'https://s3.{REGION}.amazonaws.com'
 
-# Clients
-dynamodb = boto3.resource('dynamodb', region_name=REGION)
-table = dynamodb.Table(TABLE_NAME)
-
+# Clients (created on first use; a snapshot-served listing never touches DynamoDB)
 # S3 Config for Presigned URLs
-s3_client = boto3.client('s3', region_name=REGION, config=Config(signature_version='s3v4'), endpoint_url=ENDPOINT_URL)
+s3_client = bootstrap.client('s3', region=REGION, endpoint_url=ENDPOINT_URL, signature_version='s3v4')
+
+def get_table():
+    return bootstrap.table(TABLE_NAME, REGION)
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Credentials': True
+}
+
+def get_thumbnail_url(thumb_key, now=None):
+    """
+    Returns a presigned GET URL for a thumbnail, reusing the cached signature until it is close to expiry.
+    Expiries are aligned to THUMBNAIL_URL_BUCKET boundaries, so all URLs signed within a bucket expire
+    together and a listing response stays valid for at least THUMBNAIL_URL_MIN_REMAINING seconds.
+    """
+    now = int(now or time.time())
+
+    cached = thumbnail_url_cache.get(thumb_key)
+    if cached and cached[1] - now >= THUMBNAIL_URL_MIN_REMAINING:
+        thumbnail_url_cache.move_to_end(thumb_key)
+        return cached[0]
+
+    expires_at = (now // THUMBNAIL_URL_BUCKET + 1) * THUMBNAIL_URL_BUCKET + THUMBNAIL_URL_TTL
+    url = s3_client.generate_presigned_url(
+        'get_object',
+        Params={'Bucket': BUCKET_NAME, 'Key': thumb_key},
+        ExpiresIn=expires_at - now
+    )
+
+    thumbnail_url_cache[thumb_key] = (url, expires_at)
+    thumbnail_url_cache.move_to_end(thumb_key)
+    # Evict least recently used entries
+    while len(thumbnail_url_cache) > THUMBNAIL_URL_CACHE_SIZE:
+        thumbnail_url_cache.popitem(last=False)
+
+    return url
+
+def encode_cursor(last_evaluated_key):
+    """Turns DynamoDB's LastEvaluatedKey into an opaque, URL-safe cursor for the frontend."""
+    if not last_evaluated_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode('utf-8')).decode('utf-8')
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor. Raises ValueError for anything that is not one of our cursors."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode('utf-8')))
+    except Exception:
+        raise ValueError("Invalid cursor.")
+    if not isinstance(key, dict) or 'VideoID' not in key:
+        raise ValueError("Invalid cursor.")
+    return key
+
+def parse_limit(value):
+    """Clamps the requested page size to [1, MAX_PAGE_SIZE]."""
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("limit must be an integer.")
+
+def query_videos(status, limit, cursor=None):
+    """
+    Queries one page of videos in the given status, newest first, from the Status/CreatedAt index.
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    params = {
+        'IndexName': STATUS_INDEX_NAME,
+        'KeyConditionExpression': '#status = :status',
+        'ExpressionAttributeValues': {':status': status},
+        'ScanIndexForward': False, # Newest uploads first
+        'Limit': limit,
+        # 'Status' is a DynamoDB reserved word, so every field goes through a placeholder
+        'ProjectionExpression': ', '.join(f"#f{i}" for i in range(len(LISTING_FIELDS))),
+        'ExpressionAttributeNames': {'#status': 'Status', **{f"#f{i}": field for i, field in enumerate(LISTING_FIELDS)}}
+    }
+    if cursor:
+        params['ExclusiveStartKey'] = decode_cursor(cursor)
+
+    response = get_table().query(**params)
+    return response.get('Items', []), encode_cursor(response.get('LastEvaluatedKey'))
+
+def build_srcsets(variants):
+    """{format: {width: key}} -> {format: "url 160w, url 320w, ..."} with (cached) presigned URLs."""
+    srcsets = {}
+    for fmt, sizes in (variants or {}).items():
+        widths = sorted(sizes, key=int)
+        srcsets[fmt] = ', '.join(f"{get_thumbnail_url(sizes[w])} {w}w" for w in widths)
+    return srcsets
+
+def build_video_entry(item):
+    """Maps a DynamoDB item to the JSON object the frontend renders."""
+    # 2. Generate Presigned URL for Thumbnail
+    # This allows the frontend to show the image SECURELY without cookies
+    thumb_key = item.get('ThumbnailKey')
+    thumb_url = None
+    variants = item.get('ThumbnailVariants') or {}
+
+    if variants.get('jpeg'):
+        # Sized derivative as the plain <img> fallback (never the multi-megabyte original)
+        jpeg_sizes = variants['jpeg']
+        width = min(jpeg_sizes, key=lambda w: (int(w) < FALLBACK_THUMBNAIL_WIDTH, abs(int(w) - FALLBACK_THUMBNAIL_WIDTH)))
+        thumb_url = get_thumbnail_url(jpeg_sizes[width])
+    elif thumb_key:
+        thumb_url = get_thumbnail_url(thumb_key)
+
+    # 3. Build Response Object
+    return {
+        'id': item.get('VideoID'),
+        # Renditions live under processed/{playbackId}/ (a deduplicated upload plays its source's renditions)
+        'playbackId': item.get('SourceVideoID') or item.get('VideoID'),
+        'title': item.get('title') or item.get('Title'),
+        'synopsis': item.get('synopsis'),
+        'thumb_key' : thumb_key,
+        'thumbnailUrl': thumb_url,
+        'thumbnailSrcSet': build_srcsets(variants), # {"avif"|"webp"|"jpeg": srcset}; empty until derivatives exist
+        'uploadDate': item.get('CreatedAt'),
+        'status': item.get('Status', 'READY')
+    }
+
+def iter_videos(status='READY'):
+    """Yields every video in a status by following the index pages."""
+    cursor = None
+    while True:
+        items, cursor = query_videos(status, MAX_PAGE_SIZE, cursor)
+        yield from items
+        if not cursor:
+            return
+
+def render_catalog(snapshot, snapshot_etag):
+    """
+    Renders the snapshot into the listing JSON body (newest first) and its version hash.
+    The signed thumbnail URLs differ per container (signing time), so the hash (and the ETag) is derived
+    from the snapshot's ETag and the URL expiry bucket instead of the bytes: every container serves the
+    same ETag for the same catalog, and a body whose URLs are still valid keeps getting 304s.
+    """
+    now = time.time()
+    url_bucket = int(now // THUMBNAIL_URL_BUCKET)
+    if rendered_catalog['snapshot_etag'] == snapshot_etag and rendered_catalog['url_bucket'] == url_bucket:
+        return rendered_catalog
+
+    videos = sorted(snapshot['videos'].values(), key=lambda v: v.get('CreatedAt') or '', reverse=True)
+    body = json.dumps({'items': [build_video_entry(v) for v in videos], 'nextCursor': None}, default=str)
+    body_hash = hashlib.sha256(f"{snapshot_etag}:{url_bucket}".encode('utf-8')).hexdigest()[:32]
+
+    if body_hash != rendered_catalog['hash']:
+        rendered_catalog['encoded'] = {}
+    rendered_catalog.update({'snapshot_etag': snapshot_etag, 'url_bucket': url_bucket, 'rendered_at': now,
+                             'hash': body_hash, 'body': body})
+    return rendered_catalog
+
+def choose_encoding(accept_encoding):
+    """Picks br, then gzip, then identity based on the Accept-Encoding request header."""
+    accepted = {part.split(';')[0].strip().lower() for part in (accept_encoding or '').split(',')}
+    if brotli and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return 'identity'
+
+def encode_body(encoding):
+    """Compresses the rendered catalog once per encoding and caches the result."""
+    encoded = rendered_catalog['encoded']
+    if encoding not in encoded:
+        raw = rendered_catalog['body'].encode('utf-8')
+        if encoding == 'br':
+            encoded[encoding] = brotli.compress(raw)
+        elif encoding == 'gzip':
+            encoded[encoding] = gzip.compress(raw)
+        else:
+            encoded[encoding] = raw
+    return encoded[encoding]
+
+def etag_matches(if_none_match, etag):
+    """Matches an If-None-Match header against our ETag (exact tags, as we send them, or *)."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates
+
+def serve_catalog_snapshot(event):
+    """
+    Serves the full catalog from the snapshot with an ETag, 304s and gzip/brotli.
+    The ETag is weak: containers sign the thumbnail URLs separately, so equal versions are not byte-identical.
+    Compressed bodies are returned base64-encoded (isBase64Encoded). The API Gateway REST API must list
+    */* (or application/json) under binaryMediaTypes to decode them; HTTP APIs decode them as is.
+    """
+    snapshot, snapshot_etag = catalog_snapshot.load_snapshot()
+    if snapshot is None:
+        # First request ever: materialize the snapshot from the index
+        catalog_snapshot.rebuild_snapshot(iter_videos('READY'))
+        snapshot, snapshot_etag = catalog_snapshot.load_snapshot()
+
+    rendered = render_catalog(snapshot, snapshot_etag)
+
+    headers = {k.lower(): v for k, v in ((event or {}).get('headers') or {}).items()}
+    encoding = choose_encoding(headers.get('accept-encoding'))
+    # Each content-coding is a different representation, so it gets its own ETag
+    etag = f'W/"{rendered["hash"]}"' if encoding == 'identity' else f'W/"{rendered["hash"]}-{encoding}"'
+
+    response_headers = {
+        **CORS_HEADERS,
+        'ETag': etag,
+        'Cache-Control': f"public, max-age={LISTING_MAX_AGE}",
+        'Vary': 'Accept-Encoding',
+        'Content-Type': 'application/json'
+    }
+
+    if etag_matches(headers.get('if-none-match'), etag):
+        return {'statusCode': 304, 'headers': response_headers, 'body': ''}
+
+    body = encode_body(encoding)
+    if encoding == 'identity':
+        return {'statusCode': 200, 'headers': response_headers, 'body': body.decode('utf-8')}
+
+    response_headers['Content-Encoding'] = encoding
+    return {
+        'statusCode': 200,
+        'headers': response_headers,
+        'body': base64.b64encode(body).decode('utf-8'),
+        'isBase64Encoded': True
+    }
+
+def get_search_index():
+    """Returns the warm container's SearchIndex, rebuilding it only if the catalog snapshot changed."""
+    snapshot, snapshot_etag = catalog_snapshot.load_snapshot()
+    if snapshot is None:
+        catalog_snapshot.rebuild_snapshot(iter_videos('READY'))
+        snapshot, snapshot_etag = catalog_snapshot.load_snapshot()
+
+    if search_index_cache['snapshot_etag'] != snapshot_etag:
+        started = time.time()
+        search_index_cache['index'] = SearchIndex(snapshot['videos'].values())
+        search_index_cache['snapshot_etag'] = snapshot_etag
+        logger.info(f"Search index built: {len(search_index_cache['index'])} videos in {time.time() - started:.2f}s")
+    return search_index_cache['index']
+
+@bootstrap.measure_cold_start
+def search_handler(event, context):
+    """
+    GET catalog search (deployed from this package as ContentSearchService, handler lambda_function.search_handler).
+    Query string: q (search text; the last word may be a prefix), limit (max results).
+    Response: {"items": [... listing entries with "score" ...]}
+    """
+    params = (event or {}).get('queryStringParameters') or {}
+    query = (params.get('q') or '').strip()
+
+    if not query:
+        return {'statusCode': 400, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'Missing search query: q'})}
+
+    try:
+        try:
+            limit = max(1, min(int(params.get('limit', DEFAULT_SEARCH_RESULTS)), MAX_SEARCH_RESULTS))
+        except ValueError:
+            return {'statusCode': 400, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'limit must be an integer.'})}
+
+        results = get_search_index().search(query, limit=limit)
+        items = [{**build_video_entry(entry), 'score': round(score, 4)} for entry, score in results]
+
+        return {
+            'statusCode': 200,
+            'headers': {**CORS_HEADERS, 'Cache-Control': f"public, max-age={LISTING_MAX_AGE}"},
+            'body': json.dumps({'items': items}, default=str)
+        }
+
+    except Exception as e:
+        logger.error(f"Search failed for {query!r}: {e}", exc_info=True)
+        return {'statusCode': 500, 'body': json.dumps(str(e))}
 
 #lambda handler
+@bootstrap.measure_cold_start
 def lambda_handler(event, context):
+    """
+    GET catalog listing of READY videos.
+    Query string: limit (page size), cursor (from the previous page's nextCursor) or id (fetch a single video).
+    Without parameters the whole READY catalog is served from the materialized snapshot.
+    Response: {"items": [...], "nextCursor": "..." | null}
+    """
+    params = (event or {}).get('queryStringParameters') or {}
+
     try:
-        # 1. Scan DynamoDB to get all videos
-        # (For production, use Query with pagination, but Scan is fine for < 1000 items)
-        response = table.scan()
-        items = response.get('Items', [])
-
-        video_list = []
-
-        for item in items:
-            # 2. Generate Presigned URL for Thumbnail
-            # This allows the frontend to show the image SECURELY without cookies
-            thumb_key = item.get('ThumbnailKey')
-            thumb_url = None
-            
-            if thumb_key:
-                thumb_url = s3_client.generate_presigned_url(
-                    'get_object',
-                    Params={'Bucket': BUCKET_NAME, 'Key': thumb_key},
-                    ExpiresIn=3600 # Valid for 1 hour
-                )
-            print(thumb_key)
-            # 3. Build Response Object
-            video_list.append({
-                'id': item.get('VideoID'),
-                'title': item.get('title'),
-                'synopsis': item.get('synopsis'),
-                'thumb_key' : thumb_key,
-                'thumbnailUrl': thumb_url,
-                'status': item.get('status', 'READY') # Only show READY videos?
-            })
+        # Full catalog: one cached snapshot read, usually answered with a 304
+        if not params and CATALOG_SNAPSHOT_ENABLED:
+            return serve_catalog_snapshot(event)
+
+        # Single video lookup (Watch page)
+        if params.get('id'):
+            item = get_table().get_item(Key={'VideoID': params['id']}).get('Item')
+            if not item:
+                return {'statusCode': 404, 'headers': CORS_HEADERS, 'body': json.dumps({'error': 'Video not found.'})}
+            return {'statusCode': 200, 'headers': CORS_HEADERS, 'body': json.dumps(build_video_entry(item), default=str)}
+
+        # 1. Query one page of videos from the Status/CreatedAt index
+        try:
+            limit = parse_limit(params.get('limit'))
+            items, next_cursor = query_videos('READY', limit, params.get('cursor'))
+        except ValueError as e:
+            return {'statusCode': 400, 'headers': CORS_HEADERS, 'body': json.dumps({'error': str(e)})}
+
+        video_list = [build_video_entry(item) for item in items]
 
         return {
             'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Credentials': True
-            },
-            'body': json.dumps(video_list)
+            # Signed URLs are reused across requests, so the page can be cached at the API edge
+            'headers': {**CORS_HEADERS, 'Cache-Control': f"public, max-age={LISTING_MAX_AGE}"},
+            'body': json.dumps({'items': video_list, 'nextCursor': next_cursor}, default=str)
         }
 
     except Exception as e:
         print(e)
-        return {'statusCode': 500, 'body': json.dumps(str(e))}
\ No newline at end of file
+        return {'statusCode': 500, 'body': json.dumps(str(e))}
+
+
+@bootstrap.measure_cold_start
+def admin_handler(event, context):
+    """
+    GET listing of any status for the Manage page (deployed from this package as ContentAdminService,
+    handler lambda_function.admin_handler). Its API route must have an authorizer: in-flight and failed
+    uploads are not public.
+    Query string: status (one of ADMIN_STATUSES, required), limit, cursor.
+    Response: {"items": [...], "nextCursor": "..." | null}
+    """
+    params = (event or {}).get('queryStringParameters') or {}
+    status = params.get('status')
+
+    if status not in ADMIN_STATUSES:
+        return {'statusCode': 400, 'headers': CORS_HEADERS,
+                'body': json.dumps({'error': f"status must be one of {', '.join(ADMIN_STATUSES)}."})}
+
+    try:
+        try:
+            items, next_cursor = query_videos(status, parse_limit(params.get('limit')), params.get('cursor'))
+        except ValueError as e:
+            return {'statusCode': 400, 'headers': CORS_HEADERS, 'body': json.dumps({'error': str(e)})}
+
+        return {
+            'statusCode': 200,
+            'headers': {**CORS_HEADERS, 'Cache-Control': 'private, no-store'},
+            'body': json.dumps({'items': [build_video_entry(item) for item in items], 'nextCursor': next_cursor}, default=str)
+        }
+
+    except Exception as e:
+        logger.error(f"Admin listing failed for {status}: {e}", exc_info=True)
+        return {'statusCode': 500, 'body': json.dumps(str(e))}
+
+
+bootstrap.init_complete('ContentListingService')
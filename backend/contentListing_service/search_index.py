@@ -0,0 +1,138 @@
+import re
+import math
+import heapq
+import bisect
+import unicodedata
+from array import array
+
+# Field boosts for ranking; any other descriptive (CSV-derived) field counts as DEFAULT_FIELD_WEIGHT
+FIELD_WEIGHTS = {'title': 3.0, 'owner': 1.5, 'synopsis': 1.0}
+DEFAULT_FIELD_WEIGHT = 0.5
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+PREFIX_FACTOR = 0.8 # A prefix match scores a bit lower than the exact token
+MAX_PREFIX_EXPANSIONS = 64 # Caps the work for very short prefixes ("a", "th", ...)
+MIN_PREFIX_LENGTH = 2
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """Lowercases, strips accents and splits text into alphanumeric tokens."""
+    normalized = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode('ascii').lower()
+    return TOKEN_PATTERN.findall(normalized)
+
+
+def searchable_fields(entry):
+    """Yields (field, text) for every descriptive field of a catalog entry (lowercase CSV-derived keys)."""
+    for field, value in entry.items():
+        if field.islower() and isinstance(value, str) and value:
+            yield field, value
+
+
+class SearchIndex:
+    """
+    Compact in-memory inverted index over catalog entries.
+    Postings are stored as parallel arrays (document numbers, field-weighted term frequencies) per token,
+    and a sorted vocabulary supports prefix lookups with bisect.
+    """
+
+    def __init__(self, entries):
+        self.entries = []
+        postings = {}
+        doc_lengths = array('f')
+
+        for entry in entries:
+            doc = len(self.entries)
+            self.entries.append(entry)
+
+            weighted_tf = {}
+            length = 0.0
+            for field, text in searchable_fields(entry):
+                weight = FIELD_WEIGHTS.get(field, DEFAULT_FIELD_WEIGHT)
+                for token in tokenize(text):
+                    weighted_tf[token] = weighted_tf.get(token, 0.0) + weight
+                    length += weight
+            doc_lengths.append(length)
+
+            for token, tf in weighted_tf.items():
+                docs, weights = postings.setdefault(token, (array('I'), array('f')))
+                docs.append(doc)
+                weights.append(tf)
+
+        self.postings = postings
+        self.vocabulary = sorted(postings)
+        avg_length = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+        # Per-document BM25 length normalization, precomputed once
+        self.norms = array('f', (K1 * (1 - B + B * length / avg_length) if avg_length else K1 for length in doc_lengths))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def expand(self, term, allow_prefix):
+        """Returns [(token, factor)]: the exact token plus up to MAX_PREFIX_EXPANSIONS prefix completions."""
+        matches = [(term, 1.0)] if term in self.postings else []
+        if not allow_prefix or len(term) < MIN_PREFIX_LENGTH:
+            return matches
+
+        start = bisect.bisect_left(self.vocabulary, term)
+        for token in self.vocabulary[start:start + MAX_PREFIX_EXPANSIONS + 1]:
+            if not token.startswith(term):
+                break
+            if token != term:
+                matches.append((token, PREFIX_FACTOR))
+        return matches
+
+    def score_term(self, term, allow_prefix, candidates=None):
+        """
+        BM25 scores {doc: score} of one query term, taking the best of its exact/prefix expansions.
+        With a small candidate set (from earlier AND terms) the postings are probed by bisect instead of scanned.
+        """
+        total_docs = len(self.entries)
+        norms = self.norms
+        scores = {}
+
+        for token, factor in self.expand(term, allow_prefix):
+            docs, weights = self.postings[token]
+            idf = math.log(1 + (total_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+
+            if candidates is not None and len(candidates) * 8 < len(docs):
+                matches = []
+                for doc in candidates:
+                    position = bisect.bisect_left(docs, doc)
+                    if position < len(docs) and docs[position] == doc:
+                        matches.append((doc, weights[position]))
+            else:
+                matches = zip(docs, weights)
+
+            for doc, tf in matches:
+                score = factor * idf * tf * (K1 + 1) / (tf + norms[doc])
+                if score > scores.get(doc, 0.0):
+                    scores[doc] = score
+        return scores
+
+    def search(self, query, limit=20, prefix=True):
+        """
+        Ranked search: every query term must match (exactly or, if prefix is enabled, as a prefix).
+        Returns [(entry, score)] best first.
+        """
+        terms = tokenize(query)
+        if not terms or not self.entries:
+            return []
+
+        scores = None
+        # Rarest terms first keeps the candidate set small
+        for term in sorted(set(terms), key=lambda t: len(self.postings.get(t, ((),))[0])):
+            term_scores = self.score_term(term, prefix, candidates=None if scores is None else sorted(scores))
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {doc: score + term_scores[doc] for doc, score in scores.items() if doc in term_scores}
+            if not scores:
+                return []
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(self.entries[doc], score) for doc, score in best]
@@ -1,7 +1,9 @@
+from common import bootstrap # First import: starts the init timer
+from common import tracing
+from common import probe
+
 import json
 import os
-import subprocess
-import boto3
 import uuid
 import logging
 from decimal import Decimal
@@ -9,6 +11,11 @@ import sys
 import csv
 from io import StringIO
 import math
+import base64
+import hashlib
+from urllib.parse import unquote_plus
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
 # Configure logging
 logger = logging.getLogger()
@@ -17,16 +24,37 @@ logger.setLevel(logging.INFO)
 # --- Configuration (Set as Lambda Environment Variables) ---
 DYNAMODB_TABLE_NAME = os.environ.get('VIDEO_METADATA_TABLE_NAME') 
 SQS_SEGMENTATION_QUEUE_URL = os.environ.get('SQS_SEGMENTATION_QUEUE_URL') 
+THUMBNAIL_FUNCTION_NAME = os.environ.get('THUMBNAIL_FUNCTION_NAME') # Thumbnail derivative Lambda (optional)
 FFPROBE_PATH = '/opt/bin/ffprobe' # Path to ffprobe in the Lambda Layer
 CHUNK_SIZE_SECONDS = 60.0 # Standard chunk size for parallel processing
+MAX_CONCURRENT_RECORDS = int(os.environ.get('METADATA_MAX_CONCURRENCY', '8')) # Records of one S3 event processed in parallel
+
+# --- Content-hash deduplication ---
+# GSI with partition key 'ContentHash' (projection ALL or INCLUDE of the fields copied below)
+CONTENT_HASH_INDEX_NAME = os.environ.get('CONTENT_HASH_INDEX_NAME', 'ContentHash-index')
+DEDUP_ENABLED = os.environ.get('DEDUP_ENABLED', 'true').lower() == 'true'
+# Objects without a full-object S3 SHA-256 checksum are hashed by streaming them, up to this size
+STREAM_HASH_MAX_BYTES = int(os.environ.get('STREAM_HASH_MAX_BYTES', str(512 * 1024 * 1024)))
+STREAM_HASH_CHUNK_BYTES = 8 * 1024 * 1024
+# Technical and rendition fields an alias shares with the item that was actually transcoded
+SHARED_FIELDS = ['DurationSec', 'DurationMinutes', 'TotalChunks', 'ChunksCompleted', 'CompletedQualities',
+                 'TargetResolution', 'SourceCodec', 'SourceBitRateKbps', 'VideoSizeMB', 'ProcessedCDNPath']
+
+# --- Clients (created on first use: a duplicate upload never needs SQS, most never need Lambda) ---
+S3 = bootstrap.client('s3')
+SQS = bootstrap.client('sqs')
+LAMBDA = bootstrap.client('lambda')
 
-# --- Clients ---
-S3 = boto3.client('s3')
-DYNAMODB = boto3.resource('dynamodb')
-SQS = boto3.client('sqs')
+# Record workers live as long as the container, so their per-thread DynamoDB tables are reused by warm
+# invocations (threads are only started when an event carries more than one record)
+EXECUTOR = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_RECORDS)
 
 # --- Helper Functions ---
 
+def get_table():
+    """Returns the calling thread's DynamoDB Table (boto3 resources are NOT thread-safe)."""
+    return bootstrap.table(DYNAMODB_TABLE_NAME)
+
 def get_descriptive_metadata(bucket, csv_key):
     """
     Downloads and parses the user-provided CSV file.
@@ -57,33 +85,88 @@ def get_descriptive_metadata(bucket, csv_key):
         return {}
 
 
-# 2. TECHNICAL METADATA EXTRACTION USING FFPROBE
-def run_ffprobe(filepath):
-    """Executes the ffprobe command to extract detailed technical metadata."""
-    cmd = [
-        FFPROBE_PATH,
-        '-v', 'error',
-        '-print_format', 'json',
-        '-show_format',
-        '-show_streams',
-        filepath
-    ]
-    
-    try:
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, text=True)
-        return json.loads(result.stdout)
-    except Exception as e:
-        logger.error(f"FFprobe failure: {e}")
-        raise
+# 2. TECHNICAL METADATA: common.probe streams the header into ffprobe (see process step 3)
 
 
-def update_metadata_in_dynamodb(video_id, technical_metadata, descriptive_metadata, bucket, raw_key, thumbnail_key, video_size_bytes):
+# 3. CONTENT HASH + DEDUPLICATION
+def get_content_hash(bucket, key, size):
+    """
+    Identifies the upload's content as 'sha256:<size>:<hex digest of the whole object>', whichever way
+    it was uploaded. A full-object SHA-256 checksum stored by S3 (single PUT with a checksum) is used
+    as is; otherwise the object is streamed through SHA-256 if it is small enough.
+
+    Multipart sessions store a composite checksum (a hash of the part hashes, suffixed '-<parts>'),
+    which is not the object's SHA-256. Above STREAM_HASH_MAX_BYTES it is kept under its own
+    's3-sha256-composite:' scheme, so such uploads only deduplicate against other multipart uploads
+    of the same file (the part size is derived from the file size, so the value is deterministic).
+    Returns None when the content cannot be hashed cheaply.
+    """
+    head = S3.head_object(Bucket=bucket, Key=key, ChecksumMode='ENABLED')
+    checksum = head.get('ChecksumSHA256')
+    if checksum and '-' not in checksum:
+        return f"sha256:{size}:{base64.b64decode(checksum).hex()}"
+
+    if size > STREAM_HASH_MAX_BYTES:
+        if checksum:
+            return f"s3-sha256-composite:{size}:{checksum}"
+        logger.info(f"{key} has no stored checksum and is too large to hash ({size} bytes). Skipping dedup.")
+        return None
+
+    digest = hashlib.sha256()
+    body = S3.get_object(Bucket=bucket, Key=key)['Body']
+    for chunk in iter(lambda: body.read(STREAM_HASH_CHUNK_BYTES), b''):
+        digest.update(chunk)
+    return f"sha256:{size}:{digest.hexdigest()}"
+
+def find_processed_duplicate(content_hash):
+    """Returns a READY item that was transcoded from the same content, or None."""
+    table = get_table()
+    response = table.query(
+        IndexName=CONTENT_HASH_INDEX_NAME,
+        KeyConditionExpression='ContentHash = :hash',
+        ExpressionAttributeValues={':hash': content_hash}
+    )
+    for item in response.get('Items', []):
+        if item.get('Status') == 'READY':
+            return item
+    return None
+
+def register_duplicate(video_id, source_item, descriptive_metadata, bucket, raw_key, thumbnail_key, content_hash):
+    """
+    Creates the new video as an alias of already-processed content: its own catalog metadata,
+    but the renditions (and playback path) of the source video. Nothing is probed, segmented or encoded.
+    """
+    table = get_table()
+    # Aliases of aliases point at the original renditions
+    source_video_id = source_item.get('SourceVideoID') or source_item['VideoID']
+
+    item = {
+        'VideoID': video_id,
+        'Status': 'READY',
+        'CreatedAt': datetime.now(timezone.utc).isoformat(),
+        'SourceVideoID': source_video_id,
+        'ContentHash': content_hash,
+        'RawS3Key': raw_key,
+        'RawS3Bucket': bucket,
+        'ThumbnailKey': thumbnail_key,
+    }
+    item.update({field: source_item[field] for field in SHARED_FIELDS if field in source_item})
+    item.update(descriptive_metadata)
+
+    if 'title' not in item:
+        item['Title'] = os.path.basename(raw_key)
+
+    table.put_item(Item=item)
+    logger.info(f"{video_id} is a duplicate of {source_video_id}: linked to its renditions, transcoding skipped.")
+    return item
+
+def update_metadata_in_dynamodb(video_id, technical_metadata, descriptive_metadata, bucket, raw_key, thumbnail_key, video_size_bytes, content_hash=None):
     """Merges technical and dynamic descriptive metadata and saves the final record."""
     
     if not DYNAMODB_TABLE_NAME:
         raise EnvironmentError("DYNAMODB_TABLE_NAME environment variable is missing.")
         
-    table = DYNAMODB.Table(DYNAMODB_TABLE_NAME)
+    table = get_table()
     
     # Extracting core technical stream info
     video_stream = next((s for s in technical_metadata.get('streams', []) if s.get('codec_type') == 'video'), None)
@@ -99,6 +182,7 @@ def update_metadata_in_dynamodb(video_id, technical_metadata, descriptive_metada
     item = {
         'VideoID': video_id,
         'Status': 'PROCESSING',
+        'CreatedAt': datetime.now(timezone.utc).isoformat(), # Sort key of the Status/CreatedAt listing index
         
         # --- GENERATED TECHNICAL METADATA (Fixed Fields) ---
         'DurationSec': Decimal(str(duration_float)),
@@ -115,6 +199,8 @@ def update_metadata_in_dynamodb(video_id, technical_metadata, descriptive_metada
         'ThumbnailKey': thumbnail_key, 
         'ProcessedCDNPath': '', 
     }
+    if content_hash:
+        item['ContentHash'] = content_hash # Key of the ContentHash index used for deduplication
 
     # 2. DYNAMICALLY MERGE DESCRIPTIVE METADATA
     item.update(descriptive_metadata)
@@ -127,17 +213,18 @@ def update_metadata_in_dynamodb(video_id, technical_metadata, descriptive_metada
     logger.info(f"Successfully wrote merged metadata for {video_id} (Chunks: {total_chunks}) to DynamoDB.")
     return item
 
-def send_segmentation_job(video_id, bucket, key):
-    """Sends the job payload to the Segmentation Queue (SQS)."""
+def send_segmentation_job(video_id, bucket, key, owner, trace_context):
+    """Sends the job payload (with the owner for lane scheduling and the trace context) to the Segmentation Queue (SQS)."""
     
     if not SQS_SEGMENTATION_QUEUE_URL:
         raise EnvironmentError("SQS_SEGMENTATION_QUEUE_URL is not configured.")
 
-    job_message = {
+    job_message = tracing.inject({
         "VideoID": video_id, 
         "RawS3Key": key,
-        "RawS3Bucket": bucket
-    }
+        "RawS3Bucket": bucket,
+        "Owner": owner
+    }, trace_context)
 
     SQS.send_message(
         QueueUrl=SQS_SEGMENTATION_QUEUE_URL,
@@ -146,16 +233,45 @@ def send_segmentation_job(video_id, bucket, key):
     logger.info(f"Enqueued segmentation job for VideoID: {video_id} to SQS.")
 
 
-def lambda_handler(event, context):
+def request_thumbnail_derivatives(item, csv_key):
     """
-    Main Lambda entry point, triggered by S3 ObjectCreated event on the 'raw/' prefix.
+    Asynchronously invokes the thumbnail derivative stage (WebP/AVIF sizes for the catalog srcset).
+    Best effort: a failure here must not fail the upload.
+    """
+    if not THUMBNAIL_FUNCTION_NAME:
+        return
+    payload = {
+        'VideoID': item['VideoID'],
+        'RawS3Bucket': item['RawS3Bucket'],
+        'RawS3Key': item['RawS3Key'],
+        'ThumbnailKey': item.get('ThumbnailKey'),
+        'CsvKey': csv_key,
+        'DurationSec': float(item.get('DurationSec') or 0)
+    }
+    try:
+        LAMBDA.invoke(FunctionName=THUMBNAIL_FUNCTION_NAME, InvocationType='Event', Payload=json.dumps(payload))
+    except Exception as e:
+        logger.warning(f"Could not request thumbnail derivatives for {item['VideoID']}: {e}")
+
+
+def parse_event_time(event_time):
+    """S3 event time ("2026-01-01T12:00:00.000Z") as epoch seconds, or None."""
+    try:
+        return datetime.strptime(event_time, '%Y-%m-%dT%H:%M:%S.%fZ').replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def process_record(record):
+    """
+    Runs the metadata workflow for one S3 record (nothing is staged in /tmp).
+    Returns a result dict; failures are reported in it instead of raised, so one bad file
+    does not stop the rest of the batch.
     """
-    
     # 1. Extract S3 Bucket, Key, and Generate Unique Video ID
     try:
-        record = event['Records'][0]
         bucket = record['s3']['bucket']['name']
-        raw_key = record['s3']['object']['key']
+        raw_key = unquote_plus(record['s3']['object']['key']) # S3 event keys are URL-encoded
         video_size_bytes = record['s3']['object']['size'] # Extract size from S3 event record
         
         # Derive Video ID from the filename base
@@ -167,50 +283,88 @@ def lambda_handler(event, context):
         thumbnail_key = f"thumbnails/{filename_base}.jpeg"
         
     except Exception as e:
-        logger.error(f"Error parsing S3 event: {e}")
-        return {'statusCode': 400, 'body': 'Invalid S3 event format.'}
+        logger.error(f"Error parsing S3 event record: {e}")
+        return {'statusCode': 400, 'error': 'Invalid S3 event format.'}
 
-    local_path = f"/tmp/{os.path.basename(raw_key)}"
-    
-    try:
-        # 2. Retrieve Technical Metadata (Download header for FFprobe)
-        s3_object = S3.get_object(
-            Bucket=bucket,
-            Key=raw_key,
-            Range='bytes=0-5242880'
-        )
-        with open(local_path, 'wb') as f:
-            f.write(s3_object['Body'].read())
-        
-        ffprobe_output = run_ffprobe(local_path)
-        
-        # 3. Retrieve Descriptive Metadata (Fetch CSV data dynamically)
-        descriptive_metadata = get_descriptive_metadata(bucket, csv_key)
+    # Trace keyed by the new VideoID; S3 -> Lambda delivery time is the first queue wait
+    trace = tracing.start_trace(video_id)
+    tracing.record_queue_wait('metadata', dict(trace, SentAt=parse_event_time(record.get('eventTime'))))
+
+    with tracing.span('metadata', trace, RawS3Key=raw_key) as metadata_span:
+        try:
+            # 2. Deduplicate: identical content that is already processed is linked, not transcoded again
+            content_hash = None
+            if DEDUP_ENABLED:
+                content_hash = get_content_hash(bucket, raw_key, video_size_bytes)
+                source_item = find_processed_duplicate(content_hash) if content_hash else None
+                if source_item:
+                    descriptive_metadata = get_descriptive_metadata(bucket, csv_key)
+                    dynamo_item = register_duplicate(video_id, source_item, descriptive_metadata, bucket, raw_key, thumbnail_key, content_hash)
+                    request_thumbnail_derivatives(dynamo_item, csv_key)
+                    metadata_span.set(Deduplicated=True)
+                    return {'statusCode': 200, 'RawS3Key': raw_key, 'VideoID': video_id,
+                            'Status': dynamo_item['Status'], 'SourceVideoID': dynamo_item['SourceVideoID']}
+
+            # 3. Retrieve Technical Metadata (header streamed into FFprobe)
+            with tracing.span('metadata.probe', metadata_span.context):
+                ffprobe_output = probe.probe_s3_object(S3, bucket, raw_key, FFPROBE_PATH)
         
-        # 4. Save, Link, and Trigger
-        dynamo_item = update_metadata_in_dynamodb(video_id, ffprobe_output, descriptive_metadata, bucket, raw_key, thumbnail_key, video_size_bytes)
+            # 4. Retrieve Descriptive Metadata (Fetch CSV data dynamically)
+            descriptive_metadata = get_descriptive_metadata(bucket, csv_key)
         
-        send_segmentation_job(video_id, bucket, raw_key)
+            # 5. Save, Link, and Trigger
+            dynamo_item = update_metadata_in_dynamodb(video_id, ffprobe_output, descriptive_metadata, bucket, raw_key, thumbnail_key, video_size_bytes, content_hash)
         
-        # 5. Clean up
-        os.remove(local_path)
+            send_segmentation_job(video_id, bucket, raw_key, descriptive_metadata.get('owner'), metadata_span.context)
+            request_thumbnail_derivatives(dynamo_item, csv_key) # Runs alongside segmentation
 
-        logger.info(f"Workflow initiated successfully for VideoID: {video_id}")
-        
-        return {
-            'statusCode': 200,
-            'body': json.dumps({'VideoID': video_id, 'Status': dynamo_item['Status']})
-        }
+            logger.info(f"Workflow initiated successfully for VideoID: {video_id}")
+            return {'statusCode': 200, 'RawS3Key': raw_key, 'VideoID': video_id, 'Status': dynamo_item['Status']}
 
-    except Exception as e:
-        logger.error(f"CRITICAL Failure for VideoID: {video_id}. Error: {e}", exc_info=True)
+        except Exception as e:
+            logger.error(f"CRITICAL Failure for VideoID: {video_id} ({raw_key}). Error: {e}", exc_info=True)
+            metadata_span.fail(e)
         
-        # Check if the failure was due to a missing CSV file (NoSuchKey)
-        if 'NoSuchKey' in str(e) or 'AccessDenied' in str(e):
-             logger.warning(f"Associated asset (CSV or Thumbnail) may be missing or inaccessible. Allowing retry.")
+            # Check if the failure was due to a missing CSV file (NoSuchKey)
+            if 'NoSuchKey' in str(e) or 'AccessDenied' in str(e):
+                 logger.warning(f"Associated asset (CSV or Thumbnail) may be missing or inaccessible. Allowing retry.")
         
-        # Global error handling: log the failure and return 500
-        return {
-            'statusCode': 500,
-            'body': json.dumps({'error': str(e), 'message': 'Failed to process video metadata.'})
-        }
\ No newline at end of file
+            return {'statusCode': 500, 'RawS3Key': raw_key, 'VideoID': video_id, 'error': str(e)}
+
+
+@bootstrap.measure_cold_start
+def lambda_handler(event, context):
+    """
+    Main Lambda entry point, triggered by S3 ObjectCreated event on the 'raw/' prefix.
+    Every record of the notification is processed, up to MAX_CONCURRENT_RECORDS at a time.
+    """
+    records = event.get('Records') or []
+    if not records:
+        logger.error("S3 event contains no records.")
+        return {'statusCode': 400, 'body': 'Invalid S3 event format.'}
+
+    if len(records) == 1:
+        results = [process_record(records[0])]
+    else:
+        results = list(EXECUTOR.map(process_record, records))
+
+    failed = [r for r in results if r['statusCode'] != 200]
+    logger.info(f"Processed {len(results)} record(s): {len(results) - len(failed)} succeeded, {len(failed)} failed.")
+
+    if len(results) == 1:
+        # Single-record events keep the original response shape
+        result = results[0]
+        if result['statusCode'] == 200:
+            return {'statusCode': 200, 'body': json.dumps({k: v for k, v in result.items() if k not in ('statusCode', 'RawS3Key')})}
+        if result['statusCode'] == 400:
+            return {'statusCode': 400, 'body': result['error']}
+        return {'statusCode': 500, 'body': json.dumps({'error': result['error'], 'message': 'Failed to process video metadata.'})}
+
+    # Global error handling: any failed record makes the batch a 500, with per-record results
+    return {
+        'statusCode': 500 if failed else 200,
+        'body': json.dumps({'results': results, 'failed': len(failed)})
+    }
+
+
+bootstrap.init_complete('ContentMetaDataService')
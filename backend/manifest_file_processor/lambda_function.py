@@ -1,9 +1,13 @@
+from common import bootstrap # First import: starts the init timer
+from common import tracing
+
 import json
 import os
-import boto3
 import logging
 import math
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
+from datetime import datetime, timezone
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -13,10 +17,15 @@ DYNAMODB_TABLE_NAME = os.environ.get('VIDEO_METADATA_TABLE_NAME')
 PROCESSED_S3_BUCKET = os.environ.get('PROCESSED_S3_BUCKET')
 CLOUDFRONT_DOMAIN = os.environ.get('CLOUDFRONT_DOMAIN')
 CHUNK_DURATION_SEC = 60 # Must match the Segmentation Service setting
+MAX_CONCURRENT_VIDEOS = int(os.environ.get('FINALIZER_MAX_CONCURRENCY', '8')) # Videos finalized in parallel per batch
+FINALIZE_LEASE_SEC = 900 # Lambda maximum timeout: an older claim belongs to an invocation that died
 
 # --- Clients ---
-DYNAMODB = boto3.resource('dynamodb')
-S3 = boto3.client('s3')
+S3 = bootstrap.client('s3') # Clients are thread-safe and shared by the batch workers (created on first use)
+
+# Batch workers live as long as the container, so their per-thread DynamoDB tables are reused by warm
+# invocations (threads are only started when a batch carries more than one video)
+EXECUTOR = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_VIDEOS)
 
 # --- DUPLICATE BITRATE LADDER from job-worker.py (REQUIRED for manifest generation) ---
 MASTER_BITRATE_LADDER = {
@@ -29,19 +38,26 @@ MASTER_BITRATE_LADDER = {
 
 # Master manifest format template
 MASTER_MANIFEST_TEMPLATE = """#EXTM3U
-#EXT-X-VERSION:3
+#EXT-X-VERSION:4
 {streams}"""
 
 # Stream template for a single resolution in the master manifest (links to the sequential playlist)
-STREAM_TEMPLATE = """#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={resolution}
+STREAM_TEMPLATE = """#EXT-X-STREAM-INF:{attributes}
 {quality_folder}/sequential.m3u8"""
 
+# I-frame (trick-play) stream for a single resolution in the master manifest
+IFRAME_STREAM_TEMPLATE = '#EXT-X-I-FRAME-STREAM-INF:{attributes},URI="{quality_folder}/iframes.m3u8"'
+
 # --- Helper Functions ---
 
+def get_table():
+    """Returns the calling thread's DynamoDB Table (boto3 resources are NOT thread-safe)."""
+    return bootstrap.table(DYNAMODB_TABLE_NAME)
+
 def update_dynamo_status(video_id, status, cdn_path=None):
     """Updates the video status in the DynamoDB table."""
     try:
-        table = DYNAMODB.Table(DYNAMODB_TABLE_NAME)
+        table = get_table()
         update_expression = "SET #S = :s"
         expression_attribute_values = {':s': status}
         
@@ -59,47 +75,94 @@ def update_dynamo_status(video_id, status, cdn_path=None):
     except Exception as e:
         logger.error(f"ERROR: Failed to update DynamoDB for {video_id}. Full Error: {e}")
 
-def update_chunk_counter(video_id, total_chunks, completed_qualities):
-    """
-    Atomically increments the ChunksCompleted counter and tracks completed qualities.
-    Returns the current state.
-    """
-    table = DYNAMODB.Table(DYNAMODB_TABLE_NAME)
-    
-    # Atomically increment the count and add the completed qualities to a set
-    response = table.update_item(
-        Key={'VideoID': video_id},
-        UpdateExpression="SET #S = :s_processing, ChunksCompleted = if_not_exists(ChunksCompleted, :start) + :inc ADD CompletedQualities :q",
-        ExpressionAttributeNames={'#S': 'Status'},
-        ExpressionAttributeValues={
-            ':inc': Decimal(1),
-            ':start': Decimal(0),
-            ':s_processing': 'PROCESSING',
-            # DynamoDB requires Sets for adding multiple distinct items
-            ':q': set(completed_qualities)
-        },
-        ReturnValues="UPDATED_NEW"
-    )
+def update_chunk_counter(video_id, chunk_ids, completed_qualities):
+    """
+    Records every completed chunk of a video from the current batch in ONE DynamoDB update.
+    Chunk IDs are ADDed to the CompletedChunks set, so a redelivered message is not counted twice.
+    LastProgressAt tells the sweeper (sweeper_service) that the video is still moving.
+    Returns the current state, or None for a late signal of a video that is already READY.
+    """
+    table = get_table()
+    
+    # Atomically add the completed chunks/qualities to their sets and bump the counter
+    try:
+        response = table.update_item(
+            Key={'VideoID': video_id},
+            UpdateExpression="SET #S = :s_processing, LastProgressAt = :now, ChunksCompleted = if_not_exists(ChunksCompleted, :start) + :inc ADD CompletedChunks :c, CompletedQualities :q",
+            ConditionExpression="#S <> :s_ready",
+            ExpressionAttributeNames={'#S': 'Status'},
+            ExpressionAttributeValues={
+                ':inc': Decimal(len(chunk_ids)),
+                ':start': Decimal(0),
+                ':s_processing': 'PROCESSING',
+                ':s_ready': 'READY',
+                ':now': datetime.now(timezone.utc).isoformat(),
+                # DynamoDB requires Sets for adding multiple distinct items
+                ':c': set(chunk_ids),
+                ':q': set(completed_qualities)
+            },
+            ReturnValues="ALL_NEW"
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return None
     return response['Attributes']
 
+def claim_finalization(video_id):
+    """
+    Takes the video's finalization lease (FinalizeStartedAt), unless the video is READY or another
+    invocation holds a live lease. Only the caller that gets True stitches the video.
+    """
+    table = get_table()
+    now = datetime.now(timezone.utc)
+    try:
+        table.update_item(
+            Key={'VideoID': video_id},
+            UpdateExpression="SET FinalizeStartedAt = :now",
+            ConditionExpression="#S <> :s_ready AND (attribute_not_exists(FinalizeStartedAt) OR FinalizeStartedAt < :stale)",
+            ExpressionAttributeNames={'#S': 'Status'},
+            ExpressionAttributeValues={
+                ':now': now.isoformat(),
+                ':s_ready': 'READY',
+                ':stale': datetime.fromtimestamp(now.timestamp() - FINALIZE_LEASE_SEC, timezone.utc).isoformat()
+            }
+        )
+        return True
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return False
+
+def release_finalization(video_id):
+    """Drops the lease after a failed stitch, so the SQS retry (or a sweeper re-drive) can take it again."""
+    try:
+        get_table().update_item(Key={'VideoID': video_id}, UpdateExpression="REMOVE FinalizeStartedAt")
+    except Exception as e:
+        logger.error(f"Failed to release the finalization lease of {video_id}: {e}")
+
+
+def get_chunk_ids(total_chunks, video_duration):
+    """Returns the chunk IDs ("0000-0060") in playback order, matching the JobWorker's naming."""
+    video_duration = float(video_duration)
+    chunk_ids = []
+    for i in range(total_chunks):
+        start_time = i * CHUNK_DURATION_SEC
+        calculated_end_time = min(start_time + CHUNK_DURATION_SEC, video_duration)
+        chunk_ids.append(f"{int(start_time):04d}-{int(calculated_end_time):04d}")
+    return chunk_ids
 
 def stitch_chunk_manifests(video_id, quality, total_chunks, video_duration):
     """
     Stitches together individual chunk manifests into one seamless sequential.m3u8 playlist.
     Removes header/footer tags from individual chunks to prevent HLS specification errors.
+    Returns the manifest key and the (segment file, duration) list used for bitrate measurement.
     """
     
     # 1. Initialize the sequential manifest with the required single header
     sequential_content = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{CHUNK_DURATION_SEC}"]
     # NOTE: #EXT-X-MEDIA-SEQUENCE is often omitted or set to 0, which is handled implicitly by starting the sequence.
 
-    video_duration = float(video_duration)
+    segments = [] # (segment file name, EXTINF duration) in playback order
     
     # 2. Iterate through all expected chunks
-    for i in range(total_chunks):
-        start_time = i * CHUNK_DURATION_SEC
-        calculated_end_time = min(start_time + CHUNK_DURATION_SEC, video_duration)
-        chunk_id = f"{int(start_time):04d}-{int(calculated_end_time):04d}" 
+    for chunk_id in get_chunk_ids(total_chunks, video_duration):
         chunk_manifest_key = f"processed/{video_id}/{quality}/chunk_{chunk_id}.m3u8"
         
         try:
@@ -107,6 +170,7 @@ def stitch_chunk_manifests(video_id, quality, total_chunks, video_duration):
             manifest_data = response['Body'].read().decode('utf-8')
             
             # 3. CRITICAL FIX: Append only the segment information and duration tags
+            segment_duration = None
             for line in manifest_data.splitlines():
                 
                 # Exclude ALL HEADER/FOOTER tags to prevent duplication
@@ -122,9 +186,13 @@ def stitch_chunk_manifests(video_id, quality, total_chunks, video_duration):
                     continue
                 
                 # Now, append the segment URLs and duration tags (#EXTINF)
-                if line.endswith('.ts'):
+                if line.startswith('#EXTINF:'):
+                    segment_duration = float(line[len('#EXTINF:'):].split(',')[0])
+                    sequential_content.append(line)
+                elif line.endswith('.ts'):
                     # Prefix the segment URL with the quality folder for the sequential playlist
                     sequential_content.append(f"{quality}/{line}")
+                    segments.append((line, segment_duration))
                 else:
                     sequential_content.append(line)
                     
@@ -147,48 +215,230 @@ def stitch_chunk_manifests(video_id, quality, total_chunks, video_duration):
         Body=final_manifest_body,
         ContentType='application/x-mpegURL'
     )
-    return final_manifest_key
+    return final_manifest_key, segments
+
+def stitch_iframe_playlists(video_id, quality, total_chunks, video_duration):
+    """
+    Stitches the per-chunk I-frame playlists into one EXT-X-I-FRAMES-ONLY iframes.m3u8 for a rendition.
+    Returns the peak I-frame bitrate for the master manifest, or None if any chunk lacks I-frame data.
+    """
+    entries = []
+    peak_bps = 0
+    max_duration = 0.0
+    
+    for chunk_id in get_chunk_ids(total_chunks, video_duration):
+        iframe_key = f"processed/{video_id}/{quality}/chunk_{chunk_id}_iframes.m3u8"
+        try:
+            response = S3.get_object(Bucket=PROCESSED_S3_BUCKET, Key=iframe_key)
+            chunk_lines = response['Body'].read().decode('utf-8').splitlines()
+        except Exception as e:
+            logger.warning(f"Missing I-frame playlist {iframe_key}. Skipping trick-play for {quality}. Error: {e}")
+            return None
+        
+        duration = None
+        for line in chunk_lines:
+            if line.startswith('#EXTINF:'):
+                duration = float(line[len('#EXTINF:'):].split(',')[0])
+                max_duration = max(max_duration, duration)
+            elif line.startswith('#EXT-X-BYTERANGE:') and duration:
+                length = int(line[len('#EXT-X-BYTERANGE:'):].split('@')[0])
+                peak_bps = max(peak_bps, math.ceil(length * 8 / duration))
+            entries.append(line)
+    
+    iframe_content = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:4",
+        f"#EXT-X-TARGETDURATION:{max(1, math.ceil(max_duration))}",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+        "#EXT-X-I-FRAMES-ONLY"
+    ]
+    iframe_content.extend(entries)
+    iframe_content.append("#EXT-X-ENDLIST")
+    
+    try:
+        S3.put_object(
+            Bucket=PROCESSED_S3_BUCKET,
+            Key=f"processed/{video_id}/{quality}/iframes.m3u8",
+            Body='\n'.join(iframe_content),
+            ContentType='application/x-mpegURL'
+        )
+    except Exception as e:
+        # Non-fatal: the master manifest then omits the I-frame stream for this rendition
+        logger.warning(f"Could not write the I-frame playlist of {video_id}/{quality}. Skipping trick-play. Error: {e}")
+        return None
+    return peak_bps
+
+def stitch_thumbnail_track(video_id, total_chunks, video_duration):
+    """
+    Concatenates the per-chunk WebVTT cue files into processed/{video_id}/thumbnails.vtt.
+    Seek previews are optional, so missing chunks are skipped rather than failing finalization.
+    """
+    vtt_content = ["WEBVTT", ""]
+    
+    for chunk_id in get_chunk_ids(total_chunks, video_duration):
+        chunk_vtt_key = f"processed/{video_id}/thumbs/chunk_{chunk_id}.vtt"
+        try:
+            response = S3.get_object(Bucket=PROCESSED_S3_BUCKET, Key=chunk_vtt_key)
+            chunk_vtt = response['Body'].read().decode('utf-8')
+        except Exception as e:
+            logger.warning(f"Missing thumbnail track {chunk_vtt_key}. Error: {e}")
+            continue
+        
+        # Drop the per-chunk WEBVTT header, keep the cues
+        cues = chunk_vtt.split('\n', 1)[1].strip() if '\n' in chunk_vtt else ''
+        if cues:
+            vtt_content.append(cues)
+            vtt_content.append("")
+    
+    if len(vtt_content) == 2:
+        return None
+    
+    thumbnail_track_key = f"processed/{video_id}/thumbnails.vtt"
+    try:
+        S3.put_object(
+            Bucket=PROCESSED_S3_BUCKET,
+            Key=thumbnail_track_key,
+            Body='\n'.join(vtt_content),
+            ContentType='text/vtt'
+        )
+    except Exception as e:
+        # Non-fatal: seek previews are optional, playback is not affected
+        logger.warning(f"Could not write the thumbnail track of {video_id}. Error: {e}")
+        return None
+    return thumbnail_track_key
 
-def generate_master_manifest(video_id, qualities):
+def get_segment_sizes(video_id, quality):
+    """Lists the uploaded .ts segments of a rendition and returns {file name: size in bytes}."""
+    prefix = f"processed/{video_id}/{quality}/"
+    sizes = {}
+    
+    paginator = S3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=PROCESSED_S3_BUCKET, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            if obj['Key'].endswith('.ts'):
+                sizes[obj['Key'][len(prefix):]] = obj['Size']
+    return sizes
+
+def get_rendition_info(video_id, quality):
+    """Reads the resolution/codecs descriptor the JobWorker probed from the encoded output."""
+    try:
+        response = S3.get_object(Bucket=PROCESSED_S3_BUCKET, Key=f"processed/{video_id}/{quality}/rendition.json")
+        return json.loads(response['Body'].read())
+    except Exception as e:
+        logger.warning(f"No rendition descriptor for {video_id}/{quality}, using nominal ladder values. Error: {e}")
+        return {}
+
+def measure_rendition(video_id, quality, segments):
+    """
+    Computes the real peak and average bitrate of a rendition from its segment sizes and durations.
+    Segment sizes include audio and MPEG-TS container overhead, which is what the player actually downloads.
+    """
+    sizes = get_segment_sizes(video_id, quality)
+    
+    peak_bps = 0
+    total_bits = 0
+    total_duration = 0.0
+    for segment_file, duration in segments:
+        size = sizes.get(segment_file)
+        if size is None or not duration:
+            continue
+        
+        bits = size * 8
+        peak_bps = max(peak_bps, math.ceil(bits / duration))
+        total_bits += bits
+        total_duration += duration
+
+    if not total_duration:
+        return None
+    
+    return {
+        'peak': peak_bps,
+        'average': math.ceil(total_bits / total_duration)
+    }
+
+def get_nominal_stream_data(quality):
+    """Fallback stream attributes derived from the bitrate ladder (used when measurement is unavailable)."""
+    settings = MASTER_BITRATE_LADDER[quality]
+    
+    # Calculate approximate screen width (W=H*16/9)
+    # Use 854 for 480p standard 16:9 compliance
+    height = settings['height']
+    width = 854 if height == 480 else int(height * (16/9))
+    
+    # Convert '5000k' to 5000000 integer and add the audio bitrate
+    bandwidth = int(settings['vbr'].replace('k', '000')) + int(settings['abr'].replace('k', '000'))
+    
+    return {
+        'bandwidth': bandwidth,
+        'average_bandwidth': None,
+        'resolution': f"{width}x{height}",
+        'codecs': None
+    }
+
+def generate_master_manifest(video_id, qualities, rendition_segments=None, iframe_bandwidths=None):
     """
     Generates the master manifest file that links to all sequential playlists.
-    Sorts streams by BANDWIDTH (descending) as per HLS best practice.
+    BANDWIDTH/AVERAGE-BANDWIDTH are measured from the stitched segments, RESOLUTION/CODECS
+    come from the JobWorker's probe of the output. Sorts streams by BANDWIDTH (descending).
+    Renditions with an I-frame playlist also get an EXT-X-I-FRAME-STREAM-INF entry.
     """
+    rendition_segments = rendition_segments or {}
+    iframe_bandwidths = iframe_bandwidths or {}
     
     # 1. Collect stream data for only the successful qualities
     stream_data = []
     for quality in qualities:
-        settings = MASTER_BITRATE_LADDER.get(quality)
-        if not settings: continue
+        if quality not in MASTER_BITRATE_LADDER: continue
+        
+        data = get_nominal_stream_data(quality)
         
-        # Calculate approximate screen width (W=H*16/9)
-        # Use 854 for 480p standard 16:9 compliance
-        height = settings['height']
-        width = 854 if height == 480 else int(height * (16/9))
+        measured = measure_rendition(video_id, quality, rendition_segments.get(quality, []))
+        if measured:
+            data['bandwidth'] = measured['peak']
+            data['average_bandwidth'] = measured['average']
         
-        stream_data.append({
-            # Convert '5000k' to 5000000 integer for sorting
-            'bandwidth': int(settings['vbr'].replace('k', '000')),
-            'resolution': f"{width}x{height}",
-            'quality_folder': quality
-        })
+        rendition_info = get_rendition_info(video_id, quality)
+        data['resolution'] = rendition_info.get('Resolution') or data['resolution']
+        data['codecs'] = rendition_info.get('Codecs') or None
+        data['quality_folder'] = quality
+        
+        stream_data.append(data)
 
     # 2. Sort the streams by BANDWIDTH in descending order (CRITICAL FIX)
     stream_data.sort(key=lambda x: x['bandwidth'], reverse=True)
     
     master_streams = []
+    iframe_streams = []
     
     # 3. Format the sorted data into the final manifest strings
     for data in stream_data:
+        attributes = [f"BANDWIDTH={data['bandwidth']}"]
+        if data['average_bandwidth']:
+            attributes.append(f"AVERAGE-BANDWIDTH={data['average_bandwidth']}")
+        attributes.append(f"RESOLUTION={data['resolution']}")
+        if data['codecs']:
+            attributes.append(f'CODECS="{data["codecs"]}"')
+        
         master_streams.append(STREAM_TEMPLATE.format(
-            bandwidth=data['bandwidth'], 
-            resolution=data['resolution'], 
+            attributes=','.join(attributes), 
             quality_folder=data['quality_folder']
         ))
+        
+        iframe_bandwidth = iframe_bandwidths.get(data['quality_folder'])
+        if iframe_bandwidth:
+            iframe_attributes = [f"BANDWIDTH={iframe_bandwidth}", f"RESOLUTION={data['resolution']}"]
+            # I-frame playlists carry video only
+            video_codecs = [c for c in (data['codecs'] or '').split(',') if c.startswith('avc1')]
+            if video_codecs:
+                iframe_attributes.append(f'CODECS="{video_codecs[0]}"')
+            iframe_streams.append(IFRAME_STREAM_TEMPLATE.format(
+                attributes=','.join(iframe_attributes),
+                quality_folder=data['quality_folder']
+            ))
 
     # 4. Combine streams and create the master file
     master_key = f"processed/{video_id}/master.m3u8"
-    final_manifest_body = MASTER_MANIFEST_TEMPLATE.format(streams='\n'.join(master_streams))
+    final_manifest_body = MASTER_MANIFEST_TEMPLATE.format(streams='\n'.join(master_streams + iframe_streams))
     
     S3.put_object(
         Bucket=PROCESSED_S3_BUCKET,
@@ -200,56 +450,127 @@ def generate_master_manifest(video_id, qualities):
     return f"https://{CLOUDFRONT_DOMAIN}/{master_key}"
 
 
-def lambda_handler(event, context):
-    """Triggered by the FinalizerQueue with chunk completion messages."""
+def finalize_video(video_id, total_chunks, final_qualities, trace_context):
+    """Runs the final assembly in the 'finalize.stitch' span; its end is the video's READY time in the trace."""
+    with tracing.span('finalize.stitch', trace_context, Qualities=len(final_qualities)):
+        stitch_and_publish(video_id, total_chunks, final_qualities)
+
+
+def stitch_and_publish(video_id, total_chunks, final_qualities):
+    """Stitches every rendition, writes the master manifest and marks the video READY."""
+    logger.info(f"Video {video_id} is fully transcoded. Starting manifest assembly.")
+    
+    # Fetch video duration from DynamoDB (REQUIRED FOR STITCHING)
+    video_item = get_table().get_item(Key={'VideoID': video_id})['Item']
+    video_duration = video_item['DurationSec'] 
     
-    dynamo_table = DYNAMODB.Table(DYNAMODB_TABLE_NAME) # Access table once
-    video_id = None # Initialize for logging if parsing fails
+    # A. Stitch all chunks for EACH quality level
+    rendition_segments = {}
+    iframe_bandwidths = {}
+    for quality in final_qualities:
+        # **MODIFIED CALL: Pass video_duration**
+        _, segments = stitch_chunk_manifests(video_id, quality, total_chunks, video_duration) 
+        rendition_segments[quality] = segments
+        iframe_bandwidths[quality] = stitch_iframe_playlists(video_id, quality, total_chunks, video_duration)
+    
+    # Trick-play thumbnails (sprite sheets + WebVTT) shared by all qualities
+    stitch_thumbnail_track(video_id, total_chunks, video_duration)
+        
+    # B. Generate the final Master Manifest linking all sequential playlists
+    final_cdn_url = generate_master_manifest(video_id, final_qualities, rendition_segments, iframe_bandwidths)
+    
+    # C. Set final READY status and CDN path in DynamoDB
+    update_dynamo_status(video_id, 'READY', cdn_path=final_cdn_url)
+    logger.info(f"Finalization complete. CDN URL: {final_cdn_url}")
+
+
+def process_video_group(video_id, jobs):
+    """Applies all completion signals of one video from the batch, finalizing it if it is complete."""
+    total_chunks = int(jobs[0]['TotalChunks'])
+    chunk_ids = [str(job['ChunkID']) for job in jobs]
+    completed_qualities = {q for job in jobs for q in job['CompletedQualities']}
+    # The group continues the trace of its most recently sent signal
+    trace = max((tracing.extract(job) for job in jobs), key=lambda t: t.get('SentAt') or 0)
     
+    logger.info(f"Received {len(jobs)} completion signal(s) for VideoID: {video_id}, Chunks: {chunk_ids}")
+    
+    # 1. Record completed chunks and qualities (one write per video per batch)
+    with tracing.span('finalize.record', trace, Chunks=len(chunk_ids)) as record_span:
+        updated_state = update_chunk_counter(video_id, chunk_ids, completed_qualities)
+        if updated_state is None:
+            logger.info(f"Video {video_id} is already READY. Ignoring late signal(s) {chunk_ids}.")
+            record_span.set(AlreadyReady=True)
+            return
+        chunks_completed = len(updated_state.get('CompletedChunks', set()))
+        record_span.set(ChunksCompleted=chunks_completed, TotalChunks=total_chunks)
+    
+    logger.info(f"Video {video_id}: Chunks completed: {chunks_completed} / {total_chunks}")
+    
+    # 2. Check for Full Completion (only one invocation stitches a video)
+    if chunks_completed >= total_chunks:
+        if not claim_finalization(video_id):
+            logger.info(f"Video {video_id} is READY or being finalized by another invocation. Skipping.")
+            return
+        # Get the final set of unique qualities produced across all chunks
+        final_qualities = list(updated_state.get('CompletedQualities', set()))
+        try:
+            finalize_video(video_id, total_chunks, final_qualities, record_span.context)
+        except Exception:
+            release_finalization(video_id)
+            raise
+
+
+@bootstrap.measure_cold_start
+def lambda_handler(event, context):
+    """
+    Triggered by the FinalizerQueue with chunk completion messages.
+    Records are grouped by VideoID and the groups are processed concurrently. Failed messages are
+    reported individually via batchItemFailures (requires ReportBatchItemFailures on the event source
+    mapping), so SQS only redelivers those instead of the whole batch.
+    """
+    jobs_by_video = {}   # VideoID -> list of job payloads
+    message_ids = {}     # VideoID -> SQS message IDs carrying its signals
+    failed_message_ids = []
+    
+    # 1. Parse and group the batch
     for record in event['Records']:
         try:
             job_data = json.loads(record['body'])
-            
             video_id = job_data['VideoID']
-            chunk_id = job_data['ChunkID']
-            total_chunks = job_data['TotalChunks']
-            completed_qualities = job_data['CompletedQualities']
-            
-            logger.info(f"Received completion signal for VideoID: {video_id}, Chunk: {chunk_id}")
-            
-            # 1. Increment completed chunk counter and track qualities
-            updated_state = update_chunk_counter(video_id, total_chunks, completed_qualities)
-            chunks_completed = int(updated_state.get('ChunksCompleted', 0))
-            
-            logger.info(f"Video {video_id}: Chunks completed: {chunks_completed} / {total_chunks}")
-            
-            # 2. Check for Full Completion
-            if chunks_completed == total_chunks:
-                logger.info(f"Video {video_id} is fully transcoded. Starting manifest assembly.")
-                
-                # Fetch video duration from DynamoDB (REQUIRED FOR STITCHING)
-                video_item = dynamo_table.get_item(Key={'VideoID': video_id})['Item']
-                video_duration = video_item['DurationSec'] 
-                
-                # Get the final set of unique qualities produced across all chunks
-                final_qualities = list(updated_state.get('CompletedQualities', set()))
-
-                # A. Stitch all chunks for EACH quality level
-                for quality in final_qualities:
-                    # **MODIFIED CALL: Pass video_duration**
-                    stitch_chunk_manifests(video_id, quality, total_chunks, video_duration) 
-                    
-                # B. Generate the final Master Manifest linking all sequential playlists
-                final_cdn_url = generate_master_manifest(video_id, final_qualities)
-                
-                # C. Set final READY status and CDN path in DynamoDB
-                update_dynamo_status(video_id, 'READY', cdn_path=final_cdn_url)
-                logger.info(f"Finalization complete. CDN URL: {final_cdn_url}")
-
+            tracing.record_queue_wait('finalize', tracing.extract(job_data), Chunk=job_data.get('ChunkID'))
+            jobs_by_video.setdefault(video_id, []).append(job_data)
+            message_ids.setdefault(video_id, []).append(record['messageId'])
         except Exception as e:
-            # Use video_id if available, otherwise default to context request ID
-            log_id = video_id if video_id else context.aws_request_id 
-            logger.error(f"Finalizer critical failure for {log_id}: {e}", exc_info=True)
-            raise # Re-raise exception to cause SQS retry
+            logger.error(f"Malformed finalizer message {record.get('messageId')}: {e}", exc_info=True)
+            failed_message_ids.append(record['messageId'])
+    
+    # 2. Process each video's group (in parallel on the container's workers; one video runs inline)
+    if len(jobs_by_video) == 1:
+        video_id, jobs = next(iter(jobs_by_video.items()))
+        try:
+            process_video_group(video_id, jobs)
+        except Exception as e:
+            logger.error(f"Finalizer critical failure for {video_id}: {e}", exc_info=True)
+            # Report only this video's messages for SQS retry
+            failed_message_ids.extend(message_ids[video_id])
+    else:
+        futures = {
+            video_id: EXECUTOR.submit(process_video_group, video_id, jobs)
+            for video_id, jobs in jobs_by_video.items()
+        }
+        
+        for video_id, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"Finalizer critical failure for {video_id}: {e}", exc_info=True)
+                # Report only this video's messages for SQS retry
+                failed_message_ids.extend(message_ids[video_id])
+    
+    if failed_message_ids:
+        logger.warning(f"{len(failed_message_ids)} of {len(event['Records'])} messages failed and will be retried.")
+    
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed_message_ids]}
+
 
-    return {'statusCode': 200}
+bootstrap.init_complete('ManifestFileProcessor')
@@ -1,46 +1,44 @@
+from common import bootstrap # First import: starts the init timer
+from common import tracing
+from common import probe
+from common import chunk_jobs
+from common import fanout
+
 import json
 import os
-import boto3
-import subprocess
 import math
 import logging
 import uuid
 import shutil
 import sys
+from datetime import datetime, timezone
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 # --- Configuration (Set as Lambda Environment Variables) ---
-SQS_JOB_QUEUE_URL = os.environ.get('TRANSCODING_JOB_QUEUE_URL') 
+# Scheduling lanes from TRANSCODING_JOB_QUEUE_URLS (or TRANSCODING_JOB_QUEUE_URL alone), see common/chunk_jobs.py
+JOB_QUEUE_LANES = chunk_jobs.load_job_queue_lanes()
+OWNER_PRIORITIES = json.loads(os.environ.get('OWNER_PRIORITIES') or '{}') # owner -> lane, e.g. {"newsdesk": "priority"}
+PRIORITY_MAX_DURATION_SEC = float(os.environ.get('PRIORITY_MAX_DURATION_SEC', '600')) # Shorter videos -> priority lane
+BULK_MIN_DURATION_SEC = float(os.environ.get('BULK_MIN_DURATION_SEC', '3600')) # Longer videos -> bulk lane
+DYNAMODB_TABLE_NAME = os.environ.get('VIDEO_METADATA_TABLE_NAME') # Chunk plan + fan-out state are kept on the video item
+FANOUT_MAX_CONCURRENCY = int(os.environ.get('FANOUT_MAX_CONCURRENCY', '8')) # SendMessageBatch calls in flight
+FANOUT_MAX_ATTEMPTS = int(os.environ.get('FANOUT_MAX_ATTEMPTS', '5')) # Per batch, for entries SQS reports as Failed
 FFPROBE_PATH = '/opt/bin/ffprobe' # Path of ffprobe in the Lambda Layer
 CHUNK_SIZE_SECONDS = 60.0 # Duration of each parallel work chunk
 
 # --- Clients ---
-# Assumes region is configured via environment variables
-S3 = boto3.client('s3')
-SQS = boto3.client('sqs')
+# Assumes region is configured via environment variables (created on first use)
+S3 = bootstrap.client('s3')
+SQS = bootstrap.client('sqs')
 
 # --- Helper Functions ---
 
-def run_ffprobe_technical_data(filepath):
-    """Executes ffprobe to get both video duration and primary stream resolution (height)."""
-    logger.info(f"Executing FFprobe for technical data on: {filepath}")
-    
-    cmd = [
-        FFPROBE_PATH,
-        '-v', 'error',
-        '-print_format', 'json',
-        '-show_format',
-        '-show_streams',
-        filepath
-    ]
-    
+def parse_technical_data(data):
+    """Extracts video duration and primary stream resolution (height) from ffprobe JSON."""
     try:
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, text=True)
-        data = json.loads(result.stdout)
-        
         duration_sec = float(data['format']['duration'])
         
         # Find the primary video stream and extract its height
@@ -54,49 +52,138 @@ def run_ffprobe_technical_data(filepath):
         return duration_sec, resolution_height
         
     except Exception as e:
-        logger.error(f"FFprobe execution failed during technical check: {e}")
+        logger.error(f"Could not read technical data from FFprobe output: {e}")
         raise
 
 
 def get_video_technical_data_from_s3(raw_s3_bucket, raw_s3_key):
     """
-    Downloads the file header from S3 and runs ffprobe to determine total duration and resolution.
+    Streams the file header from S3 into ffprobe to determine total duration and resolution.
     """
-    temp_filename = f"{uuid.uuid4()}-{os.path.basename(raw_s3_key)}"
-    local_path = f"/tmp/{temp_filename}"
-    
     try:
-        # 1. Download only the file header (first 5MB)
-        logger.info(f"Downloading header from s3://{raw_s3_bucket}/{raw_s3_key}")
-        s3_object = S3.get_object(
-            Bucket=raw_s3_bucket,
-            Key=raw_s3_key,
-            Range='bytes=0-5242880'
-        )
-        with open(local_path, 'wb') as f:
-            f.write(s3_object['Body'].read())
-            
-        # 2. Run FFprobe on the local header file
-        duration_sec, resolution_height = run_ffprobe_technical_data(local_path)
-        
-        return duration_sec, resolution_height
+        logger.info(f"Probing s3://{raw_s3_bucket}/{raw_s3_key}")
+        return parse_technical_data(probe.probe_s3_object(S3, raw_s3_bucket, raw_s3_key, FFPROBE_PATH))
         
     except Exception as e:
         logger.error(f"Critical error during technical data calculation: {e}")
         raise
-    finally:
-        # ALWAYS clean up the temporary file
-        if os.path.exists(local_path):
-            os.remove(local_path)
 
 
+def choose_lane(job_data, duration_sec):
+    """
+    Scheduling lane of a video's chunks: an explicit 'Priority' in the job message, else the owner's
+    configured lane (OWNER_PRIORITIES), else its length. Falls back to 'standard' (or any configured
+    lane) when the chosen lane has no queue.
+    """
+    lane = job_data.get('Priority') or OWNER_PRIORITIES.get(job_data.get('Owner') or '')
+    if lane not in chunk_jobs.LANES:
+        if duration_sec <= PRIORITY_MAX_DURATION_SEC:
+            lane = 'priority'
+        elif duration_sec >= BULK_MIN_DURATION_SEC:
+            lane = 'bulk'
+        else:
+            lane = 'standard'
+    if lane in JOB_QUEUE_LANES:
+        return lane
+    return 'standard' if 'standard' in JOB_QUEUE_LANES else next(iter(JOB_QUEUE_LANES))
+
+
+def fairness_group(job_data):
+    """
+    MessageGroupId for SQS fair queues: an owner with a large backlog in a lane does not hold up the other
+    owners' messages in it (standard queues only; a FIFO group would serialize the video's chunks).
+    """
+    return job_data.get('Owner') or job_data['VideoID']
+
+
+# --- Chunk plan and fan-out state (on the video item) ---
+# ChunkPlan lists every chunk job of the video. FanOutAt is set once all of them were accepted by SQS;
+# FanOutPending holds the chunks of a fan-out that gave up, which the SQS redelivery sends again.
+# A sweeper can compare ChunkPlan with CompletedChunks to find and re-enqueue lost chunks.
+
+def build_chunk_plan(duration_sec, max_source_height, lane):
+    num_chunks = math.ceil(duration_sec / CHUNK_SIZE_SECONDS)
+    chunks = []
+    for i in range(num_chunks):
+        start_time = round(i * CHUNK_SIZE_SECONDS, 2)
+        end_time = round(min(i * CHUNK_SIZE_SECONDS + CHUNK_SIZE_SECONDS, duration_sec), 2)
+        chunks.append({'ChunkID': chunk_jobs.chunk_label(start_time, end_time), 'Index': i + 1, 'Start': start_time, 'End': end_time})
+    return {'ChunkSeconds': CHUNK_SIZE_SECONDS, 'TotalChunks': num_chunks, 'MaxResolution': max_source_height,
+            'Lane': lane, 'Chunks': chunks}
+
+def get_fan_out_state(video_id):
+    """ChunkPlan / FanOutAt / FanOutPending of the video item ({} without a table or item)."""
+    if not DYNAMODB_TABLE_NAME:
+        return {}
+    item = bootstrap.table(DYNAMODB_TABLE_NAME).get_item(
+        Key={'VideoID': video_id},
+        ProjectionExpression='ChunkPlan, FanOutAt, FanOutPending',
+        ConsistentRead=True
+    ).get('Item') or {}
+    return chunk_jobs.from_dynamo(item)
+
+def save_chunk_plan(video_id, plan):
+    """Writes the plan before anything is sent, so a fan-out that dies half-way is still visible."""
+    if not DYNAMODB_TABLE_NAME:
+        return
+    bootstrap.table(DYNAMODB_TABLE_NAME).update_item(
+        Key={'VideoID': video_id},
+        UpdateExpression='SET ChunkPlan = :plan, TotalChunks = :total',
+        ExpressionAttributeValues={':plan': chunk_jobs.to_dynamo(plan), ':total': plan['TotalChunks']}
+    )
+
+def record_fan_out(video_id, failed_chunk_ids):
+    """Marks the fan-out complete (FanOutAt), or records the chunks that still have to be sent."""
+    if not DYNAMODB_TABLE_NAME:
+        return
+    table = bootstrap.table(DYNAMODB_TABLE_NAME)
+    if failed_chunk_ids:
+        table.update_item(
+            Key={'VideoID': video_id},
+            UpdateExpression='SET FanOutPending = :pending',
+            ExpressionAttributeValues={':pending': sorted(failed_chunk_ids)}
+        )
+    else:
+        table.update_item(
+            Key={'VideoID': video_id},
+            UpdateExpression='SET FanOutAt = :now REMOVE FanOutPending',
+            ExpressionAttributeValues={':now': datetime.now(timezone.utc).isoformat()}
+        )
+
+def publish_chunks(job_data, plan, chunks, trace_context):
+    """
+    Sends the chunk jobs to the plan's lane through the reliable fan-out. Returns (chunk IDs that could
+    not be sent, fan-out stats).
+    """
+    queue_url = JOB_QUEUE_LANES[plan['Lane']]
+    group_id = None if queue_url.endswith('.fifo') else fairness_group(job_data)
+    entries = []
+    for chunk in chunks:
+        entry = {
+            'Id': f"chunk-{chunk['Index']}",
+            'MessageBody': json.dumps(tracing.inject(chunk_jobs.build_chunk_message(job_data, plan, chunk), trace_context))
+        }
+        if group_id:
+            entry['MessageGroupId'] = group_id
+        entries.append(entry)
+
+    stats = {}
+    failed = fanout.send_all(SQS, queue_url, entries, FANOUT_MAX_CONCURRENCY, FANOUT_MAX_ATTEMPTS, stats)
+    chunk_ids = {f"chunk-{chunk['Index']}": chunk['ChunkID'] for chunk in chunks}
+    for entry in failed:
+        logger.error(f"Chunk job {chunk_ids[entry['Id']]} of {job_data['VideoID']} was not sent: {entry['Code']} {entry['Message']}")
+    return [chunk_ids[entry['Id']] for entry in failed], stats
+
+
+@bootstrap.measure_cold_start
 def lambda_handler(event, context):
     """
     Main handler: Processes SQS messages and fans out chunk jobs.
+    A redelivered message resumes from the video's fan-out state instead of probing and sending again.
     """
     
-    if not SQS_JOB_QUEUE_URL:
-        logger.error("TRANSCODING_JOB_QUEUE_URL environment variable is missing.")
+    if not JOB_QUEUE_LANES:
+        logger.error("TRANSCODING_JOB_QUEUE_URL(S) environment variable is missing.")
         raise EnvironmentError("Job queue URL not configured.")
         
     # Lambda processes messages in batches, so iterate through all records
@@ -108,50 +195,50 @@ def lambda_handler(event, context):
             video_id = job_data['VideoID']
             raw_s3_key = job_data['RawS3Key']
             raw_s3_bucket = job_data['RawS3Bucket']
+            trace = tracing.extract(job_data)
+            tracing.record_queue_wait('segmentation', trace)
             
-            logger.info(f"Processing job for VideoID: {video_id}. Starting technical data check.")
-            
-            # 2. Independent Technical Data Check (NEW CALL)
-            duration_sec, max_source_height = get_video_technical_data_from_s3(raw_s3_bucket, raw_s3_key)
-            logger.info(f"Resolution found: {max_source_height}p. Duration: {duration_sec}s. Fanning out jobs.")
-            
-            # 3. Calculate Chunks and Inject Resolution
-            num_chunks = math.ceil(duration_sec / CHUNK_SIZE_SECONDS)
-            messages_to_send = []
-            
-            for i in range(num_chunks):
-                start_time = i * CHUNK_SIZE_SECONDS
-                end_time = min(start_time + CHUNK_SIZE_SECONDS, duration_sec)
-                
-                chunk_message = {
-                    "VideoID": video_id,
-                    "RawS3Key": raw_s3_key,
-                    "RawS3Bucket": raw_s3_bucket,
-                    "Start": round(start_time, 2), 
-                    "End": round(end_time, 2),     
-                    "ChunkID": i + 1,
-                    "TotalChunks": num_chunks,
-                    "MaxResolution": max_source_height # RESOLUTION INJECTED HERE
-                }
-                
-                messages_to_send.append({
-                    'Id': f"{video_id}-{i}",
-                    'MessageBody': json.dumps(chunk_message)
-                })
-            
-            # 4. Send Messages in Batches (Fan Out)
-            for i in range(0, len(messages_to_send), 10):
-                batch = messages_to_send[i:i + 10]
-                SQS.send_message_batch(
-                    QueueUrl=SQS_JOB_QUEUE_URL,
-                    Entries=batch
-                )
+            with tracing.span('segmentation', trace) as segmentation_span:
+                state = get_fan_out_state(video_id)
+                plan = state.get('ChunkPlan')
+                if state.get('FanOutAt'):
+                    logger.info(f"Chunks of {video_id} were already fanned out at {state['FanOutAt']}. Skipping duplicate message.")
+                    continue
+
+                if plan:
+                    # Redelivery after a partial (or interrupted) fan-out: same plan, only what is missing
+                    pending = set(state.get('FanOutPending') or [c['ChunkID'] for c in plan['Chunks']])
+                    chunks = [c for c in plan['Chunks'] if c['ChunkID'] in pending]
+                    logger.info(f"Resuming fan-out of {video_id}: {len(chunks)} of {plan['TotalChunks']} chunks to send.")
+                else:
+                    logger.info(f"Processing job for VideoID: {video_id}. Starting technical data check.")
+                    # 2. Independent Technical Data Check (NEW CALL)
+                    with tracing.span('segmentation.probe', segmentation_span.context):
+                        duration_sec, max_source_height = get_video_technical_data_from_s3(raw_s3_bucket, raw_s3_key)
+                    logger.info(f"Resolution found: {max_source_height}p. Duration: {duration_sec}s. Fanning out jobs.")
+
+                    # 3. Plan the chunks (lane + resolution) and record the plan on the video item
+                    plan = build_chunk_plan(duration_sec, max_source_height, choose_lane(job_data, duration_sec))
+                    save_chunk_plan(video_id, plan)
+                    chunks = plan['Chunks']
+                segmentation_span.set(TotalChunks=plan['TotalChunks'], Lane=plan['Lane'])
+
+                # 4. Send the chunk jobs (concurrent batches, failed entries retried)
+                with tracing.span('segmentation.fan_out', segmentation_span.context, Messages=len(chunks)) as fan_out_span:
+                    failed_chunk_ids, stats = publish_chunks(job_data, plan, chunks, segmentation_span.context)
+                    fan_out_span.set(Failed=len(failed_chunk_ids), **stats)
+                record_fan_out(video_id, failed_chunk_ids)
+                if failed_chunk_ids:
+                    # The redelivered message sends only these (FanOutPending)
+                    raise RuntimeError(f"{len(failed_chunk_ids)} of {len(chunks)} chunk jobs could not be sent.")
                 
-            logger.info(f"Successfully fanned out {len(messages_to_send)} jobs.")
+            logger.info(f"Successfully fanned out {len(chunks)} jobs to the {plan['Lane']} lane.")
             
         except Exception as e:
             # Re-raise exception to cause SQS retry
             logger.error(f"Failed to process SQS record for {video_id}: {e}", exc_info=True)
             raise 
             
-    return {'statusCode': 200, 'body': f"Fanned out {len(event['Records'])} messages."}
\ No newline at end of file
+    return {'statusCode': 200, 'body': f"Fanned out {len(event['Records'])} messages."}
+
+bootstrap.init_complete('SegmentationService')
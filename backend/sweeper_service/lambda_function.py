@@ -0,0 +1,334 @@
+from common import bootstrap # First import: starts the init timer
+from common import tracing
+from common import fanout
+from common import chunk_jobs
+
+import json
+import os
+import sys
+import math
+import logging
+from datetime import datetime, timezone
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Sweeper Service (scheduled, e.g. an EventBridge rule with rate(5 minutes)):
+# finds videos that stopped making progress and re-drives only what is missing.
+#   - no complete fan-out (FanOutAt)        -> the segmentation job is sent again (it resumes from ChunkPlan)
+#   - chunks of ChunkPlan not in CompletedChunks -> those chunk jobs are sent to the video's lane again
+#   - every chunk completed, but not READY   -> one completion signal is sent again (re-runs the stitch)
+# After MAX_SWEEP_ATTEMPTS re-drives without any progress (a chunk completed after a re-drive starts the
+# count again) it is set to FAILED_STUCK and ALERT_TOPIC_ARN is notified. A video therefore leaves PROCESSING within about
+# (MAX_SWEEP_ATTEMPTS + 1) * STUCK_AFTER_SEC plus one schedule interval.
+
+# --- Configuration (Lambda Environment Variables) ---
+DYNAMODB_TABLE_NAME = os.environ.get('VIDEO_METADATA_TABLE_NAME')
+STATUS_INDEX_NAME = os.environ.get('STATUS_INDEX_NAME', 'Status-CreatedAt-index')
+SQS_SEGMENTATION_QUEUE_URL = os.environ.get('SQS_SEGMENTATION_QUEUE_URL')
+FINALIZER_SQS_URL = os.environ.get('FINALIZER_SQS_URL')
+JOB_QUEUE_LANES = chunk_jobs.load_job_queue_lanes() # The segmentation service's lanes
+ALERT_TOPIC_ARN = os.environ.get('ALERT_TOPIC_ARN') # SNS topic for escalated videos (optional)
+# No progress for this long -> re-drive. Keep it well above the queue drain time the JobWorker fleet is scaled
+# to (ops/worker_scaling_policy.py): chunks still waiting in a lane would otherwise be encoded twice.
+STUCK_AFTER_SEC = float(os.environ.get('STUCK_AFTER_SEC', '1800'))
+MAX_SWEEP_ATTEMPTS = int(os.environ.get('MAX_SWEEP_ATTEMPTS', '3')) # Re-drives before FAILED_STUCK
+METRICS_NAMESPACE = os.environ.get('SWEEP_METRICS_NAMESPACE', 'MovieVerse/Pipeline')
+
+# Statuses of videos that are not finished. FAILED_* are written by the JobWorker for a chunk that failed;
+# the chunk's own SQS retries may still succeed (the finalizer then sets PROCESSING again).
+SWEPT_STATUSES = ['PROCESSING', 'FAILED_DOWNLOAD', 'FAILED_TRANSCODE', 'FAILED_UPLOAD',
+                  'FAILED_FINALIZER_SIGNAL', 'FAILED_INIT_OR_UNKNOWN']
+STUCK_STATUS = 'FAILED_STUCK'
+EMF_MAX_VALUES = 100 # Values per metric in one Embedded Metric Format document
+
+# --- Clients ---
+SQS = bootstrap.client('sqs')
+SNS = bootstrap.client('sns')
+
+# --- Helper Functions ---
+
+def get_table():
+    return bootstrap.table(DYNAMODB_TABLE_NAME)
+
+def parse_time(value):
+    """Epoch seconds of an ISO-8601 attribute (None if missing or malformed)."""
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))]
+
+def query_status(status):
+    """Every video with this status (keys only from the index; the full items are read per video)."""
+    params = {
+        'IndexName': STATUS_INDEX_NAME,
+        'KeyConditionExpression': '#status = :status',
+        'ExpressionAttributeNames': {'#status': 'Status'},
+        'ExpressionAttributeValues': {':status': status}
+    }
+    items = []
+    while True:
+        response = get_table().query(**params)
+        items.extend(response.get('Items', []))
+        if not response.get('LastEvaluatedKey'):
+            return items
+        params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def get_video(video_id):
+    return get_table().get_item(Key={'VideoID': video_id}, ConsistentRead=True).get('Item')
+
+def last_activity(item):
+    """Latest of upload, completed fan-out, last completed chunk and last re-drive (epoch seconds)."""
+    times = [parse_time(item.get(field)) for field in ('CreatedAt', 'FanOutAt', 'LastProgressAt', 'LastSweptAt')]
+    return max([t for t in times if t is not None], default=None)
+
+def missing_chunks(item):
+    """Chunks of the plan that the finalizer has not recorded as completed."""
+    completed = set(item.get('CompletedChunks') or [])
+    return [chunk for chunk in chunk_jobs.from_dynamo(item['ChunkPlan'])['Chunks'] if chunk['ChunkID'] not in completed]
+
+def sweep_attempts(item):
+    """Re-drives since the video last made progress: a chunk completed after the last re-drive resets the count."""
+    progress_at = parse_time(item.get('LastProgressAt'))
+    swept_at = parse_time(item.get('LastSweptAt'))
+    if progress_at is not None and swept_at is not None and progress_at > swept_at:
+        return 0
+    return int(item.get('SweepAttempts') or 0)
+
+def claim_video(item, attempts, now_iso):
+    """
+    Records the re-drive (attempt number attempts + 1) on the item, conditional on the status this sweep
+    saw (a video that became READY in the meantime is left alone). Returns False if the condition failed.
+    """
+    try:
+        get_table().update_item(
+            Key={'VideoID': item['VideoID']},
+            UpdateExpression='SET #S = :processing, LastSweptAt = :now, SweepAttempts = :attempts',
+            ConditionExpression='#S = :seen',
+            ExpressionAttributeNames={'#S': 'Status'},
+            ExpressionAttributeValues={':processing': 'PROCESSING', ':now': now_iso, ':attempts': attempts + 1,
+                                       ':seen': item['Status']}
+        )
+        return True
+    except get_table().meta.client.exceptions.ConditionalCheckFailedException:
+        return False
+
+def redrive_segmentation(item, trace_context):
+    if not SQS_SEGMENTATION_QUEUE_URL:
+        raise EnvironmentError("SQS_SEGMENTATION_QUEUE_URL is not configured.")
+    SQS.send_message(
+        QueueUrl=SQS_SEGMENTATION_QUEUE_URL,
+        MessageBody=json.dumps(tracing.inject({
+            "VideoID": item['VideoID'],
+            "RawS3Key": item['RawS3Key'],
+            "RawS3Bucket": item['RawS3Bucket'],
+            "Owner": item.get('owner')
+        }, trace_context))
+    )
+
+def redrive_chunks(item, chunks, trace_context):
+    """Sends the missing chunk jobs to the video's lane. Returns the chunk IDs that could not be sent."""
+    plan = chunk_jobs.from_dynamo(item['ChunkPlan'])
+    queue_url = chunk_jobs.lane_queue_url(JOB_QUEUE_LANES, plan['Lane'])
+    group_id = None if queue_url.endswith('.fifo') else (item.get('owner') or item['VideoID'])
+    entries = []
+    for chunk in chunks:
+        entry = {
+            'Id': f"chunk-{chunk['Index']}",
+            'MessageBody': json.dumps(tracing.inject(chunk_jobs.build_chunk_message(item, plan, chunk), trace_context))
+        }
+        if group_id:
+            entry['MessageGroupId'] = group_id
+        entries.append(entry)
+    failed = fanout.send_all(SQS, queue_url, entries)
+    chunk_ids = {f"chunk-{chunk['Index']}": chunk['ChunkID'] for chunk in chunks}
+    return [chunk_ids[entry['Id']] for entry in failed]
+
+def redrive_finalizer(item, trace_context):
+    """Every chunk is recorded but the video is not READY: one repeated signal makes the finalizer stitch again."""
+    if not FINALIZER_SQS_URL:
+        raise EnvironmentError("FINALIZER_SQS_URL is not configured.")
+    plan = chunk_jobs.from_dynamo(item['ChunkPlan'])
+    SQS.send_message(
+        QueueUrl=FINALIZER_SQS_URL,
+        MessageBody=json.dumps(tracing.inject({
+            "VideoID": item['VideoID'],
+            "ChunkID": plan['Chunks'][-1]['ChunkID'],
+            "TotalChunks": plan['TotalChunks'],
+            "CompletedQualities": sorted(item.get('CompletedQualities') or [])
+        }, trace_context))
+    )
+
+def escalate(item, missing, attempts):
+    """
+    Gives up on the video: FAILED_STUCK (no longer swept) and an alert. Conditional on the status this
+    sweep saw, so a video that finished in the meantime is not marked stuck. Returns False if it was not.
+    """
+    video_id = item['VideoID']
+    try:
+        get_table().update_item(
+            Key={'VideoID': video_id},
+            UpdateExpression='SET #S = :stuck, StuckReason = :reason',
+            ConditionExpression='#S = :seen',
+            ExpressionAttributeNames={'#S': 'Status'},
+            ExpressionAttributeValues={':stuck': STUCK_STATUS, ':reason': item['Status'], ':seen': item['Status']}
+        )
+    except get_table().meta.client.exceptions.ConditionalCheckFailedException:
+        return False
+    logger.error(f"Video {video_id} escalated to {STUCK_STATUS} after {attempts} re-drives "
+                 f"(was {item['Status']}, missing chunks: {missing}).")
+    if ALERT_TOPIC_ARN:
+        try:
+            SNS.publish(
+                TopicArn=ALERT_TOPIC_ARN,
+                Subject=f"Video {video_id} is stuck"[:100],
+                Message=json.dumps({
+                    'VideoID': video_id,
+                    'PreviousStatus': item['Status'],
+                    'SweepAttempts': attempts,
+                    'MissingChunks': missing,
+                    'CreatedAt': item.get('CreatedAt')
+                })
+            )
+        except Exception as e:
+            # The status change is what matters; the alert is best effort
+            logger.error(f"Failed to publish the alert for {video_id}: {e}")
+    return True
+
+def sweep_video(item, now):
+    """Re-drives (or escalates) one stuck video. Returns (action, chunks re-driven)."""
+    video_id = item['VideoID']
+    plan = item.get('ChunkPlan')
+    fanned_out = bool(plan) and bool(item.get('FanOutAt'))
+    missing = [c['ChunkID'] for c in missing_chunks(item)] if plan else None
+
+    attempts = sweep_attempts(item)
+    if attempts >= MAX_SWEEP_ATTEMPTS:
+        if not escalate(item, missing, attempts):
+            logger.info(f"Video {video_id} changed status during the sweep. Not escalating.")
+            return 'skipped', 0
+        return 'escalated', 0
+
+    if not claim_video(item, attempts, datetime.fromtimestamp(now, timezone.utc).isoformat()):
+        logger.info(f"Video {video_id} changed status during the sweep. Skipping.")
+        return 'skipped', 0
+
+    with tracing.span('sweeper.redrive', tracing.start_trace(video_id), Status=item['Status']) as redrive_span:
+        if not fanned_out:
+            redrive_segmentation(item, redrive_span.context)
+            action, redriven = 'segmentation', 0
+        elif missing:
+            failed = redrive_chunks(item, missing_chunks(item), redrive_span.context)
+            if failed:
+                # Counted as an attempt; the next sweep tries again
+                logger.error(f"{len(failed)} chunk jobs of {video_id} could not be re-enqueued: {failed}")
+                redrive_span.fail(f"{len(failed)} chunk jobs not sent")
+            action, redriven = 'chunks', len(missing) - len(failed)
+        else:
+            redrive_finalizer(item, redrive_span.context)
+            action, redriven = 'finalizer', 0
+        redrive_span.set(Action=action, Chunks=redriven, Attempt=attempts + 1)
+
+    logger.info(f"Re-drove {video_id} ({item['Status']}): {action}" + (f", {redriven} chunk(s) {missing}" if redriven else ""))
+    return action, redriven
+
+def emit_sweep_metrics(ages, idles, actions, redriven_chunks, timestamp):
+    """
+    Time-in-state distributions (TimeInState: since upload, IdleTime: since the last progress) per status, and
+    the sweep's counts. EMF value arrays give CloudWatch the full distribution (percentile statistics).
+    """
+    for status, values in ages.items():
+        for i in range(0, len(values), EMF_MAX_VALUES):
+            print(json.dumps({
+                '_aws': {
+                    'Timestamp': int(timestamp * 1000),
+                    'CloudWatchMetrics': [{
+                        'Namespace': METRICS_NAMESPACE,
+                        'Dimensions': [['Status']],
+                        'Metrics': [{'Name': 'TimeInState', 'Unit': 'Seconds'}, {'Name': 'IdleTime', 'Unit': 'Seconds'}]
+                    }]
+                },
+                'Status': status,
+                'TimeInState': [round(v, 1) for v in values[i:i + EMF_MAX_VALUES]],
+                'IdleTime': [round(v, 1) for v in idles[status][i:i + EMF_MAX_VALUES]]
+            }))
+    print(json.dumps({
+        '_aws': {
+            'Timestamp': int(timestamp * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [[]],
+                'Metrics': [{'Name': name, 'Unit': 'Count'} for name in
+                            ('UnfinishedVideos', 'RedrivenVideos', 'RedrivenChunks', 'EscalatedVideos')]
+            }]
+        },
+        'UnfinishedVideos': sum(len(values) for values in ages.values()),
+        'RedrivenVideos': sum(count for action, count in actions.items() if action not in ('escalated', 'skipped')),
+        'RedrivenChunks': redriven_chunks,
+        'EscalatedVideos': actions.get('escalated', 0)
+    }))
+    sys.stdout.flush()
+
+# --- Main Handler ---
+
+@bootstrap.measure_cold_start
+def lambda_handler(event, context):
+    """
+    Scheduled sweep over every unfinished video.
+    Returns the counts and the time-in-state percentiles per status (also logged and emitted as metrics).
+    """
+    if not DYNAMODB_TABLE_NAME:
+        raise EnvironmentError("VIDEO_METADATA_TABLE_NAME environment variable is missing.")
+
+    now = datetime.now(timezone.utc).timestamp()
+    ages, idles = {}, {}   # status -> seconds, one value per video
+    actions = {}           # action -> videos
+    redriven_chunks = 0
+    errors = 0
+
+    for status in SWEPT_STATUSES:
+        for key in query_status(status):
+            video_id = key['VideoID']
+            try:
+                # 1. Read the full item (the index projection may not carry the plan or the chunk set)
+                item = get_video(video_id)
+                if not item or item.get('Status') != status:
+                    continue
+                created = parse_time(item.get('CreatedAt')) or now
+                active = last_activity(item) or created
+                ages.setdefault(status, []).append(now - created)
+                idles.setdefault(status, []).append(now - active)
+
+                # 2. Still making progress (or retrying on its own): leave it alone
+                if now - active < STUCK_AFTER_SEC:
+                    continue
+
+                # 3. Re-drive what is missing, or escalate
+                action, chunks = sweep_video(item, now)
+                actions[action] = actions.get(action, 0) + 1
+                redriven_chunks += chunks
+            except Exception as e:
+                # One broken item must not stop the sweep
+                errors += 1
+                logger.error(f"Failed to sweep {video_id}: {e}", exc_info=True)
+
+    # 4. Report the time-in-state distributions
+    emit_sweep_metrics(ages, idles, actions, redriven_chunks, now)
+    time_in_state = {
+        status: {'videos': len(values), 'p50_sec': round(percentile(values, 50), 1),
+                 'p95_sec': round(percentile(values, 95), 1), 'max_sec': round(max(values), 1)}
+        for status, values in ages.items()
+    }
+    for status, stats in time_in_state.items():
+        logger.info(f"{status}: {stats['videos']} video(s), time in state p50 {stats['p50_sec']}s, "
+                    f"p95 {stats['p95_sec']}s, max {stats['max_sec']}s")
+    logger.info(f"Sweep complete: {actions or 'nothing stuck'}, {redriven_chunks} chunk(s) re-driven, {errors} error(s).")
+
+    return {'actions': actions, 'redrivenChunks': redriven_chunks, 'errors': errors, 'timeInState': time_in_state}
+
+
+bootstrap.init_complete('SweeperService')
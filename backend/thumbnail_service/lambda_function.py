@@ -0,0 +1,160 @@
+from common import bootstrap # First import: starts the init timer
+
+import json
+import os
+import io
+import csv
+import subprocess
+import logging
+from botocore.exceptions import ClientError
+from PIL import Image, ImageOps, features
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# --- Configuration (Set as Lambda Environment Variables) ---
+DYNAMODB_TABLE_NAME = os.environ.get('VIDEO_METADATA_TABLE_NAME')
+FFMPEG_PATH = '/opt/bin/ffmpeg' # Path to ffmpeg in the Lambda Layer (frame grab fallback)
+DERIVED_PREFIX = 'thumbnails/derived' # thumbnails/derived/{VideoID}/{width}.{ext}
+
+# Card widths (px). 320 covers the 220px browse tile at 1.5x; the larger ones serve hero/retina layouts.
+THUMBNAIL_WIDTHS = [160, 320, 640, 1280]
+# Output formats, best first. AVIF is only produced when the Pillow build supports it.
+FORMATS = [
+    {'name': 'avif', 'pillow': 'AVIF', 'content_type': 'image/avif', 'options': {'quality': 50, 'speed': 8}},
+    {'name': 'webp', 'pillow': 'WEBP', 'content_type': 'image/webp', 'options': {'quality': 75, 'method': 4}},
+    {'name': 'jpeg', 'pillow': 'JPEG', 'content_type': 'image/jpeg', 'options': {'quality': 80, 'optimize': True, 'progressive': True}},
+]
+FRAME_GRAB_FRACTION = 0.1 # Grab the fallback frame 10% into the video (skips black intros)
+FRAME_GRAB_MAX_OFFSET = 30.0
+# A stalled read of the source (e.g. a slow range request) is killed instead of holding the invocation to its timeout
+FRAME_GRAB_TIMEOUT_SEC = float(os.environ.get('FRAME_GRAB_TIMEOUT_SEC', '60'))
+CACHE_CONTROL = 'public, max-age=31536000, immutable' # Keys are per video and never rewritten with other content
+
+# --- Clients ---
+S3 = bootstrap.client('s3') # Created on first use
+
+# --- Helper Functions ---
+
+def available_formats():
+    return [fmt for fmt in FORMATS if fmt['name'] != 'avif' or features.check('avif')]
+
+def find_source_thumbnail(bucket, candidate_keys):
+    """Returns (key, bytes) of the first uploaded thumbnail that exists, or (None, None)."""
+    for key in candidate_keys:
+        if not key:
+            continue
+        try:
+            return key, S3.get_object(Bucket=bucket, Key=key)['Body'].read()
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('NoSuchKey', '404'):
+                raise
+    return None, None
+
+def thumbnail_key_from_csv(bucket, csv_key):
+    """The ThumbnailKey column of the upload CSV (the name the uploader actually used)."""
+    if not csv_key:
+        return None
+    try:
+        content = S3.get_object(Bucket=bucket, Key=csv_key)['Body'].read().decode('utf-8')
+        row = next(csv.DictReader(io.StringIO(content)), {}) or {}
+        return (row.get('ThumbnailKey') or '').strip() or None
+    except ClientError:
+        return None
+
+def grab_frame(bucket, raw_key, duration_sec):
+    """
+    Fallback: a single PNG frame from the source video, read by ffmpeg through a presigned URL.
+    Raises subprocess.TimeoutExpired (ffmpeg is killed) after FRAME_GRAB_TIMEOUT_SEC.
+    """
+    offset = min(FRAME_GRAB_MAX_OFFSET, max(0.0, float(duration_sec or 0) * FRAME_GRAB_FRACTION))
+    url = S3.generate_presigned_url('get_object', Params={'Bucket': bucket, 'Key': raw_key}, ExpiresIn=300)
+    cmd = [
+        FFMPEG_PATH, '-v', 'error',
+        '-ss', f"{offset:.2f}", # Input seeking: only the needed range is downloaded
+        '-i', url,
+        '-frames:v', '1',
+        '-f', 'image2pipe', '-vcodec', 'png', 'pipe:1'
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, timeout=FRAME_GRAB_TIMEOUT_SEC)
+    return result.stdout
+
+def render_variants(image_bytes):
+    """
+    Yields (format, width, encoded bytes) for every size/format. Sizes larger than the source are skipped
+    (the source width itself is used instead, so small uploads still get one variant per format).
+    """
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(image_bytes)))
+    image = image.convert('RGB')
+
+    widths = [w for w in THUMBNAIL_WIDTHS if w < image.width] + [min(image.width, THUMBNAIL_WIDTHS[-1])]
+    for width in sorted(set(widths)):
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        for fmt in available_formats():
+            buffer = io.BytesIO()
+            resized.save(buffer, fmt['pillow'], **fmt['options'])
+            yield fmt, width, buffer.getvalue()
+
+def save_variants(bucket, video_id, image_bytes):
+    """Uploads the derivatives. Returns {format: {width: key}} (widths as strings for DynamoDB maps)."""
+    variants = {}
+    total_bytes = 0
+    for fmt, width, data in render_variants(image_bytes):
+        key = f"{DERIVED_PREFIX}/{video_id}/{width}.{fmt['name']}"
+        S3.put_object(Bucket=bucket, Key=key, Body=data, ContentType=fmt['content_type'], CacheControl=CACHE_CONTROL)
+        variants.setdefault(fmt['name'], {})[str(width)] = key
+        total_bytes += len(data)
+    logger.info(f"Wrote {sum(len(v) for v in variants.values())} thumbnail variants for {video_id} ({total_bytes} bytes).")
+    return variants
+
+def record_variants(video_id, variants, source_key):
+    """Stores the variant keys on the video item (the listing turns them into srcsets)."""
+    table = bootstrap.table(DYNAMODB_TABLE_NAME)
+    update_expression = "SET ThumbnailVariants = :v"
+    values = {':v': variants}
+    if source_key:
+        # The key the uploader really used (the metadata service can only guess it from the filename)
+        update_expression += ", ThumbnailKey = :k"
+        values[':k'] = source_key
+    table.update_item(
+        Key={'VideoID': video_id},
+        UpdateExpression=update_expression,
+        ExpressionAttributeValues=values
+    )
+
+
+@bootstrap.measure_cold_start
+def lambda_handler(event, context):
+    """
+    Invoked asynchronously by content_metadata_service once a video item exists.
+    Payload: VideoID, RawS3Bucket, RawS3Key, ThumbnailKey, CsvKey, DurationSec (optional).
+    """
+    video_id = event['VideoID']
+    bucket = event['RawS3Bucket']
+
+    try:
+        # 1. Source image: the uploaded thumbnail, else a frame from the video
+        source_key, image_bytes = find_source_thumbnail(
+            bucket, [event.get('ThumbnailKey'), thumbnail_key_from_csv(bucket, event.get('CsvKey'))]
+        )
+        if image_bytes is None:
+            logger.info(f"No uploaded thumbnail for {video_id}. Grabbing a frame from {event['RawS3Key']}.")
+            image_bytes = grab_frame(bucket, event['RawS3Key'], event.get('DurationSec'))
+
+        # 2. Derivatives (sizes x formats)
+        variants = save_variants(bucket, video_id, image_bytes)
+
+        # 3. Link them to the catalog item
+        record_variants(video_id, variants, source_key)
+
+        return {'statusCode': 200, 'body': json.dumps({'VideoID': video_id, 'ThumbnailVariants': variants})}
+
+    except Exception as e:
+        logger.error(f"Thumbnail derivatives failed for {video_id}: {e}", exc_info=True)
+        # Raise so the async invocation is retried (and lands in the DLQ/destination if configured)
+        raise
+
+
+bootstrap.init_complete('ThumbnailService')
@@ -1,31 +1,231 @@
+from common import bootstrap # First import: starts the init timer
+
 import json
-import boto3
 import os
 import csv
 import io
+import re
+import math
 from botocore.exceptions import ClientError
-from botocore.config import Config
 
 # --- 1. CONFIGURATION ---
 # Stockholm (eu-north-1) requires explicit region and signature setup
 REGION = os.environ.get('AWS_REGION')
 ENDPOINT_URL = f'https://s3.{REGION}.amazonaws.com'
 
-#configure boto3 client with specific signature version
-my_config = Config(
-    region_name=REGION,
-    signature_version='s3v4'
-)
-
-# Initialize S3 Client with specific config to avoid "SignatureDoesNotMatch"
-s3_client = boto3.client(
-    's3', 
-    config=my_config, 
-    endpoint_url=ENDPOINT_URL
-)
+# S3 Client with specific config to avoid "SignatureDoesNotMatch" (created on first use)
+s3_client = bootstrap.client('s3', region=REGION, endpoint_url=ENDPOINT_URL, signature_version='s3v4')
 
 BUCKET_NAME = os.environ.get('RAWVIDEO_BUCKET_NAME')
 
+# --- Multipart upload sessions ---
+# S3 limits: parts of 5 MiB .. 5 GiB, at most 10,000 parts per upload
+MIN_PART_SIZE = 16 * 1024 * 1024
+MAX_PART_SIZE = 5 * 1024 * 1024 * 1024
+MAX_PARTS = 10000
+PART_URL_EXPIRY = 3600 # Part URLs are requested in batches as the upload progresses
+PART_URL_BATCH = 100 # Max part URLs handed out per call
+SIMPLE_URL_EXPIRY = 300
+# Sessions created with checksumAlgorithm=SHA256 carry a per-part SHA-256 (base64) signed into each part URL.
+# S3 verifies every part and stores the composite checksum, which the metadata service uses as the content hash.
+CHECKSUM_ALGORITHMS = ['SHA256']
+SHA256_BASE64_PATTERN = re.compile(r'^[A-Za-z0-9+/]{43}=$')
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*", # CORS for frontend
+    "Access-Control-Allow-Credentials": True,
+    "Content-Type": "application/json"
+}
+
+# --- Helper Functions ---
+
+def build_response(status_code, body):
+    return {'statusCode': status_code, 'headers': CORS_HEADERS, 'body': json.dumps(body)}
+
+def save_metadata(body):
+    """
+    Validates the upload metadata and writes the CSV the metadata service joins with the video.
+    Returns (file_id, video_key, thumb_key), or raises ValueError.
+    """
+    # Extract fields
+    filename = body.get('filename')       
+    thumbnail_name = body.get('thumbnail_name') 
+    title = body.get('title')
+    synopsis = body.get('synopsis')
+    owner = body.get('owner')
+
+    # Basic Validation
+    if not filename or not title:
+        raise ValueError('Missing required fields: filename and title')
+
+    # --- DEFINE S3 PATHS ---
+    # We use the filename (without extension) as the ID to link CSV and Video
+    file_id = os.path.splitext(filename)[0] 
+    
+    csv_key = f"csv/{file_id}.csv"
+    video_key = f"raw/{filename}"
+    # Only set thumbnail key if a name was provided
+    thumb_key = f"thumbnails/{thumbnail_name}" if thumbnail_name else None
+
+    # --- CREATE CSV & SAVE TO S3 ---
+    # Create CSV in memory (no temp files needed)
+    csv_buffer = io.StringIO()
+    csv_writer = csv.writer(csv_buffer)
+    
+    # Write Header and Data Row
+    csv_writer.writerow(['Title', 'Synopsis', 'Owner', 'VideoKey', 'ThumbnailKey'])
+    csv_writer.writerow([title, synopsis, owner, video_key, thumb_key])
+    
+    # Upload CSV immediately
+    s3_client.put_object(
+        Bucket=BUCKET_NAME,
+        Key=csv_key,
+        Body=csv_buffer.getvalue(),
+        ContentType='text/csv'
+    )
+    return file_id, video_key, thumb_key
+
+def presign_put(key, expires_in=SIMPLE_URL_EXPIRY):
+    return s3_client.generate_presigned_url(
+        'put_object',
+        Params={'Bucket': BUCKET_NAME, 'Key': key},
+        ExpiresIn=expires_in
+    )
+
+def choose_part_size(file_size):
+    """Smallest part size (>= MIN_PART_SIZE, whole MiB) that keeps the upload within MAX_PARTS."""
+    part_size = max(MIN_PART_SIZE, math.ceil(file_size / MAX_PARTS))
+    part_size = math.ceil(part_size / (1024 * 1024)) * 1024 * 1024
+    if part_size > MAX_PART_SIZE:
+        raise ValueError('File is too large for a single upload (max 10,000 parts of 5 GiB).')
+    return part_size
+
+def validate_session(body):
+    """Returns (upload_id, key) of a session request; keys are confined to raw/ uploads."""
+    upload_id = body.get('uploadId')
+    key = body.get('key')
+    if not upload_id or not key:
+        raise ValueError('Missing required fields: uploadId and key')
+    if not key.startswith('raw/') or '..' in key:
+        raise ValueError('Invalid upload key.')
+    return upload_id, key
+
+def presign_parts(upload_id, key, part_numbers, checksums=None):
+    """
+    Presigned upload_part URLs for the requested part numbers: {partNumber: url}.
+    checksums ({partNumber: base64 SHA-256}) are signed into the URLs; the client must send the same
+    value in the x-amz-checksum-sha256 header.
+    """
+    checksums = checksums or {}
+    urls = {}
+    for part_number in part_numbers[:PART_URL_BATCH]:
+        part_number = int(part_number)
+        if not 1 <= part_number <= MAX_PARTS:
+            raise ValueError(f'Invalid part number: {part_number}')
+
+        params = {'Bucket': BUCKET_NAME, 'Key': key, 'UploadId': upload_id, 'PartNumber': part_number}
+        checksum = checksums.get(str(part_number))
+        if checksum:
+            if not SHA256_BASE64_PATTERN.match(checksum):
+                raise ValueError(f'Invalid SHA-256 checksum for part {part_number}.')
+            params['ChecksumSHA256'] = checksum
+
+        urls[str(part_number)] = s3_client.generate_presigned_url('upload_part', Params=params, ExpiresIn=PART_URL_EXPIRY)
+    return urls
+
+def list_uploaded_parts(upload_id, key):
+    """Parts S3 already has for this upload (the source of truth for resume and complete)."""
+    parts = []
+    paginator = s3_client.get_paginator('list_parts')
+    for page in paginator.paginate(Bucket=BUCKET_NAME, Key=key, UploadId=upload_id):
+        for part in page.get('Parts', []):
+            entry = {'PartNumber': part['PartNumber'], 'ETag': part['ETag'], 'Size': part['Size']}
+            if part.get('ChecksumSHA256'):
+                entry['ChecksumSHA256'] = part['ChecksumSHA256']
+            parts.append(entry)
+    return parts
+
+# --- Session Actions ---
+
+def create_session(body):
+    """Writes the metadata CSV and starts a multipart upload; returns the part plan and the first URLs."""
+    file_size = int(body.get('fileSize') or 0)
+    if file_size <= 0:
+        raise ValueError('Missing required field: fileSize')
+    part_size = choose_part_size(file_size)
+    part_count = math.ceil(file_size / part_size)
+
+    checksum_algorithm = body.get('checksumAlgorithm')
+    if checksum_algorithm and checksum_algorithm not in CHECKSUM_ALGORITHMS:
+        raise ValueError(f'Unsupported checksumAlgorithm: {checksum_algorithm}')
+
+    file_id, video_key, thumb_key = save_metadata(body)
+    params = {
+        'Bucket': BUCKET_NAME,
+        'Key': video_key,
+        'ContentType': body.get('contentType') or 'application/octet-stream'
+    }
+    if checksum_algorithm:
+        params['ChecksumAlgorithm'] = checksum_algorithm
+    upload = s3_client.create_multipart_upload(**params)
+
+    return build_response(200, {
+        'message': 'Upload session created. Upload the parts, then complete the session.',
+        'fileId': file_id,
+        'key': video_key,
+        'uploadId': upload['UploadId'],
+        'partSize': part_size,
+        'partCount': part_count,
+        'checksumAlgorithm': checksum_algorithm,
+        # With checksums, URLs are requested per part once its hash is known
+        'partUrls': {} if checksum_algorithm else presign_parts(upload['UploadId'], video_key, list(range(1, part_count + 1))),
+        'thumbnailUploadURL': presign_put(thumb_key) if thumb_key else None
+    })
+
+def session_part_urls(body):
+    upload_id, key = validate_session(body)
+    checksums = body.get('checksums') or {}
+    return build_response(200, {'partUrls': presign_parts(upload_id, key, body.get('partNumbers') or [], checksums)})
+
+def session_status(body):
+    upload_id, key = validate_session(body)
+    return build_response(200, {'uploadId': upload_id, 'key': key, 'parts': list_uploaded_parts(upload_id, key)})
+
+def complete_session(body):
+    """
+    Completes the upload from the parts S3 has (clients never need to read ETags, so the bucket CORS
+    does not have to expose them). partCount, when given, guards against completing a partial file.
+    """
+    upload_id, key = validate_session(body)
+    parts = list_uploaded_parts(upload_id, key)
+
+    expected = body.get('partCount')
+    if expected is not None and [p['PartNumber'] for p in parts] != list(range(1, int(expected) + 1)):
+        missing = sorted(set(range(1, int(expected) + 1)) - {p['PartNumber'] for p in parts})
+        return build_response(409, {'error': 'Upload is missing parts.', 'missingParts': missing[:PART_URL_BATCH]})
+
+    result = s3_client.complete_multipart_upload(
+        Bucket=BUCKET_NAME,
+        Key=key,
+        UploadId=upload_id,
+        MultipartUpload={'Parts': [{k: v for k, v in p.items() if k != 'Size'} for p in parts]}
+    )
+    return build_response(200, {'message': 'Upload complete.', 'key': key, 'etag': result.get('ETag')})
+
+def abort_session(body):
+    upload_id, key = validate_session(body)
+    s3_client.abort_multipart_upload(Bucket=BUCKET_NAME, Key=key, UploadId=upload_id)
+    return build_response(200, {'message': 'Upload aborted.', 'key': key})
+
+SESSION_ACTIONS = {
+    'create': create_session,
+    'parts': session_part_urls,
+    'status': session_status,
+    'complete': complete_session,
+    'abort': abort_session
+}
+
+@bootstrap.measure_cold_start
 def lambda_handler(event, context):
     try:
         # --- 2. PARSE INPUT (POST METHOD) ---
@@ -39,81 +239,38 @@ def lambda_handler(event, context):
             }
             
         body = json.loads(body_str)
-        
-        # Extract fields
-        filename = body.get('filename')       
-        thumbnail_name = body.get('thumbnail_name') 
-        title = body.get('title')
-        synopsis = body.get('synopsis')
-        owner = body.get('owner')
-
-        # Basic Validation
-        if not filename or not title:
-            return {
-                'statusCode': 400,
-                'headers': {"Access-Control-Allow-Origin": "*"},
-                'body': json.dumps({'error': 'Missing required fields: filename and title'})
-            }
 
-        # --- 3. DEFINE S3 PATHS ---
-        # We use the filename (without extension) as the ID to link CSV and Video
-        file_id = os.path.splitext(filename)[0] 
-        
-        csv_key = f"csv/{file_id}.csv"
-        video_key = f"raw/{filename}"
-        # Only set thumbnail key if a name was provided
-        thumb_key = f"thumbnails/{thumbnail_name}" if thumbnail_name else None
-
-        # --- 4. CREATE CSV & SAVE TO S3 ---
-        # Create CSV in memory (no temp files needed)
-        csv_buffer = io.StringIO()
-        csv_writer = csv.writer(csv_buffer)
-        
-        # Write Header and Data Row
-        csv_writer.writerow(['Title', 'Synopsis', 'Owner', 'VideoKey', 'ThumbnailKey'])
-        csv_writer.writerow([title, synopsis, owner, video_key, thumb_key])
-        
-        # Upload CSV immediately
-        s3_client.put_object(
-            Bucket=BUCKET_NAME,
-            Key=csv_key,
-            Body=csv_buffer.getvalue(),
-            ContentType='text/csv'
-        )
-
-        # --- 5. GENERATE PRE-SIGNED URLS ---
+        # Multipart upload session (large sources): body.action selects the step
+        action = body.get('action')
+        if action:
+            if action not in SESSION_ACTIONS:
+                return build_response(400, {'error': f"Unknown action: {action}"})
+            try:
+                return SESSION_ACTIONS[action](body)
+            except ValueError as e:
+                return build_response(400, {'error': str(e)})
+
+        # --- 3. SAVE METADATA CSV ---
+        try:
+            file_id, video_key, thumb_key = save_metadata(body)
+        except ValueError as e:
+            return build_response(400, {'error': str(e)})
+
+        # --- 4. GENERATE PRE-SIGNED URLS ---
         
         # A. Video URL (Valid for 5 minutes)
-        video_upload_url = s3_client.generate_presigned_url(
-            'put_object',
-            Params={'Bucket': BUCKET_NAME, 'Key': video_key},
-            ExpiresIn=300
-        )
+        video_upload_url = presign_put(video_key)
 
         # B. Thumbnail URL (Optional)
-        thumb_upload_url = None
-        if thumb_key:
-            thumb_upload_url = s3_client.generate_presigned_url(
-                'put_object',
-                Params={'Bucket': BUCKET_NAME, 'Key': thumb_key},
-                ExpiresIn=300
-            )
-
-        # --- 6. RETURN RESPONSE ---
-        return {
-            'statusCode': 200,
-            'headers': {
-                "Access-Control-Allow-Origin": "*", # CORS for frontend
-                "Access-Control-Allow-Credentials": True,
-                "Content-Type": "application/json"
-            },
-            'body': json.dumps({
-                'message': 'Metadata saved. Use these URLs to upload files.',
-                'videoUploadURL': video_upload_url,
-                'thumbnailUploadURL': thumb_upload_url,
-                'fileId': file_id
-            })
-        }
+        thumb_upload_url = presign_put(thumb_key) if thumb_key else None
+
+        # --- 5. RETURN RESPONSE ---
+        return build_response(200, {
+            'message': 'Metadata saved. Use these URLs to upload files.',
+            'videoUploadURL': video_upload_url,
+            'thumbnailUploadURL': thumb_upload_url,
+            'fileId': file_id
+        })
 
     except Exception as e:
         print(f"Error: {str(e)}")
@@ -121,4 +278,7 @@ def lambda_handler(event, context):
             'statusCode': 500,
             'headers': {"Access-Control-Allow-Origin": "*"},
             'body': json.dumps({'error': str(e)})
-        }
\ No newline at end of file
+        }
+
+
+bootstrap.init_complete('GeneratePresignedURL')
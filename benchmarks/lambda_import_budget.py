@@ -0,0 +1,99 @@
+"""
+Cold-import budget check for every Lambda under backend/ (run by the deploy workflow before packaging).
+
+Each handler module is imported in a fresh interpreter (--runs times, median reported), the way the
+Lambda runtime loads it on a cold start. The check fails (exit status 1) if a module takes longer than
+its budget or pulls in boto3 while importing. Clients belong in backend/common/bootstrap.py, created
+on first use.
+
+    pip install boto3 rsa cryptography Pillow brotli
+    python benchmarks/lambda_import_budget.py
+    python benchmarks/lambda_import_budget.py --budget-ms 100 --runs 9
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+DEFAULT_BUDGET_MS = 150
+# Functions whose own dependencies are heavier than the default allows
+BUDGET_OVERRIDES_MS = {}
+
+# What the deployments set; only needs to be plausible (nothing is called at import)
+LAMBDA_ENV = {
+    'AWS_REGION': 'eu-north-1',
+    'AWS_DEFAULT_REGION': 'eu-north-1',
+    'VIDEO_METADATA_TABLE_NAME': 'VideoMetadata',
+    'RAWVIDEO_BUCKET_NAME': 'raw-bucket',
+    'PROCESSED_S3_BUCKET': 'processed-bucket',
+    'CLOUDFRONT_DOMAIN': 'd1234example.cloudfront.net',
+    'KEY_PAIR_ID_PLAYBACK': 'K2EXAMPLE',
+    'SQS_SEGMENTATION_QUEUE_URL': 'https://sqs.eu-north-1.amazonaws.com/123456789012/segmentation',
+    'TRANSCODING_JOB_QUEUE_URL': 'https://sqs.eu-north-1.amazonaws.com/123456789012/jobs',
+}
+
+# Runs in the child interpreter: time the handler import, report it as the last stdout line
+PROBE = """
+import sys, time, json
+sys.path[:0] = [sys.argv[1], sys.argv[2]]
+started = time.perf_counter()
+import lambda_function
+elapsed_ms = (time.perf_counter() - started) * 1000
+print(json.dumps({'import_ms': elapsed_ms, 'boto3': 'boto3' in sys.modules}))
+"""
+
+
+def function_dirs():
+    for name in sorted(os.listdir(BACKEND)):
+        path = os.path.join(BACKEND, name)
+        if os.path.isfile(os.path.join(path, 'lambda_function.py')):
+            yield name, path
+
+
+def measure(path, runs):
+    """Returns (median import ms, boto3 imported) over fresh-interpreter imports of lambda_function."""
+    env = dict(os.environ, **LAMBDA_ENV)
+    samples = []
+    boto3_loaded = False
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', PROBE, os.path.abspath(path), os.path.abspath(BACKEND)],
+                                env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        report = json.loads(result.stdout.decode('utf-8').strip().splitlines()[-1])
+        samples.append(report['import_ms'])
+        boto3_loaded = boto3_loaded or report['boto3']
+    return statistics.median(samples), boto3_loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS, help='Default per-function budget')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh-interpreter imports per function')
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'function':<28} {'import ms':>10} {'budget ms':>10}  boto3 at import")
+    for name, path in function_dirs():
+        budget = BUDGET_OVERRIDES_MS.get(name, args.budget_ms)
+        try:
+            import_ms, boto3_loaded = measure(path, args.runs)
+        except subprocess.CalledProcessError as e:
+            failures += 1
+            print(f"{name:<28} {'ERROR':>10} {budget:>10.0f}  {e.stderr.decode('utf-8', 'replace').strip().splitlines()[-1]}")
+            continue
+
+        over = import_ms > budget
+        failures += over or boto3_loaded
+        flags = ('yes' if boto3_loaded else 'no') + ('  OVER BUDGET' if over else '')
+        print(f"{name:<28} {import_ms:>10.1f} {budget:>10.0f}  {flags}")
+
+    if failures:
+        print(f"\n{failures} function(s) failed the cold-import budget.")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,776 @@
+"""
+End-to-end benchmark of the processing pipeline in one process:
+content_metadata_service -> segmentation_service -> JobWorker (S3-code) -> manifest_file_processor.
+
+S3, SQS and DynamoDB are served by moto, and the stages run as they do in AWS. The S3 event is handed
+to the metadata Lambda. Poller threads then drain the segmentation, job and finalizer queues into the
+segmentation Lambda, --workers JobWorker loops and the finalizer Lambda.
+Encoding uses benchmarks/synthetic_ffmpeg.py, or a real ffmpeg/ffprobe with --ffmpeg/--ffprobe (sources
+are then generated with lavfi). Every AWS call is metered per stage (requests and payload bytes).
+
+The workers, the Lambdas and moto share one interpreter, so absolute latencies include that contention.
+Compare runs made with the same settings on the same machine.
+
+Reported per video: time-to-READY, per-stage latency, chunk encode times, requests and bytes moved.
+--mode isolated runs the videos one after another. --mode mixed uploads them all at once. --mode noisy
+uploads one video of the longest duration for a single owner first, then the shorter ones (x --copies), each
+for its own owner, all at once: the noisy-neighbour case the scheduling lanes are for (--single-queue
+runs it against the one-queue layout instead).
+--json writes the numbers, and --compare checks a run against such a file (exit status 1 on regressions).
+--trace writes the stages' trace spans for ops/trace_report.py (critical path of each video).
+--fail-batch-entries fails a fraction of the segmentation fan-out's SendMessageBatch entries: every video
+should still reach READY (the failed entries are retried).
+--lose-chunk-jobs drops chunk jobs without an error, as a job lost after it was sent would be. Such a video
+only reaches READY with --sweep-interval (the sweeper re-drives its missing chunks after --stuck-after).
+
+    pip install boto3 "moto[s3,sqs,dynamodb]"
+    python benchmarks/pipeline_benchmark.py --durations 60,300,1800 --workers 4 --json before.json
+    python benchmarks/pipeline_benchmark.py --durations 60,300,1800 --workers 4 --compare before.json
+    python benchmarks/pipeline_benchmark.py --mode noisy --durations 1800,60 --copies 8
+    python benchmarks/pipeline_benchmark.py --mode noisy --durations 1800,60 --copies 8 --single-queue
+    python benchmarks/pipeline_benchmark.py --durations 300 --trace spans.jsonl && python ops/trace_report.py spans.jsonl
+    python benchmarks/pipeline_benchmark.py --mode mixed --durations 1800,300 --fail-batch-entries 0.3
+    python benchmarks/pipeline_benchmark.py --mode mixed --durations 300 --copies 4 --lose-chunk-jobs 0.1 --sweep-interval 5
+    python benchmarks/pipeline_benchmark.py --ffmpeg /usr/bin/ffmpeg --ffprobe /usr/bin/ffprobe --durations 60,180
+"""
+import os
+import sys
+import json
+import time
+import random
+import uuid
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+import contextlib
+import importlib.util
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_REGION', os.environ['AWS_DEFAULT_REGION'])
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+
+import boto3  # noqa: E402
+from botocore.client import BaseClient  # noqa: E402
+from moto import mock_aws  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SYNTHETIC_FFMPEG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'synthetic_ffmpeg.py')
+sys.path.insert(0, os.path.dirname(SYNTHETIC_FFMPEG))
+
+import synthetic_ffmpeg  # noqa: E402
+
+# Stage name -> source file (the stage's own code, used to attribute AWS calls)
+BACKEND = os.path.join(ROOT, 'backend')
+STAGES = {
+    'metadata': os.path.join(ROOT, 'backend', 'content_metadata_service', 'lambda_function.py'),
+    'segmentation': os.path.join(ROOT, 'backend', 'segmentation_service', 'lambda_function.py'),
+    'transcode': os.path.join(ROOT, 'S3-code', 'JobWorker.py'),
+    'finalize': os.path.join(ROOT, 'backend', 'manifest_file_processor', 'lambda_function.py'),
+    'sweeper': os.path.join(ROOT, 'backend', 'sweeper_service', 'lambda_function.py'),
+}
+TABLE_NAME = 'BenchVideoMetadata'
+RAW_BUCKET = 'bench-raw'
+PROCESSED_BUCKET = 'bench-processed'
+POLL_IDLE_MIN_SEC = 0.01
+POLL_IDLE_MAX_SEC = 0.2
+FAILED_PREFIX = 'FAILED'
+LANES = ['priority', 'standard', 'bulk']
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+# --- Request metering ---
+
+def payload_size(value):
+    """Size of a request payload: bytes/str, sized file wrappers (s3transfer) or seekable files."""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    try:
+        return len(value)
+    except TypeError:
+        pass
+    if hasattr(value, 'seek') and hasattr(value, 'tell'):
+        position = value.tell()
+        value.seek(0, os.SEEK_END)
+        end = value.tell()
+        value.seek(position)
+        return end - position
+    return 0
+
+
+def request_bytes(service, params):
+    if service == 's3':
+        return payload_size(params.get('Body'))
+    if service == 'sqs':
+        return payload_size(params.get('MessageBody')) + sum(payload_size(e.get('MessageBody')) for e in params.get('Entries', []))
+    return len(json.dumps(params, default=str))
+
+
+def response_bytes(service, operation, response):
+    if service == 's3':
+        return response.get('ContentLength', 0) if operation == 'GetObject' else 0
+    if service == 'sqs':
+        return sum(len(m.get('Body', '')) for m in response.get('Messages', []))
+    return len(json.dumps({k: v for k, v in response.items() if k != 'ResponseMetadata'}, default=str))
+
+
+class RequestMeter:
+    """
+    Counts AWS API calls and payload bytes per stage by wrapping BaseClient._make_api_call.
+    A call belongs to the stage whose code is on the calling stack (the Lambdas share bootstrap's clients),
+    or that submitted the thread-pool task making it (the concurrent fan-out), or else to the stage whose
+    module created the client. Anything else (setup, status polling) is 'harness'.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.client_stages = {}
+        self.file_stages = {os.path.realpath(path): stage for stage, path in STAGES.items()}
+        self.original = None
+        self.original_submit = None
+        self.task_stage = threading.local()
+        self.batch_failure_rate = 0.0 # --fail-batch-entries
+        self.chunk_loss_rate = 0.0 # --lose-chunk-jobs
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+
+    def snapshot(self):
+        with self.lock:
+            return {stage: {'requests': Counter(s['requests']), 'bytes_out': s['bytes_out'], 'bytes_in': s['bytes_in']}
+                    for stage, s in self.stats.items()}
+
+    def register_module(self, stage, module):
+        """Attributes the module-level clients (and resources) of a stage's module to it."""
+        for value in vars(module).values():
+            # vars() rather than getattr: touching a bootstrap.LazyClient would create its client
+            client = value if isinstance(value, BaseClient) else getattr(getattr(value, '__dict__', {}).get('meta'), 'client', None)
+            if isinstance(client, BaseClient):
+                self.client_stages[id(client)] = stage
+
+    def stage_on_stack(self, frame):
+        while frame is not None:
+            stage = self.file_stages.get(os.path.realpath(frame.f_code.co_filename))
+            if stage:
+                return stage
+            frame = frame.f_back
+        return None
+
+    def stage_of(self, client):
+        stage = self.stage_on_stack(sys._getframe(2)) or getattr(self.task_stage, 'stage', None)
+        if stage:
+            return stage
+        # s3transfer worker threads (upload_file/download_file) only have the client to go by
+        return self.client_stages.get(id(client), 'harness')
+
+    def send_batch_with_failures(self, original, client, api_params):
+        """
+        SendMessageBatch where each entry fails (InternalError, retryable) with batch_failure_rate, or is
+        reported as sent but never delivered (a lost chunk job) with chunk_loss_rate.
+        """
+        entries = api_params['Entries']
+        dropped = [e for e in entries if random.random() < self.batch_failure_rate]
+        lost = [e for e in entries if e not in dropped and random.random() < self.chunk_loss_rate]
+        kept = [e for e in entries if e not in dropped and e not in lost]
+        response = original(client, 'SendMessageBatch', dict(api_params, Entries=kept)) if kept else {'Successful': []}
+        response['Successful'] = response.get('Successful', []) + [{'Id': e['Id'], 'MessageId': str(uuid.uuid4())} for e in lost]
+        response['Failed'] = response.get('Failed', []) + [
+            {'Id': e['Id'], 'SenderFault': False, 'Code': 'InternalError', 'Message': 'injected by the benchmark'} for e in dropped]
+        return response
+
+    def install(self):
+        meter = self
+        original = self.original = BaseClient._make_api_call
+
+        def _make_api_call(client, operation_name, api_params):
+            service = client.meta.service_model.service_name
+            stage = meter.stage_of(client)
+            sent = request_bytes(service, api_params)
+            received = 0
+            try:
+                if operation_name == 'SendMessageBatch' and stage == 'segmentation' and \
+                        (meter.batch_failure_rate or meter.chunk_loss_rate):
+                    response = meter.send_batch_with_failures(original, client, api_params)
+                else:
+                    response = original(client, operation_name, api_params)
+                received = response_bytes(service, operation_name, response)
+                return response
+            finally:
+                with meter.lock:
+                    stats = meter.stats.setdefault(stage, {'requests': Counter(), 'bytes_out': 0, 'bytes_in': 0})
+                    stats['requests'][f"{service}.{operation_name}"] += 1
+                    stats['bytes_out'] += sent
+                    stats['bytes_in'] += received
+
+        BaseClient._make_api_call = _make_api_call
+
+        original_submit = self.original_submit = ThreadPoolExecutor.submit
+
+        def submit(executor, fn, *args, **kwargs):
+            stage = meter.stage_on_stack(sys._getframe(1)) or getattr(meter.task_stage, 'stage', None)
+
+            def run(*args, **kwargs):
+                meter.task_stage.stage = stage
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    meter.task_stage.stage = None
+            return original_submit(executor, run, *args, **kwargs)
+
+        ThreadPoolExecutor.submit = submit
+
+    def uninstall(self):
+        if self.original:
+            BaseClient._make_api_call = self.original
+        if self.original_submit:
+            ThreadPoolExecutor.submit = self.original_submit
+
+
+# --- Environment ---
+
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def create_resources():
+    """Buckets, queues and the metadata table (with the indexes the services query)."""
+    s3 = boto3.client('s3')
+    for bucket in (RAW_BUCKET, PROCESSED_BUCKET):
+        s3.create_bucket(Bucket=bucket)
+
+    sqs = boto3.client('sqs')
+    names = ['bench-segmentation', 'bench-jobs', 'bench-finalizer'] + [f"bench-jobs-{lane}" for lane in LANES]
+    queues = {name: sqs.create_queue(QueueName=name)['QueueUrl'] for name in names}
+
+    boto3.client('dynamodb').create_table(
+        TableName=TABLE_NAME,
+        BillingMode='PAY_PER_REQUEST',
+        AttributeDefinitions=[
+            {'AttributeName': 'VideoID', 'AttributeType': 'S'},
+            {'AttributeName': 'Status', 'AttributeType': 'S'},
+            {'AttributeName': 'CreatedAt', 'AttributeType': 'S'},
+            {'AttributeName': 'ContentHash', 'AttributeType': 'S'},
+        ],
+        KeySchema=[{'AttributeName': 'VideoID', 'KeyType': 'HASH'}],
+        GlobalSecondaryIndexes=[
+            {'IndexName': 'Status-CreatedAt-index',
+             'KeySchema': [{'AttributeName': 'Status', 'KeyType': 'HASH'}, {'AttributeName': 'CreatedAt', 'KeyType': 'RANGE'}],
+             'Projection': {'ProjectionType': 'ALL'}},
+            {'IndexName': 'ContentHash-index',
+             'KeySchema': [{'AttributeName': 'ContentHash', 'KeyType': 'HASH'}],
+             'Projection': {'ProjectionType': 'ALL'}},
+        ]
+    )
+    return queues
+
+
+def load_services(queues, ffmpeg, ffprobe, lanes=True):
+    """
+    Imports every stage with the environment its deployment sets, pointed at the local encoder.
+    lanes=False leaves out the lane queues (every chunk goes through bench-jobs).
+    """
+    lane_urls = json.dumps({lane: queues[f"bench-jobs-{lane}"] for lane in LANES}) if lanes else ''
+    os.environ.update({
+        'TRANSCODING_JOB_QUEUE_URLS': lane_urls,
+        'SQS_QUEUE_URLS': lane_urls,
+        'VIDEO_METADATA_TABLE_NAME': TABLE_NAME,
+        'DYNAMODB_TABLE_NAME': TABLE_NAME,
+        'SQS_SEGMENTATION_QUEUE_URL': queues['bench-segmentation'],
+        'TRANSCODING_JOB_QUEUE_URL': queues['bench-jobs'],
+        'SQS_QUEUE_URL': queues['bench-jobs'],
+        'FINALIZER_SQS_URL': queues['bench-finalizer'],
+        'RAW_S3_BUCKET': RAW_BUCKET,
+        'PROCESSED_S3_BUCKET': PROCESSED_BUCKET,
+        'CLOUDFRONT_DOMAIN': 'd1234example.cloudfront.net',
+    })
+    os.environ.pop('THUMBNAIL_FUNCTION_NAME', None) # Derivatives run beside the pipeline, not in its path
+    if BACKEND not in sys.path:
+        sys.path.insert(0, BACKEND) # backend/common (bootstrap), packaged next to each function on deploy
+
+    services = {
+        'metadata': load_module('bench_content_metadata_service', STAGES['metadata']),
+        'segmentation': load_module('bench_segmentation_service', STAGES['segmentation']),
+        'transcode': load_module('bench_job_worker', STAGES['transcode']),
+        'finalize': load_module('bench_manifest_file_processor', STAGES['finalize']),
+        'sweeper': load_module('bench_sweeper_service', STAGES['sweeper']),
+    }
+    services['metadata'].FFPROBE_PATH = ffprobe
+    services['segmentation'].FFPROBE_PATH = ffprobe
+    services['transcode'].FFMPEG_BIN = ffmpeg
+    services['transcode'].FFPROBE_BIN = ffprobe
+    return services
+
+
+def collect_spans(services, f):
+    """Sends every stage's trace spans to f (one JSON line each) for ops/trace_report.py."""
+    from common import tracing
+    lock = threading.Lock()
+
+    def write_span(record):
+        with lock:
+            f.write(json.dumps(record, default=str) + '\n')
+    tracing.write_span = write_span
+    services['transcode'].write_span = write_span # The JobWorker's own copy of the tracing code
+
+
+def synthetic_encoder(workdir):
+    """
+    Executable wrapper running synthetic_ffmpeg.py with this interpreter (the services call one binary
+    path; going through a version-manager shim would add its start-up time to every probe and encode).
+    """
+    path = os.path.join(workdir, 'synthetic-ffmpeg')
+    with open(path, 'w') as f:
+        f.write(f'#!/bin/sh\nexec "{sys.executable}" "{SYNTHETIC_FFMPEG}" "$@"\n')
+    os.chmod(path, 0o755)
+    return path
+
+
+def make_real_source(ffmpeg, path, duration, height):
+    """A real H.264/AAC test pattern (lavfi) for runs with an actual ffmpeg."""
+    width = int(round(height * 16 / 9 / 2)) * 2
+    subprocess.run([
+        ffmpeg, '-v', 'error', '-y',
+        '-f', 'lavfi', '-i', f"testsrc2=size={width}x{height}:rate=30",
+        '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=48000',
+        '-t', str(duration),
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '60', '-c:a', 'aac',
+        '-movflags', '+faststart', path
+    ], check=True)
+
+
+# --- Pipeline run ---
+
+class Tracker:
+    """Per-video timings collected by the stage pollers."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.videos = {}
+        self.done = threading.Condition(self.lock)
+
+    def video(self, video_id):
+        # Later stages can report before the metadata call that created the video has returned
+        return self.videos.setdefault(video_id, {'stages': {}, 'chunks': [], 'status': 'PROCESSING', 'ready_at': None})
+
+    def add(self, video_id, **fields):
+        with self.lock:
+            self.video(video_id).update(fields)
+
+    def record(self, video_id, stage, elapsed_ms):
+        with self.lock:
+            video = self.video(video_id)
+            (video['chunks'] if stage == 'transcode' else video['stages'].setdefault(stage, [])).append(elapsed_ms)
+
+    def finish(self, video_id, status):
+        with self.lock:
+            video = self.video(video_id)
+            if video['ready_at'] is None:
+                video['status'] = status
+                video['ready_at'] = time.perf_counter()
+                self.done.notify_all()
+
+    def pending(self, video_ids):
+        return [v for v in video_ids if self.videos[v]['ready_at'] is None]
+
+
+class Poller:
+    """
+    Short-polls one queue and backs off while it is empty. moto answers every poll on this process's CPU,
+    so tight idle polling would slow down the stages being measured.
+    """
+
+    def __init__(self, sqs, queue_url, count):
+        self.sqs = sqs
+        self.queue_url = queue_url
+        self.count = count
+        self.idle = POLL_IDLE_MIN_SEC
+
+    def receive(self):
+        messages = self.sqs.receive_message(QueueUrl=self.queue_url, MaxNumberOfMessages=self.count,
+                                            WaitTimeSeconds=0).get('Messages', [])
+        if messages:
+            self.idle = POLL_IDLE_MIN_SEC
+        else:
+            time.sleep(self.idle)
+            self.idle = min(POLL_IDLE_MAX_SEC, self.idle * 2)
+        return messages
+
+    def delete(self, message):
+        self.sqs.delete_message(QueueUrl=self.queue_url, ReceiptHandle=message['ReceiptHandle'])
+
+
+def segmentation_loop(services, sqs, queues, tracker, stop):
+    """Segmentation Lambda: one SQS record per invocation."""
+    poller = Poller(sqs, queues['bench-segmentation'], 1)
+    while not stop.is_set():
+        messages = poller.receive()
+        if not messages:
+            continue
+        message = messages[0]
+        video_id = json.loads(message['Body'])['VideoID']
+        started = time.perf_counter()
+        try:
+            services['segmentation'].lambda_handler({'Records': [{'messageId': message['MessageId'], 'body': message['Body']}]}, None)
+            poller.delete(message)
+        except Exception as e:
+            print(f"segmentation failed for {video_id}: {e}", file=sys.__stderr__)
+            tracker.finish(video_id, 'FAILED_SEGMENTATION')
+        tracker.record(video_id, 'segmentation', (time.perf_counter() - started) * 1000)
+
+
+def worker_loop(services, sqs, queues, tracker, stop):
+    """One EC2 JobWorker: JobWorker.poll_once() (lane round-robin, idle lanes in rotation) without the long polls, backing off while idle."""
+    worker = services['transcode']
+    idle = POLL_IDLE_MIN_SEC
+    while not stop.is_set():
+        started = time.perf_counter()
+        job_data = worker.poll_once(wait_seconds=0)
+        if not job_data:
+            time.sleep(idle)
+            idle = min(POLL_IDLE_MAX_SEC, idle * 2)
+            continue
+        idle = POLL_IDLE_MIN_SEC
+        tracker.record(job_data['VideoID'], 'transcode', (time.perf_counter() - started) * 1000)
+
+
+def finalizer_loop(services, sqs, queues, tracker, table, stop):
+    """Finalizer Lambda: batches of up to 10 records, partial batch failures left on the queue."""
+    poller = Poller(sqs, queues['bench-finalizer'], 10)
+    while not stop.is_set():
+        messages = poller.receive()
+        if not messages:
+            continue
+        records = [{'messageId': m['MessageId'], 'body': m['Body']} for m in messages]
+        started = time.perf_counter()
+        response = services['finalize'].lambda_handler({'Records': records}, None)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        failed = {f['itemIdentifier'] for f in response.get('batchItemFailures', [])}
+        for message in messages:
+            if message['MessageId'] not in failed:
+                poller.delete(message)
+
+        for video_id in {json.loads(m['Body'])['VideoID'] for m in messages}:
+            tracker.record(video_id, 'finalize', elapsed_ms)
+            status = table.get_item(Key={'VideoID': video_id}).get('Item', {}).get('Status')
+            if status == 'READY':
+                tracker.finish(video_id, status)
+
+
+def sweeper_loop(services, tracker, interval, stop):
+    """Sweeper Lambda on its schedule (--sweep-interval)."""
+    while not stop.wait(interval):
+        result = services['sweeper'].lambda_handler({}, None)
+        if result['actions']:
+            print(f"sweep: {result['actions']}, {result['redrivenChunks']} chunk(s) re-driven", file=sys.__stderr__)
+
+
+def failure_watch(tracker, table, video_ids, stop):
+    """Ends videos that a stage marked FAILED_* (their chunks would otherwise be waited on until --timeout)."""
+    while not stop.wait(0.5):
+        with tracker.lock:
+            pending = tracker.pending(video_ids)
+        for video_id in pending:
+            status = table.get_item(Key={'VideoID': video_id}).get('Item', {}).get('Status', '')
+            if status.startswith(FAILED_PREFIX):
+                tracker.finish(video_id, status)
+
+
+def upload_source(s3, label, duration, owner, args, workdir):
+    """Uploads a source video and its descriptive CSV to the raw bucket; returns (key, size)."""
+    key = f"raw/{label}.mp4"
+    path = os.path.join(workdir, f"{label}.mp4")
+    if args.ffmpeg:
+        make_real_source(args.ffmpeg, path, duration, args.height)
+    else:
+        synthetic_ffmpeg.make_source(path, duration, int(round(args.height * 16 / 9 / 2)) * 2, args.height,
+                                     args.source_kbps, seed=f"{label}-{uuid.uuid4()}")
+    s3.upload_file(path, RAW_BUCKET, key)
+    s3.put_object(Bucket=RAW_BUCKET, Key=f"csv/{label}.csv",
+                  Body=f"Title,Genre,Owner\n{label},Benchmark,{owner}\n".encode('utf-8'))
+    size = os.path.getsize(path)
+    os.remove(path)
+    return key, size
+
+
+def s3_event(key, size):
+    return {'Records': [{'s3': {'bucket': {'name': RAW_BUCKET}, 'object': {'key': key, 'size': size}}}]}
+
+
+def run_batch(videos, services, queues, meter, args, workdir):
+    """Runs one set of uploads through the whole pipeline; returns (tracker, meter snapshot, video ids)."""
+    s3 = boto3.client('s3')
+    sqs = boto3.client('sqs')
+    table = boto3.resource('dynamodb').Table(TABLE_NAME)
+    tracker = Tracker()
+    stop = threading.Event()
+
+    uploads = [(label, duration) + upload_source(s3, label, duration, owner, args, workdir) for label, duration, owner in videos]
+    meter.reset()
+
+    threads = [threading.Thread(target=segmentation_loop, args=(services, sqs, queues, tracker, stop), daemon=True),
+               threading.Thread(target=finalizer_loop, args=(services, sqs, queues, tracker, table, stop), daemon=True)]
+    threads += [threading.Thread(target=worker_loop, args=(services, sqs, queues, tracker, stop), daemon=True)
+                for _ in range(args.workers)]
+    if args.sweep_interval:
+        threads.append(threading.Thread(target=sweeper_loop, args=(services, tracker, args.sweep_interval, stop), daemon=True))
+    for thread in threads:
+        thread.start()
+
+    video_ids = []
+    for label, duration, key, size in uploads:
+        # S3 -> metadata Lambda (one event per upload, as the bucket notification delivers them)
+        started = time.perf_counter()
+        response = services['metadata'].lambda_handler(s3_event(key, size), None)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        body = json.loads(response['body'])
+        video_id = body.get('VideoID')
+        if response['statusCode'] != 200 or not video_id:
+            print(f"metadata failed for {label}: {response['body']}", file=sys.__stderr__)
+            continue
+        tracker.add(video_id, label=label, duration=duration, size=size, started_at=started)
+        tracker.record(video_id, 'metadata', elapsed_ms)
+        video_ids.append(video_id)
+
+    watcher = threading.Thread(target=failure_watch, args=(tracker, table, video_ids, stop), daemon=True)
+    watcher.start()
+
+    deadline = time.perf_counter() + args.timeout
+    with tracker.lock:
+        while tracker.pending(video_ids) and time.perf_counter() < deadline:
+            tracker.done.wait(0.5)
+    stop.set()
+    for thread in threads + [watcher]:
+        thread.join()
+    return tracker, meter.snapshot(), video_ids
+
+
+# --- Report ---
+
+def stage_ms(video, stage):
+    return sum(video['stages'].get(stage, []))
+
+
+def video_result(video):
+    chunks = video['chunks']
+    ready_sec = (video['ready_at'] - video['started_at']) if video['ready_at'] else None
+    return {
+        'label': video['label'],
+        'duration_sec': video['duration'],
+        'source_bytes': video['size'],
+        'status': video['status'] if video['ready_at'] else 'TIMEOUT',
+        'time_to_ready_sec': ready_sec,
+        'metadata_ms': stage_ms(video, 'metadata'),
+        'segmentation_ms': stage_ms(video, 'segmentation'),
+        'chunks': len(chunks),
+        'chunk_p50_ms': percentile(chunks, 50),
+        'chunk_max_ms': max(chunks, default=0.0),
+        'transcode_total_ms': sum(chunks),
+        'finalize_ms': stage_ms(video, 'finalize'),
+    }
+
+
+def print_videos(results):
+    print(f"{'video':<14} {'len s':>6} {'status':>8} {'ready s':>8} {'meta ms':>8} {'seg ms':>8} "
+          f"{'chunks':>6} {'chunk p50':>9} {'chunk max':>9} {'encode s':>9} {'final ms':>9}")
+    for r in results:
+        ready = f"{r['time_to_ready_sec']:.2f}" if r['time_to_ready_sec'] is not None else '-'
+        print(f"{r['label']:<14} {r['duration_sec']:>6.0f} {r['status'][:8]:>8} {ready:>8} {r['metadata_ms']:>8.1f} "
+              f"{r['segmentation_ms']:>8.1f} {r['chunks']:>6} {r['chunk_p50_ms']:>9.1f} {r['chunk_max_ms']:>9.1f} "
+              f"{r['transcode_total_ms'] / 1000:>9.2f} {r['finalize_ms']:>9.1f}")
+
+
+def ready_by_length(results):
+    """Source length (s) -> time-to-READY p50/p95/max over its READY videos (the per-class latency under load)."""
+    lengths = {}
+    for r in results:
+        if r['status'] == 'READY':
+            lengths.setdefault(str(int(r['duration_sec'])), []).append(r['time_to_ready_sec'])
+    return {length: {'count': len(values), 'p50': percentile(values, 50), 'p95': percentile(values, 95), 'max': max(values)}
+            for length, values in sorted(lengths.items(), key=lambda item: float(item[0]))}
+
+
+def print_ready_by_length(by_length):
+    print(f"\n{'length s':>8} {'videos':>6} {'ready p50 s':>11} {'ready p95 s':>11} {'max s':>8}")
+    for length, r in by_length.items():
+        print(f"{length:>8} {r['count']:>6} {r['p50']:>11.2f} {r['p95']:>11.2f} {r['max']:>8.2f}")
+
+
+def traffic_result(stats):
+    return {stage: {'requests': sum(s['requests'].values()), 'bytes_out': s['bytes_out'], 'bytes_in': s['bytes_in'],
+                    'operations': dict(s['requests'].most_common())}
+            for stage, s in stats.items()}
+
+
+def print_traffic(label, traffic):
+    print(f"\nAWS traffic ({label})")
+    print(f"{'stage':<13} {'requests':>8} {'MiB out':>9} {'MiB in':>9}  top operations")
+    for stage in STAGES: # 'harness' (queue polling, status checks) is in the JSON only
+        t = traffic.get(stage)
+        if not t:
+            continue
+        top = ', '.join(f"{op} {n}" for op, n in list(t['operations'].items())[:4])
+        print(f"{stage:<13} {t['requests']:>8} {t['bytes_out'] / 2**20:>9.2f} {t['bytes_in'] / 2**20:>9.2f}  {top}")
+
+
+def compare(baseline_path, results, traffic, tolerance):
+    """
+    Flags time-to-READY, requests and bytes that grew by more than tolerance against an earlier --json run.
+    Returns the number of regressions.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = 0
+
+    def check(name, before, after):
+        nonlocal regressions
+        if before is None or after is None:
+            return
+        change = (after - before) / before if before else (1.0 if after else 0.0)
+        regressed = change > tolerance
+        regressions += regressed
+        print(f"{name:<40} {before:>14,.2f} {after:>14,.2f} {change:>+8.1%}{'  REGRESSION' if regressed else ''}")
+
+    print(f"\nCompared with {baseline_path} (tolerance {tolerance:.0%})")
+    before_videos = {r['label']: r for r in baseline.get('videos', [])}
+    for r in results:
+        if r['label'] in before_videos:
+            check(f"{r['label']} time-to-READY s", before_videos[r['label']]['time_to_ready_sec'], r['time_to_ready_sec'])
+    for length, r in ready_by_length(results).items():
+        before = baseline.get('ready_by_length', {}).get(length)
+        if before and r['count'] > 1:
+            check(f"{length}s uploads time-to-READY p95 s", before['p95'], r['p95'])
+    for label, stages in traffic.items():
+        for stage in STAGES:
+            before, after = baseline.get('traffic', {}).get(label, {}).get(stage), stages.get(stage)
+            if before and after:
+                check(f"{label} {stage} requests", before['requests'], after['requests'])
+                check(f"{label} {stage} bytes", before['bytes_out'] + before['bytes_in'], after['bytes_out'] + after['bytes_in'])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--durations', default='60,300,1800', help='Comma-separated source lengths in seconds')
+    parser.add_argument('--copies', type=int, default=1, help='Uploads per duration')
+    parser.add_argument('--mode', choices=['isolated', 'mixed', 'noisy'], default='isolated',
+                        help='isolated: one video at a time; mixed: all uploads at once; '
+                             'noisy: one longest-duration upload, then the others, each owner separate, at once')
+    parser.add_argument('--single-queue', action='store_true',
+                        help='One job queue instead of the priority/standard/bulk lanes (the old layout)')
+    parser.add_argument('--workers', type=int, default=4, help='JobWorker loops (EC2 instances)')
+    parser.add_argument('--height', type=int, default=1080, help='Source height (selects the ladder)')
+    parser.add_argument('--source-kbps', type=int, default=100, help='Synthetic source bitrate (raw object size)')
+    parser.add_argument('--byte-scale', type=float, default=0.05,
+                        help='Synthetic segment size as a fraction of the ladder bitrate (keeps moto memory bounded)')
+    parser.add_argument('--encode-speed', type=float, default=200.0,
+                        help='Synthetic encode speed in x realtime per rendition (0 = no simulated CPU time)')
+    parser.add_argument('--ffmpeg', help='Real ffmpeg binary (requires --ffprobe); default is the synthetic encoder')
+    parser.add_argument('--ffprobe', help='Real ffprobe binary')
+    parser.add_argument('--timeout', type=float, default=600.0, help='Seconds to wait for READY per batch')
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--compare', help='Earlier --json output to check for regressions (exit status 1 if any)')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative growth for --compare')
+    parser.add_argument('--trace', help='Write the stages\' trace spans to this file (read it with ops/trace_report.py)')
+    parser.add_argument('--fail-batch-entries', type=float, default=0.0, metavar='RATE',
+                        help='Fail this fraction of the segmentation stage\'s SendMessageBatch entries (fan-out retries)')
+    parser.add_argument('--lose-chunk-jobs', type=float, default=0.0, metavar='RATE',
+                        help='Silently lose this fraction of the chunk jobs segmentation sends (only a sweep recovers them)')
+    parser.add_argument('--sweep-interval', type=float, default=0.0, metavar='SEC',
+                        help='Run the sweeper Lambda every SEC seconds (0: no sweeper)')
+    parser.add_argument('--stuck-after', type=float, default=90.0, metavar='SEC',
+                        help='Sweeper STUCK_AFTER_SEC for the run (scaled down from the deployed 30 minutes; keep it '
+                             'above the time the workers need to drain the run\'s backlog)')
+    parser.add_argument('--verbose', action='store_true', help='Keep the services\' logs and prints')
+    args = parser.parse_args()
+
+    if bool(args.ffmpeg) != bool(args.ffprobe):
+        parser.error('--ffmpeg and --ffprobe go together')
+    if not args.ffmpeg:
+        os.environ['SYNTHETIC_BYTE_SCALE'] = str(args.byte_scale)
+        os.environ['SYNTHETIC_ENCODE_SPEED'] = str(args.encode_speed)
+
+    durations = [float(d) for d in args.durations.split(',') if d.strip()]
+    if args.mode == 'noisy':
+        # One owner's long upload lands first; the short uploads of everyone else queue behind its chunks
+        long_duration = max(durations)
+        videos = [(f"bench-{int(long_duration)}s-0", long_duration, 'studio')]
+        videos += [(f"bench-{int(d)}s-{i}", d, f"creator-{i}") for d in durations if d != long_duration for i in range(args.copies)]
+    else:
+        videos = [(f"bench-{int(d)}s-{i}", d, 'bench') for d in durations for i in range(args.copies)]
+    batches = [[video] for video in videos] if args.mode == 'isolated' else [videos]
+
+    meter = RequestMeter()
+    meter.batch_failure_rate = args.fail_batch_entries
+    meter.chunk_loss_rate = args.lose_chunk_jobs
+    results = []
+    traffic = {}
+    with mock_aws(), tempfile.TemporaryDirectory() as workdir:
+        queues = create_resources()
+        encoder_path = synthetic_encoder(workdir) if not args.ffmpeg else None
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else open(os.devnull, 'w')):
+            services = load_services(queues, args.ffmpeg or encoder_path, args.ffprobe or encoder_path, not args.single_queue)
+        for stage, module in services.items():
+            meter.register_module(stage, module)
+        services['sweeper'].STUCK_AFTER_SEC = args.stuck_after
+        trace_file = open(args.trace, 'w') if args.trace else None
+        if trace_file:
+            collect_spans(services, trace_file)
+        logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+        meter.install()
+        try:
+            for batch in batches:
+                output = sys.stdout if args.verbose else open(os.devnull, 'w')
+                with contextlib.redirect_stdout(output):
+                    tracker, stats, video_ids = run_batch(batch, services, queues, meter, args, workdir)
+                batch_results = [video_result(tracker.videos[v]) for v in video_ids]
+                results.extend(batch_results)
+                traffic[batch[0][0] if args.mode == 'isolated' else args.mode] = traffic_result(stats)
+        finally:
+            meter.uninstall()
+            if trace_file:
+                trace_file.close()
+
+    encoder = f"ffmpeg {args.ffmpeg}" if args.ffmpeg else \
+        f"synthetic (segments x{args.byte_scale} of ladder bitrate, {args.encode_speed:g}x realtime)"
+    layout = 'one job queue' if args.single_queue else 'priority/standard/bulk lanes'
+    print(f"Mode {args.mode}, {args.workers} worker(s), {layout}, {args.height}p sources, encoder: {encoder}\n")
+    print_videos(results)
+    ready = [r['time_to_ready_sec'] for r in results if r['status'] == 'READY']
+    if len(ready) > 1:
+        print(f"\ntime-to-READY p50 {percentile(ready, 50):.2f}s  p95 {percentile(ready, 95):.2f}s  max {max(ready):.2f}s")
+    by_length = ready_by_length(results)
+    if args.mode != 'isolated':
+        print_ready_by_length(by_length)
+    for label, t in traffic.items():
+        print_traffic(label, t)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'mode': args.mode, 'workers': args.workers, 'lanes': not args.single_queue, 'encoder': encoder,
+                       'videos': results, 'ready_by_length': by_length, 'traffic': traffic}, f, indent=2)
+
+    if args.compare and compare(args.compare, results, traffic, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
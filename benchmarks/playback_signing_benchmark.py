@@ -0,0 +1,120 @@
+"""
+Throughput benchmark for the playback cookie signer (backend/playback_service/lambda_function.py).
+
+Compares the per-request behaviour of the original handler (new SSM client, decrypt, PEM parse and an
+RSA signature on every call) with the warm-container signer (cached key + cookies per expiry bucket),
+then measures per-title scoped batches (MAX_BATCH_TITLES ids per call, drawn from --titles) with the
+pure-Python rsa and the cryptography signing backends.
+SSM is served by moto, so no AWS account is needed; a real SSM call adds network latency on top.
+
+    pip install boto3 rsa cryptography "moto[ssm]"
+    python benchmarks/playback_signing_benchmark.py --requests 2000 --titles 5000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+os.environ.setdefault('CLOUDFRONT_DOMAIN', 'd1234example.cloudfront.net')
+os.environ.setdefault('KEY_PAIR_ID_PLAYBACK', 'K2BENCHMARK')
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'playback_service'))
+
+import boto3  # noqa: E402
+import rsa  # noqa: E402
+from moto import mock_aws  # noqa: E402
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def legacy_request(playback):
+    """What every invocation cost before the warm signer: SSM client + fetch + parse + sign."""
+    client = boto3.client('ssm')
+    response = client.get_parameter(Name=playback.PARAMETER_NAME, WithDecryption=True)
+    private_key = rsa.PrivateKey.load_pkcs1(response['Parameter']['Value'].encode('utf-8'))
+    policy = f'{{"Statement":[{{"Resource":"https://{playback.CLOUDFRONT_DOMAIN}/*","Condition":{{"DateLessThan":{{"AWS:EpochTime":{int(time.time()) + 3600}}}}}}}]}}'
+    playback.make_safe_base64(rsa.sign(policy.encode('utf-8'), private_key, 'SHA-1'))
+
+
+def warm_request(playback):
+    response = playback.lambda_handler({}, None)
+    assert response['statusCode'] == 200, response
+
+
+def batch_requests(titles, batch_size, rng):
+    """Browse-page batches: ids drawn with a popularity skew, so warm titles repeat across pages."""
+    catalog = [f"video-{i:06d}" for i in range(titles)]
+    weights = [1.0 / (rank + 1) for rank in range(titles)]
+
+    def request(playback):
+        ids = list(dict.fromkeys(rng.choices(catalog, weights, k=batch_size)))
+        response = playback.lambda_handler({'body': json.dumps({'videoIds': ids})}, None)
+        assert response['statusCode'] == 200, response
+    return request
+
+
+def use_backend(playback, backend):
+    """Switches the module between the cryptography and the pure-Python rsa signer and clears its caches."""
+    if backend == 'rsa':
+        playback.serialization = None
+    else:
+        from cryptography.hazmat.primitives import serialization
+        playback.serialization = serialization
+    playback.key_cache.update({'raw_key': None, 'private_key': None, 'loaded_at': 0})
+    playback.cookie_cache.clear()
+    playback.get_private_key()
+    assert isinstance(playback.key_cache['private_key'], rsa.PrivateKey) == (backend == 'rsa')
+
+
+def run(name, request, playback, count):
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(count):
+        request_started = time.perf_counter()
+        request(playback)
+        latencies.append((time.perf_counter() - request_started) * 1000)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<8} {count:>8} {count / elapsed:>10.1f} {percentile(latencies, 50):>8.3f} "
+          f"{percentile(latencies, 99):>8.3f} {max(latencies):>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000, help='Requests for the warm signer')
+    parser.add_argument('--legacy-requests', type=int, default=200, help='Requests for the original handler (slow)')
+    parser.add_argument('--batches', type=int, default=200, help='Scoped batch calls per backend')
+    parser.add_argument('--titles', type=int, default=5000, help='Catalog size the batches draw from')
+    parser.add_argument('--key-bits', type=int, default=2048)
+    args = parser.parse_args()
+
+    with mock_aws():
+        import lambda_function as playback
+
+        _, private_key = rsa.newkeys(args.key_bits)
+        pem = private_key.save_pkcs1().decode('utf-8')
+        boto3.client('ssm').put_parameter(Name=playback.PARAMETER_NAME, Type='SecureString', Value=pem)
+
+        print(f"{'handler':<8} {'requests':>8} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        run('legacy', legacy_request, playback, args.legacy_requests)
+        run('warm', warm_request, playback, args.requests)
+
+        print(f"\nScoped batches of {playback.MAX_BATCH_TITLES} ids from {args.titles} titles (cold cache first)")
+        print(f"{'backend':<8} {'batches':>8} {'batch/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}  signatures")
+        backends = ['rsa'] + (['native'] if playback.serialization is not None else [])
+        for backend in backends:
+            use_backend(playback, backend)
+            run(backend, batch_requests(args.titles, playback.MAX_BATCH_TITLES, random.Random(7)), playback, args.batches)
+            print(f"{'':>57}{len(playback.cookie_cache)}")
+
+
+if __name__ == '__main__':
+    main()
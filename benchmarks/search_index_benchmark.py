@@ -0,0 +1,107 @@
+"""
+Query benchmark for the catalog search index (backend/contentListing_service/search_index.py).
+
+Builds an index over a synthetic catalog (100k titles by default) and reports build time,
+index memory and per-query latency percentiles for exact, multi-term and prefix queries.
+
+    python benchmarks/search_index_benchmark.py --titles 100000 --queries 2000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import itertools
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'contentListing_service'))
+
+from search_index import SearchIndex  # noqa: E402
+
+SYLLABLES = "ka lo mi ra ne to su vi da re an el or is um ba co fe gi ho".split()
+OWNERS = [f"studio {name}" for name in "north south east west alpha beta gamma delta orbit nova".split()]
+
+
+def synthetic_vocabulary(size, rng):
+    """Pseudo-words; drawn with Zipf-like weights so a few words are common and most are rare."""
+    words = sorted({''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(size * 2)})[:size]
+    rng.shuffle(words)
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(words))))
+    return words, cum_weights
+
+
+def synthetic_catalog(count, vocabulary, rng):
+    """Generates catalog snapshot entries shaped like the ones content_metadata_service writes."""
+    words, cum_weights = vocabulary
+    for i in range(count):
+        yield {
+            'VideoID': f"video-{i:07d}",
+            'Status': 'READY',
+            'title': ' '.join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(1, 4))).title(),
+            'synopsis': ' '.join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(12, 40))),
+            'owner': rng.choice(OWNERS),
+        }
+
+
+def synthetic_queries(count, vocabulary, rng):
+    """Mix of single-word, two-word and prefix (search-as-you-type) queries, weighted like the catalog."""
+    words, cum_weights = vocabulary
+    queries = []
+    for i in range(count):
+        first, second = rng.choices(words, cum_weights=cum_weights, k=2)
+        kind = i % 3
+        if kind == 0:
+            queries.append(('exact', first))
+        elif kind == 1:
+            queries.append(('multi', f"{first} {second}"))
+        else:
+            queries.append(('prefix', f"{first} {second[:rng.randint(2, max(2, len(second) - 1))]}"))
+    return queries
+
+
+def postings_megabytes(index):
+    """Size of the postings arrays (document numbers + weights) and the vocabulary strings."""
+    size = sum(docs.itemsize * len(docs) + weights.itemsize * len(weights) for docs, weights in index.postings.values())
+    size += sum(sys.getsizeof(token) for token in index.vocabulary)
+    return size / (1024 * 1024)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--titles', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--vocabulary', type=int, default=20000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = synthetic_vocabulary(args.vocabulary, rng)
+    entries = list(synthetic_catalog(args.titles, vocabulary, rng))
+
+    started = time.perf_counter()
+    index = SearchIndex(entries)
+    build_seconds = time.perf_counter() - started
+
+    print(f"Titles:        {len(index)}")
+    print(f"Vocabulary:    {len(index.vocabulary)} tokens")
+    print(f"Build time:    {build_seconds:.2f}s")
+    print(f"Postings:      {postings_megabytes(index):.1f} MB")
+
+    latencies = {}
+    for kind, query in synthetic_queries(args.queries, vocabulary, rng):
+        started = time.perf_counter()
+        index.search(query, limit=args.limit)
+        latencies.setdefault(kind, []).append((time.perf_counter() - started) * 1000)
+
+    print(f"\n{'query':<8} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for kind, values in latencies.items():
+        print(f"{kind:<8} {len(values):>6} {percentile(values, 50):>8.2f} {percentile(values, 95):>8.2f} {percentile(values, 99):>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
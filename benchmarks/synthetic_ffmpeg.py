@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Synthetic stand-in for ffmpeg/ffprobe used by benchmarks/pipeline_benchmark.py on machines without them.
+
+It understands exactly the command lines the pipeline runs:
+  * ffprobe -show_format -show_streams on a path or pipe:0 (content_metadata_service, segmentation_service)
+  * ffprobe -show_streams / -show_entries packet=... on an encoded segment (JobWorker)
+  * ffmpeg HLS chunk encodes and the trick-play sprite grab (JobWorker)
+
+Sources are "synthetic videos": one header line (b"SYNTHETIC-VIDEO {json}\\n") followed by padding, so
+the S3 objects have a realistic size for their duration and bitrate. Encoded segments are sized from
+the ladder bitrate x duration x SYNTHETIC_BYTE_SCALE, and every encode sleeps duration / SYNTHETIC_ENCODE_SPEED
+(0 = no sleep) to stand in for the CPU time of a real encode.
+
+    python benchmarks/synthetic_ffmpeg.py make-source out.mp4 --duration 300 --height 1080 --kbps 200
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+
+SOURCE_MAGIC = b'SYNTHETIC-VIDEO '
+SEGMENT_MAGIC = b'SYNTHETIC-TS '
+HEADER_LIMIT = 4096
+PROBE_READ_BYTES = 64 * 1024 # What the fake probe consumes from a pipe before exiting (a real moov/PAT read)
+KEYFRAME_INTERVAL_SEC = 2.0
+PACKETS_PER_SECOND = 2
+TS_PACKET_BYTES = 188
+
+BYTE_SCALE = float(os.environ.get('SYNTHETIC_BYTE_SCALE', '1.0'))
+ENCODE_SPEED = float(os.environ.get('SYNTHETIC_ENCODE_SPEED', '0'))
+
+
+def make_source(path, duration, width, height, kbps, seed=''):
+    """Writes a synthetic source of duration x kbps bytes (seed keeps equal-length sources distinct)."""
+    header = {'duration': duration, 'width': width, 'height': height, 'bit_rate': kbps * 1000, 'seed': seed}
+    size = int(duration * kbps * 1000 / 8)
+    with open(path, 'wb') as f:
+        line = SOURCE_MAGIC + json.dumps(header).encode('utf-8') + b'\n'
+        f.write(line)
+        remaining = max(0, size - len(line))
+        block = b'\0' * (1024 * 1024)
+        while remaining:
+            f.write(block[:min(remaining, len(block))])
+            remaining -= min(remaining, len(block))
+    return size
+
+
+def read_header(stream, magic):
+    line = stream.readline(HEADER_LIMIT)
+    if not line.startswith(magic):
+        raise ValueError('not a synthetic media file')
+    return json.loads(line[len(magic):])
+
+
+def option(args, name, default=None):
+    return args[args.index(name) + 1] if name in args else default
+
+
+def parse_kbps(value):
+    return int(value.lower().replace('k', '')) if value else 0
+
+
+# --- ffprobe ---
+
+def probe_source(header):
+    return {
+        'streams': [
+            {'index': 0, 'codec_type': 'video', 'codec_name': 'h264', 'profile': 'High', 'level': 40,
+             'width': header['width'], 'height': header['height']},
+            {'index': 1, 'codec_type': 'audio', 'codec_name': 'aac', 'profile': 'LC'}
+        ],
+        'format': {'duration': f"{float(header['duration']):.6f}", 'bit_rate': str(header['bit_rate'])}
+    }
+
+
+def probe_segment(header, size, args):
+    if 'packet=pts_time,pos,flags' in args:
+        packets = []
+        count = max(1, int(header['duration'] * PACKETS_PER_SECOND))
+        keyframe_every = int(KEYFRAME_INTERVAL_SEC * PACKETS_PER_SECOND)
+        for i in range(count):
+            pos = (size * i // count) // TS_PACKET_BYTES * TS_PACKET_BYTES
+            packets.append({'pts_time': f"{header['start'] + i / PACKETS_PER_SECOND:.6f}", 'pos': str(pos),
+                            'flags': 'K_' if i % keyframe_every == 0 else '__'})
+        return {'packets': packets}
+    return {'streams': probe_source(header)['streams']}
+
+
+def ffprobe(args):
+    source = args[-1]
+    if source.startswith(('http://', 'https://')):
+        sys.stderr.write('synthetic ffprobe cannot read URLs\n')
+        return 1
+    try:
+        if source == 'pipe:0':
+            stdin = sys.stdin.buffer
+            header = read_header(stdin, SOURCE_MAGIC)
+            stdin.read(PROBE_READ_BYTES)
+            output = probe_source(header)
+        else:
+            with open(source, 'rb') as f:
+                if source.endswith('.ts'):
+                    output = probe_segment(read_header(f, SEGMENT_MAGIC), os.path.getsize(source), args)
+                else:
+                    output = probe_source(read_header(f, SOURCE_MAGIC))
+    except (OSError, ValueError) as e:
+        sys.stderr.write(f"{source}: {e}\n")
+        return 1
+    sys.stdout.write(json.dumps(output))
+    return 0
+
+
+# --- ffmpeg ---
+
+def write_padded(path, header_line, size):
+    with open(path, 'wb') as f:
+        f.write(header_line)
+        f.write(b'\0' * max(0, size - len(header_line)))
+
+
+def encode_hls(args, source):
+    start = float(option(args, '-ss', 0))
+    duration = min(float(option(args, '-t', source['duration'])), float(source['duration']) - start)
+    segment_time = float(option(args, '-hls_time', 2))
+    height = int(option(args, '-vf', f"scale=-2:{source['height']}").rsplit(':', 1)[1])
+    width = int(round(source['width'] * height / source['height'] / 2)) * 2
+    total_kbps = parse_kbps(option(args, '-b:v')) + parse_kbps(option(args, '-b:a'))
+    segment_pattern = option(args, '-hls_segment_filename')
+    manifest_path = args[-1]
+
+    if ENCODE_SPEED > 0:
+        time.sleep(duration / ENCODE_SPEED)
+
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', f"#EXT-X-TARGETDURATION:{math.ceil(segment_time)}", '#EXT-X-MEDIA-SEQUENCE:0']
+    offset = 0.0
+    index = 0
+    while offset < duration - 1e-6:
+        segment_duration = min(segment_time, duration - offset)
+        segment_path = segment_pattern % index
+        header = {'width': width, 'height': height, 'start': start + offset, 'duration': segment_duration,
+                  'bit_rate': total_kbps * 1000}
+        size = max(TS_PACKET_BYTES * 8, int(total_kbps * 1000 / 8 * segment_duration * BYTE_SCALE))
+        write_padded(segment_path, SEGMENT_MAGIC + json.dumps(header).encode('utf-8') + b'\n', size)
+        lines.append(f"#EXTINF:{segment_duration:.6f},")
+        lines.append(os.path.basename(segment_path))
+        offset += segment_duration
+        index += 1
+    lines.append('#EXT-X-ENDLIST')
+
+    with open(manifest_path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def ffmpeg(args):
+    try:
+        with open(option(args, '-i'), 'rb') as f:
+            source = read_header(f, SOURCE_MAGIC)
+    except (OSError, ValueError, TypeError) as e:
+        sys.stderr.write(f"input: {e}\n")
+        return 1
+
+    if '-hls_segment_filename' in args:
+        encode_hls(args, source)
+    else:
+        # Single-image output (trick-play sprite / frame grab)
+        write_padded(args[-1], b'\xff\xd8', 16 * 1024)
+    return 0
+
+
+def main():
+    args = sys.argv[1:]
+    if args and args[0] == 'make-source':
+        parser = argparse.ArgumentParser(prog='synthetic_ffmpeg.py make-source')
+        parser.add_argument('path')
+        parser.add_argument('--duration', type=float, required=True)
+        parser.add_argument('--width', type=int, default=1920)
+        parser.add_argument('--height', type=int, default=1080)
+        parser.add_argument('--kbps', type=int, default=200)
+        options = parser.parse_args(args[1:])
+        make_source(options.path, options.duration, options.width, options.height, options.kbps)
+        return 0
+    # ffprobe calls always ask for JSON output
+    return ffprobe(args) if '-print_format' in args else ffmpeg(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
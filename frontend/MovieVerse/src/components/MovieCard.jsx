@@ -7,6 +7,9 @@ import { toast } from "sonner";
 import { cn } from "@/lib/utils";
 import { useMyList } from "@/context/MyListContext";
 
+// Cards are a fixed 220px wide (see className below)
+const CARD_SIZES = "220px";
+
 export function MovieCard({ movie, layout = "vertical", allowRemove = false, onRemove, forceUpdateKey }) {
 
   const { isAuthenticated, openAuthModal } = useAuth();
@@ -33,11 +36,24 @@ export function MovieCard({ movie, layout = "vertical", allowRemove = false, onR
       )}
       onClick={() => navigate(`/watch/${movie.id}`)}
     >
-      <img
-        src={movie.thumbnailUrl}
-        alt={movie.title}
-        className="w-full h-full object-cover group-hover:brightness-75"
-      />
+      {/* Sized AVIF/WebP derivatives when available; the browser picks the first format it supports */}
+      <picture>
+        {movie.thumbnailSrcSet?.avif && (
+          <source type="image/avif" srcSet={movie.thumbnailSrcSet.avif} sizes={CARD_SIZES} />
+        )}
+        {movie.thumbnailSrcSet?.webp && (
+          <source type="image/webp" srcSet={movie.thumbnailSrcSet.webp} sizes={CARD_SIZES} />
+        )}
+        <img
+          src={movie.thumbnailUrl}
+          srcSet={movie.thumbnailSrcSet?.jpeg}
+          sizes={CARD_SIZES}
+          alt={movie.title}
+          loading="lazy"
+          decoding="async"
+          className="w-full h-full object-cover group-hover:brightness-75"
+        />
+      </picture>
 
       {/* Hover UI */}
       <div className="absolute inset-0 bg-gradient-to-t from-black via-black/50 to-transparent opacity-0 group-hover:opacity-100 transition p-4 flex flex-col justify-end">
@@ -2,14 +2,13 @@ import React, { useEffect, useState, useRef } from "react";
 import { MovieCard } from "@/components/MovieCard";
 import { ArrowLeft, ArrowRight } from "lucide-react";
 import { useNavigate } from "react-router-dom";
+import { fetchVideoPage } from "@/lib/videos";
 
 export default function VideoGallery() {
   const [videos, setVideos] = useState([]);
   const [loading, setLoading] = useState(true);
   const navigate = useNavigate();
 
-  const API_URL = import.meta.env.VITE_API_GET_VIDEOS;
-
   const rowRefs = useRef([]); // for horizontal scroll per section
 
   useEffect(() => {
@@ -18,10 +17,10 @@ export default function VideoGallery() {
 
   const fetchVideos = async () => {
     try {
-      const response = await fetch(API_URL);
-      const data = await response.json();
-      console.log("VIDEOS FROM API:", data);
-      setVideos(data);
+      // Full catalog snapshot (newest first), revalidated with its ETag
+      const { items } = await fetchVideoPage();
+      console.log("VIDEOS FROM API:", items);
+      setVideos(items);
     } catch (error) {
       console.error("Error fetching videos:", error);
     }
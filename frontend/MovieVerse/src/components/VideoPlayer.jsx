@@ -1,8 +1,58 @@
-import React, { useEffect, useRef } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import Hls from "hls.js";
 
-export default function VideoPlayer({ videoUrl }) {
+// Parse "HH:MM:SS.mmm" (or "MM:SS.mmm") WebVTT timestamps into seconds
+function parseVttTime(value) {
+  return value
+    .trim()
+    .split(":")
+    .reduce((total, part) => total * 60 + parseFloat(part), 0);
+}
+
+// Parse the thumbnails.vtt track into [{ start, end, url, x, y, w, h }]
+function parseThumbnailTrack(text, trackUrl) {
+  const cues = [];
+
+  for (const block of text.split(/\n\s*\n/)) {
+    const lines = block.trim().split("\n");
+    const timing = lines.find((line) => line.includes("-->"));
+    const target = lines[lines.indexOf(timing) + 1];
+    if (!timing || !target) continue;
+
+    const [start, end] = timing.split("-->").map(parseVttTime);
+    const [image, hash] = target.split("#xywh=");
+    const [x, y, w, h] = (hash || "0,0,0,0").split(",").map(Number);
+
+    cues.push({ start, end, url: new URL(image, trackUrl).href, x, y, w, h });
+  }
+
+  return cues;
+}
+
+export default function VideoPlayer({ videoUrl, thumbnailsUrl }) {
   const videoRef = useRef(null);
+  const [thumbnails, setThumbnails] = useState([]);
+  const [duration, setDuration] = useState(0);
+  const [progress, setProgress] = useState(0);
+  const [preview, setPreview] = useState(null);
+
+  // Load the sprite-sheet track once; seek previews come from it, not from video segments
+  useEffect(() => {
+    if (!thumbnailsUrl) return;
+
+    let cancelled = false;
+
+    fetch(thumbnailsUrl)
+      .then((res) => (res.ok ? res.text() : ""))
+      .then((text) => {
+        if (!cancelled && text) setThumbnails(parseThumbnailTrack(text, thumbnailsUrl));
+      })
+      .catch((err) => console.warn("Thumbnail track unavailable:", err));
+
+    return () => {
+      cancelled = true;
+    };
+  }, [thumbnailsUrl]);
 
   useEffect(() => {
     const video = videoRef.current;
@@ -95,16 +145,69 @@ export default function VideoPlayer({ videoUrl }) {
     };
   }, [videoUrl]);
 
+  const positionToTime = (e) => {
+    const rect = e.currentTarget.getBoundingClientRect();
+    const ratio = Math.min(Math.max((e.clientX - rect.left) / rect.width, 0), 1);
+    return { time: ratio * duration, left: ratio * rect.width };
+  };
+
+  const handleScrubHover = (e) => {
+    if (!duration) return;
+
+    const { time, left } = positionToTime(e);
+    const cue = thumbnails.find((c) => time >= c.start && time < c.end);
+    setPreview({ time, left, cue });
+  };
+
+  const handleScrubClick = (e) => {
+    if (!duration) return;
+    videoRef.current.currentTime = positionToTime(e).time;
+  };
+
   return (
-    <div className="w-full h-full bg-black">
+    <div className="w-full h-full bg-black flex flex-col">
       <video
         ref={videoRef}
         controls
         autoPlay
         muted={false}
         crossOrigin="anonymous" 
-        className="w-full h-full object-contain bg-black"
+        className="w-full flex-1 min-h-0 object-contain bg-black"
+        onLoadedMetadata={(e) => setDuration(e.currentTarget.duration)}
+        onTimeUpdate={(e) => setProgress(e.currentTarget.currentTime)}
       />
+
+      {/* Seek preview strip (thumbnails from sprite sheets, no segment downloads) */}
+      {thumbnails.length > 0 && duration > 0 && (
+        <div
+          className="relative h-2 bg-white/20 cursor-pointer"
+          onMouseMove={handleScrubHover}
+          onMouseLeave={() => setPreview(null)}
+          onClick={handleScrubClick}
+        >
+          <div
+            className="h-full bg-primary"
+            style={{ width: `${(progress / duration) * 100}%` }}
+          />
+
+          {preview?.cue && (
+            <div
+              className="absolute bottom-4 -translate-x-1/2 border border-white/20 rounded overflow-hidden pointer-events-none"
+              style={{
+                left: preview.left,
+                width: preview.cue.w,
+                height: preview.cue.h,
+                backgroundImage: `url(${preview.cue.url})`,
+                backgroundPosition: `-${preview.cue.x}px -${preview.cue.y}px`,
+              }}
+            >
+              <span className="absolute bottom-0 right-1 text-xs text-white">
+                {new Date(preview.time * 1000).toISOString().substring(11, 19)}
+              </span>
+            </div>
+          )}
+        </div>
+      )}
     </div>
   );
 }
\ No newline at end of file
@@ -0,0 +1,170 @@
+// Parallel, resumable multipart upload against upload_service's session actions
+// (create -> parts -> status -> complete). Sessions are remembered in localStorage,
+// so re-selecting the same file after a failure or reload only uploads the missing parts.
+// Each part is sent with its SHA-256 (when WebCrypto is available): S3 verifies it, and the
+// resulting object checksum lets the pipeline recognise re-uploads of the same master.
+
+const SESSION_PREFIX = "multipart-upload:";
+const CONCURRENCY = 4;
+const MAX_PART_ATTEMPTS = 4;
+
+const sessionKey = (file) => `${SESSION_PREFIX}${file.name}:${file.size}:${file.lastModified}`;
+
+const callUploadApi = async (endpoint, payload) => {
+  const res = await fetch(endpoint, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(payload),
+  });
+  const data = await res.json().catch(() => ({}));
+  if (!res.ok) {
+    const error = new Error(data.error || `Upload API request failed: ${res.status}`);
+    error.status = res.status;
+    throw error;
+  }
+  return data;
+};
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+const canHash = () => Boolean(globalThis.crypto?.subtle);
+
+// Base64 SHA-256 of a blob (the x-amz-checksum-sha256 format)
+const sha256Base64 = async (blob) => {
+  const digest = await crypto.subtle.digest("SHA-256", await blob.arrayBuffer());
+  let binary = "";
+  for (const byte of new Uint8Array(digest)) binary += String.fromCharCode(byte);
+  return btoa(binary);
+};
+
+// Resume a stored session if S3 still knows it, otherwise start a new one
+const openSession = async (endpoint, file, metadata) => {
+  const stored = JSON.parse(localStorage.getItem(sessionKey(file)) || "null");
+
+  if (stored) {
+    try {
+      const { parts } = await callUploadApi(endpoint, {
+        action: "status",
+        uploadId: stored.uploadId,
+        key: stored.key,
+      });
+      return { ...stored, done: new Set(parts.map((p) => p.PartNumber)), partUrls: {} };
+    } catch (error) {
+      // Aborted or expired upload: start over
+      localStorage.removeItem(sessionKey(file));
+    }
+  }
+
+  const created = await callUploadApi(endpoint, {
+    action: "create",
+    ...metadata,
+    fileSize: file.size,
+    contentType: file.type,
+    checksumAlgorithm: canHash() ? "SHA256" : undefined,
+  });
+  const session = {
+    uploadId: created.uploadId,
+    key: created.key,
+    partSize: created.partSize,
+    partCount: created.partCount,
+    checksumAlgorithm: created.checksumAlgorithm,
+    fileId: created.fileId,
+  };
+  localStorage.setItem(sessionKey(file), JSON.stringify(session));
+  return {
+    ...session,
+    done: new Set(),
+    partUrls: created.partUrls,
+    thumbnailUploadURL: created.thumbnailUploadURL,
+  };
+};
+
+// Upload a file in parallel parts. onProgress receives a 0..1 fraction.
+// The thumbnail (optional) is uploaded when the session is created; a resumed session already has it.
+// Resolves to { fileId, key }.
+export const uploadMultipart = async (endpoint, file, metadata, { thumbnail, onProgress } = {}) => {
+  const session = await openSession(endpoint, file, metadata);
+  const { uploadId, key, partSize, partCount, checksumAlgorithm, done } = session;
+  let urls = session.partUrls;
+
+  if (thumbnail && session.thumbnailUploadURL) {
+    const res = await fetch(session.thumbnailUploadURL, { method: "PUT", body: thumbnail });
+    if (!res.ok) throw new Error("Thumbnail upload failed");
+  }
+
+  const pending = [];
+  for (let n = 1; n <= partCount; n++) if (!done.has(n)) pending.push(n);
+
+  let uploadedBytes = [...done].reduce(
+    (sum, n) => sum + Math.min(partSize, file.size - (n - 1) * partSize),
+    0
+  );
+  onProgress?.(uploadedBytes / file.size);
+
+  // URLs are handed out in batches; fetch the next batch when one is missing.
+  // Checksummed parts get their own URL, signed with the part's hash.
+  let urlRequest = null;
+  const getUrl = async (partNumber, refresh = false, checksum = null) => {
+    if (checksum) {
+      const { partUrls } = await callUploadApi(endpoint, {
+        action: "parts",
+        uploadId,
+        key,
+        partNumbers: [partNumber],
+        checksums: { [partNumber]: checksum },
+      });
+      return partUrls[partNumber];
+    }
+
+    if (refresh) delete urls[partNumber];
+    while (!urls[partNumber]) {
+      if (!urlRequest) {
+        const wanted = pending.filter((n) => n >= partNumber && !done.has(n)).slice(0, 100);
+        urlRequest = callUploadApi(endpoint, { action: "parts", uploadId, key, partNumbers: wanted })
+          .then(({ partUrls }) => {
+            urls = { ...urls, ...partUrls };
+          })
+          .finally(() => {
+            urlRequest = null;
+          });
+      }
+      await urlRequest;
+    }
+    return urls[partNumber];
+  };
+
+  const uploadPart = async (partNumber) => {
+    const start = (partNumber - 1) * partSize;
+    const blob = file.slice(start, Math.min(start + partSize, file.size));
+    const checksum = checksumAlgorithm ? await sha256Base64(blob) : null;
+    const headers = checksum ? { "x-amz-checksum-sha256": checksum } : {};
+
+    for (let attempt = 1; ; attempt++) {
+      try {
+        const url = await getUrl(partNumber, attempt > 1, checksum);
+        const res = await fetch(url, { method: "PUT", body: blob, headers });
+        if (!res.ok) throw new Error(`Part ${partNumber} failed: ${res.status}`);
+        break;
+      } catch (error) {
+        if (attempt >= MAX_PART_ATTEMPTS) throw error;
+        await sleep(500 * 2 ** attempt);
+      }
+    }
+
+    done.add(partNumber);
+    uploadedBytes += blob.size;
+    onProgress?.(uploadedBytes / file.size);
+  };
+
+  // CONCURRENCY workers pull part numbers from the shared queue
+  const queue = [...pending];
+  const worker = async () => {
+    while (queue.length) await uploadPart(queue.shift());
+  };
+  await Promise.all(Array.from({ length: Math.min(CONCURRENCY, queue.length) }, worker));
+
+  await callUploadApi(endpoint, { action: "complete", uploadId, key, partCount });
+  localStorage.removeItem(sessionKey(file));
+
+  return { fileId: session.fileId, key };
+};
@@ -4,3 +4,102 @@ export const getVideos = async () => {
   const res = await api.get("/videos");
   return res.data;
 };
+
+// Catalog listing (contentListing_service) — READY videos, paginated with limit/cursor
+const CATALOG_API = import.meta.env.VITE_API_GET_VIDEOS;
+
+// Fetch one page: resolves to { items, nextCursor } (nextCursor is null on the last page)
+export const fetchVideoPage = async ({ limit, cursor } = {}) => {
+  const params = new URLSearchParams();
+  if (limit) params.set("limit", limit);
+  if (cursor) params.set("cursor", cursor);
+
+  const query = params.toString();
+  const res = await fetch(query ? `${CATALOG_API}?${query}` : CATALOG_API);
+  if (!res.ok) throw new Error(`Catalog request failed: ${res.status}`);
+
+  return res.json();
+};
+
+// Follow nextCursor until the whole catalog is loaded
+export const fetchAllVideos = async (options = {}) => {
+  const videos = [];
+  let cursor = null;
+
+  do {
+    const page = await fetchVideoPage({ ...options, cursor });
+    videos.push(...page.items);
+    cursor = page.nextCursor;
+  } while (cursor);
+
+  return videos;
+};
+
+// Admin listing (contentListing_service admin_handler, behind an authorizer) — any status, for the Manage page
+const ADMIN_API = import.meta.env.VITE_API_ADMIN_VIDEOS;
+
+export const VIDEO_STATUSES = [
+  "READY",
+  "PROCESSING",
+  "SKIPPED",
+  "FAILED_DOWNLOAD",
+  "FAILED_TRANSCODE",
+  "FAILED_UPLOAD",
+  "FAILED_FINALIZER_SIGNAL",
+  "FAILED_INIT_OR_UNKNOWN",
+  "FAILED_STUCK",
+];
+
+export const fetchAdminVideoPage = async ({ status, limit, cursor }) => {
+  const params = new URLSearchParams({ status });
+  if (limit) params.set("limit", limit);
+  if (cursor) params.set("cursor", cursor);
+
+  const token = localStorage.getItem("token");
+  const res = await fetch(`${ADMIN_API}?${params.toString()}`, {
+    headers: token ? { Authorization: `Bearer ${token}` } : {},
+  });
+  if (!res.ok) throw new Error(`Admin listing request failed: ${res.status}`);
+
+  return res.json();
+};
+
+// Every video in every status (newest first within each status)
+export const fetchAllAdminVideos = async () => {
+  const pages = await Promise.all(
+    VIDEO_STATUSES.map(async (status) => {
+      const videos = [];
+      let cursor = null;
+      do {
+        const page = await fetchAdminVideoPage({ status, cursor });
+        videos.push(...page.items);
+        cursor = page.nextCursor;
+      } while (cursor);
+      return videos;
+    })
+  );
+
+  return pages.flat();
+};
+
+// Ranked full-text search over the catalog: resolves to { items } (each item carries a score)
+const SEARCH_API = import.meta.env.VITE_API_SEARCH_VIDEOS;
+
+export const searchVideos = async (q, { limit, signal } = {}) => {
+  const params = new URLSearchParams({ q });
+  if (limit) params.set("limit", limit);
+
+  const res = await fetch(`${SEARCH_API}?${params.toString()}`, { signal });
+  if (!res.ok) throw new Error(`Search request failed: ${res.status}`);
+
+  return res.json();
+};
+
+// Fetch a single video by id (resolves to null if it does not exist)
+export const fetchVideoById = async (id) => {
+  const res = await fetch(`${CATALOG_API}?id=${encodeURIComponent(id)}`);
+  if (res.status === 404) return null;
+  if (!res.ok) throw new Error(`Video request failed: ${res.status}`);
+
+  return res.json();
+};
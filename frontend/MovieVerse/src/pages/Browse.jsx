@@ -5,45 +5,63 @@ import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { Search, SlidersHorizontal } from 'lucide-react';
 import { useNavigate } from "react-router-dom";
+import { fetchVideoPage, searchVideos } from '@/lib/videos';
+
+const SEARCH_DEBOUNCE_MS = 250;
 
 export default function Browse() {
   const [videos, setVideos] = useState([]);
   const [filtered, setFiltered] = useState([]);
   const [searchQuery, setSearchQuery] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const navigate = useNavigate();
 
-  const API_URL = "https://rhcfyb5drj.execute-api.eu-north-1.amazonaws.com/dev/getVideoData";
-
   // Fetch Videos
   useEffect(() => {
     fetchVideos();
   }, []);
 
-  const fetchVideos = async () => {
+  // Without a cursor this loads the cached catalog snapshot; a nextCursor appends further pages
+  const fetchVideos = async (cursor = null) => {
+    setLoadingMore(true);
     try {
-      const token = localStorage.getItem("token");
-
-      const response = await fetch(API_URL, {
-        headers: { Authorization: `Bearer ${token}` }
-      });
+      const { items, nextCursor } = await fetchVideoPage({ cursor });
+      console.log("BROWSE VIDEOS:", items);
 
-      const data = await response.json();
-      console.log("BROWSE VIDEOS:", data);
-
-      setVideos(data);
-      setFiltered(data); // Default view
+      setVideos((prev) => (cursor ? [...prev, ...items] : items));
+      setNextCursor(nextCursor);
     } catch (error) {
       console.error("Browse page API error:", error);
     }
+    setLoadingMore(false);
   };
 
-  // Search Filter
+  // Search: ranked server-side search (debounced); the loaded catalog is shown while the box is empty
   useEffect(() => {
-    const results = videos.filter((video) =>
-      video.title?.toLowerCase().includes(searchQuery.toLowerCase())
-    );
+    const query = searchQuery.trim();
+    if (!query) {
+      setFiltered(videos);
+      return;
+    }
 
-    setFiltered(results);
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      try {
+        const { items } = await searchVideos(query, { signal: controller.signal });
+        setFiltered(items);
+      } catch (error) {
+        if (error.name === "AbortError") return;
+        console.error("Search API error:", error);
+        // Fall back to filtering what is already loaded
+        setFiltered(videos.filter((video) => video.title?.toLowerCase().includes(query.toLowerCase())));
+      }
+    }, SEARCH_DEBOUNCE_MS);
+
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
   }, [searchQuery, videos]);
 
   return (
@@ -80,6 +98,19 @@ export default function Browse() {
           ))}
         </div>
 
+        {nextCursor && !searchQuery.trim() && (
+          <div className="text-center mt-10">
+            <Button
+              variant="outline"
+              className="border-white/10 bg-white/5 hover:bg-white/10"
+              disabled={loadingMore}
+              onClick={() => fetchVideos(nextCursor)}
+            >
+              {loadingMore ? "Loading..." : "Load more"}
+            </Button>
+          </div>
+        )}
+
         {filtered.length === 0 && (
           <div className="text-center py-20 text-muted-foreground">
             No movies found matching your criteria.
@@ -5,9 +5,7 @@ import VideoPlayer from "@/components/VideoPlayer";
 import { Button } from "@/components/ui/button";
 import { Share2, Plus, ArrowLeft } from "lucide-react";
 import { useAuth } from "@/context/AuthContext";
-
-// ✅ API for fetching video metadata (unchanged)
-const VIDEO_DATA_API = import.meta.env.VITE_API_GET_VIDEOS;
+import { fetchVideoById } from "@/lib/videos";
 
 // ✅ CloudFront distribution (public HLS)
 const CLOUDFRONT_DOMAIN = import.meta.env.VITE_CLOUDFRONT_DOMAIN;
@@ -25,17 +23,7 @@ export default function Watch() {
     console.log("STEP: Fetching video metadata…");
 
     try {
-      const res = await fetch(VIDEO_DATA_API);
-      if (!res.ok) {
-        console.error("❌ Failed to fetch video data:", res.status, res.statusText);
-        setLoading(false);
-        return;
-      }
-
-      const allVideos = await res.json();
-      console.log("All videos from API:", allVideos);
-
-      const movie = allVideos.find((v) => v.id.toString() === id);
+      const movie = await fetchVideoById(id);
 
       if (!movie) {
         console.error("❌ No video found with ID:", id);
@@ -81,7 +69,10 @@ export default function Watch() {
   }
 
   // ✅ Construct streaming URL (directly from CDN)
-  const streamUrl = `${CLOUDFRONT_DOMAIN}/processed/${video.id}/master.m3u8`;
+  // Deduplicated uploads share the renditions of their source video (playbackId)
+  const playbackId = video.playbackId || video.id;
+  const streamUrl = `${CLOUDFRONT_DOMAIN}/processed/${playbackId}/master.m3u8`;
+  const thumbnailsUrl = `${CLOUDFRONT_DOMAIN}/processed/${playbackId}/thumbnails.vtt`;
 
   console.log("Final HLS URL:", streamUrl);
 
@@ -99,7 +90,7 @@ export default function Watch() {
 
       {/* VIDEO PLAYER */}
       <div className="w-full h-[70vh] bg-black mt-20">
-        <VideoPlayer videoUrl={streamUrl} />
+        <VideoPlayer videoUrl={streamUrl} thumbnailsUrl={thumbnailsUrl} />
       </div>
 
       {/* DETAILS SECTION */}
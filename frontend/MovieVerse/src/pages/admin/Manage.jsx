@@ -19,15 +19,13 @@ import {
 import { Input } from "@/components/ui/input";
 import { MoreHorizontal, Pencil, Trash2, Eye, Search } from 'lucide-react';
 import { toast } from 'sonner';
+import { fetchAllAdminVideos } from '@/lib/videos';
 
 export default function Manage() {
   const [searchTerm, setSearchTerm] = useState('');
   const [videos, setVideos] = useState([]);
   const [loading, setLoading] = useState(true);
 
-  const API_URL =
-    "https://rhcfyb5drj.execute-api.eu-north-1.amazonaws.com/dev/getVideoData";
-
   // -------------------------------
   // Fetch Videos from DynamoDB
   // -------------------------------
@@ -37,8 +35,7 @@ export default function Manage() {
 
   const fetchVideos = async () => {
     try {
-      const res = await fetch(API_URL);
-      const data = await res.json();
+      const data = await fetchAllAdminVideos();
       setVideos(data);
     } catch (err) {
       console.error("Error fetching videos:", err);
@@ -58,7 +55,7 @@ export default function Manage() {
   // Search Filter
   // -------------------------------
   const filtered = videos.filter((v) =>
-    v.title.toLowerCase().includes(searchTerm.toLowerCase())
+    (v.title || '').toLowerCase().includes(searchTerm.toLowerCase())
   );
 
   return (
@@ -139,9 +136,15 @@ export default function Manage() {
                     <TableCell>
                       <Badge
                         variant="outline"
-                        className="bg-green-500/10 text-green-400 border-green-500/20"
+                        className={
+                          video.status === 'READY'
+                            ? "bg-green-500/10 text-green-400 border-green-500/20"
+                            : video.status?.startsWith('FAILED')
+                              ? "bg-red-500/10 text-red-400 border-red-500/20"
+                              : "bg-yellow-500/10 text-yellow-400 border-yellow-500/20"
+                        }
                       >
-                        Active
+                        {video.status === 'READY' ? 'Active' : video.status}
                       </Badge>
                     </TableCell>
 
@@ -9,6 +9,10 @@ import { UploadCloud, FileVideo, Image as ImageIcon, User } from 'lucide-react';
 import { useAuth } from '@/context/AuthContext';
 import { toast } from 'sonner';
 import { useNavigate } from 'react-router-dom';
+import { uploadMultipart } from '@/lib/multipartUpload';
+
+// Sources above this size go through a parallel, resumable multipart session
+const MULTIPART_THRESHOLD = 64 * 1024 * 1024;
 
 export default function Upload() {
   const { user } = useAuth();
@@ -20,6 +24,7 @@ export default function Upload() {
 
   const [thumbFile, setThumbFile] = useState(null);
   const [videoFile, setVideoFile] = useState(null);
+  const [progress, setProgress] = useState(null);
 
   // API Gateway URL (presigned URL generator)
   const API_ENDPOINT = "https://uc8f0ln1y7.execute-api.eu-north-1.amazonaws.com/dev/upload";
@@ -50,6 +55,19 @@ export default function Upload() {
         owner
       };
 
+      // Large sources: multipart session (metadata, thumbnail and parts in one flow)
+      if (videoFile.size > MULTIPART_THRESHOLD) {
+        setProgress(0);
+        await uploadMultipart(API_ENDPOINT, videoFile, metadataPayload, {
+          thumbnail: thumbFile,
+          onProgress: setProgress,
+        });
+
+        toast.success("Upload successful!");
+        navigate("/admin/manage");
+        return;
+      }
+
       const res = await fetch(API_ENDPOINT, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
@@ -67,19 +85,8 @@ export default function Upload() {
       const { videoUploadURL, thumbnailUploadURL } = await res.json();
 
       // -------------------------------------------------------
-      // STEP 2: UPLOAD VIDEO TO S3 USING PRESIGNED URL
-      // -------------------------------------------------------
-      const uploadVideo = await fetch(videoUploadURL, {
-        method: "PUT",
-        body: videoFile,
-      });
-
-      if (!uploadVideo.ok) {
-        throw new Error("Video upload to S3 failed");
-      }
-
-      // -------------------------------------------------------
-      // STEP 3: UPLOAD THUMBNAIL IF EXISTS
+      // STEP 2: UPLOAD THUMBNAIL IF EXISTS
+      // (before the video: the video upload triggers the thumbnail derivatives)
       // -------------------------------------------------------
       if (thumbFile && thumbnailUploadURL) {
         const uploadThumb = await fetch(thumbnailUploadURL, {
@@ -92,6 +99,18 @@ export default function Upload() {
         }
       }
 
+      // -------------------------------------------------------
+      // STEP 3: UPLOAD VIDEO TO S3 USING PRESIGNED URL
+      // -------------------------------------------------------
+      const uploadVideo = await fetch(videoUploadURL, {
+        method: "PUT",
+        body: videoFile,
+      });
+
+      if (!uploadVideo.ok) {
+        throw new Error("Video upload to S3 failed");
+      }
+
       toast.success("Upload successful!");
       navigate("/admin/manage");
 
@@ -101,6 +120,7 @@ export default function Upload() {
     }
 
     setIsLoading(false);
+    setProgress(null);
   };
 
   return (
@@ -228,7 +248,11 @@ export default function Upload() {
                 className="w-full h-12 text-lg"
                 disabled={isLoading}
               >
-                {isLoading ? "Uploading..." : "Publish Content"}
+                {isLoading
+                  ? progress !== null
+                    ? `Uploading... ${Math.round(progress * 100)}%`
+                    : "Uploading..."
+                  : "Publish Content"}
               </Button>
             </form>
           </CardContent>
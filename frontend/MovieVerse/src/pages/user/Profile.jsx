@@ -5,26 +5,22 @@ import { Navbar } from "@/components/Navbar";
 import { MovieCard } from "@/components/MovieCard";
 import { useMyList } from "@/context/MyListContext";   // ⭐ use global MyList
 import { useAuth } from "@/context/AuthContext";
+import { fetchVideoById } from "@/lib/videos";
 
 export default function Profile() {
   const { myList, removeFromList } = useMyList();   // ⭐ global synced list
   const { user } = useAuth();
   const [myListMovies, setMyListMovies] = useState([]);
 
-  const API_URL =
-    "https://rhcfyb5drj.execute-api.eu-north-1.amazonaws.com/dev/getVideoData";
-
   useEffect(() => {
     loadMyList();
   }, [myList]);  // ⭐ reload whenever list updates
 
   const loadMyList = async () => {
     try {
-      const res = await fetch(API_URL);
-      const allVideos = await res.json();
-
-      const filtered = allVideos.filter((v) => myList.includes(v.id));
-      setMyListMovies(filtered);
+      // Fetch only the saved titles instead of the whole catalog
+      const videos = await Promise.all(myList.map((id) => fetchVideoById(id)));
+      setMyListMovies(videos.filter(Boolean));
     } catch (err) {
       console.error("Failed to load videos:", err);
     }
@@ -0,0 +1,112 @@
+"""
+Backfill of CreatedAt on video items written before content_metadata_service stamped it.
+
+Status-CreatedAt-index only holds items that have CreatedAt, so an item without it is missing from
+the Browse/Manage listings (contentListing_service) and from the stuck-video sweeps (sweeper_service).
+This scans the table in parallel segments and sets CreatedAt on every such item: the LastModified
+time of its raw upload (RawS3Bucket/RawS3Key), or --default-created-at when that object is gone.
+Writes are conditional on CreatedAt still being absent, so reruns and concurrent uploads are safe.
+
+It is a one-time cutover migration (a full table scan), not part of every deploy: run the deploy workflow
+by hand with backfill_created_at ticked (it backfills before deploying the index-backed services), or:
+
+    python ops/backfill_created_at.py --table VideoMetadata --dry-run
+    python ops/backfill_created_at.py --table VideoMetadata --segments 8
+"""
+import os
+import argparse
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+
+# --- Configuration ---
+TABLE_NAME = os.environ.get('VIDEO_METADATA_TABLE_NAME')
+REGION = os.environ.get('AWS_REGION')
+DEFAULT_SEGMENTS = 8
+# Sorts after every real upload in the newest-first listings
+DEFAULT_CREATED_AT = '2000-01-01T00:00:00+00:00'
+
+
+def make_clients(region, endpoint_url, segments):
+    """DynamoDB and S3 clients shared by the segment threads (clients are thread-safe, sessions are not)."""
+    config = Config(max_pool_connections=segments, retries={'max_attempts': 10, 'mode': 'adaptive'})
+    session = boto3.session.Session()
+    return (session.client('dynamodb', region_name=region, endpoint_url=endpoint_url, config=config),
+            session.client('s3', region_name=region, config=config))
+
+def upload_time(s3, item, default):
+    """ISO-8601 LastModified of the item's raw upload, or default."""
+    bucket = item.get('RawS3Bucket', {}).get('S')
+    key = item.get('RawS3Key', {}).get('S')
+    if bucket and key:
+        try:
+            return s3.head_object(Bucket=bucket, Key=key)['LastModified'].astimezone(timezone.utc).isoformat()
+        except Exception:
+            pass
+    return default
+
+def backfill_segment(dynamodb, s3, table, segment, total_segments, default, dry_run, counts, lock):
+    params = {
+        'TableName': table,
+        'Segment': segment,
+        'TotalSegments': total_segments,
+        'FilterExpression': 'attribute_not_exists(CreatedAt)',
+        'ProjectionExpression': 'VideoID, RawS3Bucket, RawS3Key'
+    }
+    while True:
+        response = dynamodb.scan(**params)
+        for item in response.get('Items', []):
+            created_at = upload_time(s3, item, default)
+            outcome = 'would_update' if dry_run else 'updated'
+            if not dry_run:
+                try:
+                    dynamodb.update_item(
+                        TableName=table,
+                        Key={'VideoID': item['VideoID']},
+                        UpdateExpression='SET CreatedAt = :created',
+                        ConditionExpression='attribute_not_exists(CreatedAt)',
+                        ExpressionAttributeValues={':created': {'S': created_at}}
+                    )
+                except dynamodb.exceptions.ConditionalCheckFailedException:
+                    outcome = 'skipped' # Stamped in the meantime
+            with lock:
+                counts[outcome] = counts.get(outcome, 0) + 1
+                if created_at == default:
+                    counts['defaulted'] = counts.get('defaulted', 0) + 1
+        if not response.get('LastEvaluatedKey'):
+            return
+        params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--table', default=TABLE_NAME, required=TABLE_NAME is None)
+    parser.add_argument('--segments', type=int, default=DEFAULT_SEGMENTS, help='Parallel scan segments (threads)')
+    parser.add_argument('--default-created-at', default=DEFAULT_CREATED_AT,
+                        help='CreatedAt for items whose raw upload no longer exists')
+    parser.add_argument('--region', default=REGION)
+    parser.add_argument('--endpoint-url', help='DynamoDB endpoint (DynamoDB Local)')
+    parser.add_argument('--dry-run', action='store_true', help='Count the items without writing')
+    args = parser.parse_args()
+    datetime.fromisoformat(args.default_created_at) # Fail early on a malformed default
+
+    dynamodb, s3 = make_clients(args.region, args.endpoint_url, args.segments)
+    counts = {}
+    lock = threading.Lock()
+    with ThreadPoolExecutor(max_workers=args.segments) as executor:
+        futures = [executor.submit(backfill_segment, dynamodb, s3, args.table, segment, args.segments,
+                                   args.default_created_at, args.dry_run, counts, lock)
+                   for segment in range(args.segments)]
+        for future in futures:
+            future.result()
+
+    print(f"CreatedAt backfill of {args.table}{' (dry run)' if args.dry_run else ''}: "
+          f"{counts.get('would_update' if args.dry_run else 'updated', 0)} item(s), "
+          f"{counts.get('defaulted', 0)} with --default-created-at, {counts.get('skipped', 0)} already stamped.")
+
+
+if __name__ == '__main__':
+    main()
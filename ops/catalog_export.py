@@ -0,0 +1,301 @@
+"""
+Bulk export of the video metadata table for pipeline audits.
+
+Runs a DynamoDB parallel scan (Segment/TotalSegments) across a thread pool. Each segment streams
+its pages into its own part file (JSON lines or CSV, optionally gzipped), and the segments'
+per-status aggregates are merged into summary.json:
+
+    python ops/catalog_export.py --table VideoMetadata --segments 16 --output export/
+    python ops/catalog_export.py --table VideoMetadata --format csv --gzip --output export/
+
+Against DynamoDB Local (or any stand-in that speaks the DynamoDB API):
+
+    python ops/catalog_export.py --endpoint-url http://localhost:8000 --table VideoMetadata seed --count 50000
+    python ops/catalog_export.py --endpoint-url http://localhost:8000 --table VideoMetadata --output export/
+"""
+import os
+import csv
+import sys
+import gzip
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from decimal import Decimal
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.config import Config
+
+# --- Configuration ---
+TABLE_NAME = os.environ.get('VIDEO_METADATA_TABLE_NAME')
+REGION = os.environ.get('AWS_REGION')
+DEFAULT_SEGMENTS = 16
+PAGE_LIMIT = 1000 # Items per Scan call (each call still stops at 1 MB)
+STUCK_AFTER_MINUTES = 60 # PROCESSING items older than this are reported as stuck
+
+# Attributes exported by default (the audit columns). --all-attributes exports whole items.
+EXPORT_FIELDS = ['VideoID', 'Status', 'CreatedAt', 'DurationSec', 'TotalChunks', 'ChunksCompleted',
+                 'CompletedChunks', 'CompletedQualities', 'RawS3Key', 'title', 'owner']
+
+deserializer = TypeDeserializer()
+serializer = TypeSerializer()
+
+
+# --- Helper Functions ---
+
+def make_client_factory(region=None, endpoint_url=None, max_connections=DEFAULT_SEGMENTS):
+    """Returns a function creating one DynamoDB client per worker thread (sessions are not thread-safe)."""
+    config = Config(max_pool_connections=max_connections, retries={'max_attempts': 10, 'mode': 'adaptive'})
+
+    def factory():
+        return boto3.session.Session().client('dynamodb', region_name=region, endpoint_url=endpoint_url, config=config)
+    return factory
+
+def to_plain(value):
+    """Deserialized DynamoDB values -> JSON-friendly values (Decimal -> int/float, sets -> sorted lists)."""
+    if isinstance(value, (set, frozenset)):
+        return sorted(to_plain(v) for v in value)
+    if isinstance(value, list):
+        return [to_plain(v) for v in value]
+    if isinstance(value, dict):
+        return {k: to_plain(v) for k, v in value.items()}
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    return value
+
+def export_row(item):
+    """Flattens one item to an export row: set attributes become counts, everything else stays as is."""
+    row = {k: to_plain(v) for k, v in item.items()}
+    for field in ('CompletedChunks', 'CompletedQualities'):
+        if field in row:
+            row[field] = len(row[field]) if field == 'CompletedChunks' else ','.join(row[field])
+    return row
+
+def parse_timestamp(value):
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def new_stats():
+    return {'items': 0, 'by_status': {}, 'stuck_processing': [], 'incomplete_chunks': 0, 'missing_chunks': 0}
+
+def update_stats(stats, row, stuck_before):
+    """Adds one exported row to a segment's aggregates."""
+    stats['items'] += 1
+    status = row.get('Status', 'UNKNOWN')
+    entry = stats['by_status'].setdefault(status, {'count': 0, 'duration_sec': 0.0})
+    entry['count'] += 1
+    entry['duration_sec'] += float(row.get('DurationSec') or 0)
+
+    total = row.get('TotalChunks')
+    done = row.get('CompletedChunks', row.get('ChunksCompleted', 0)) or 0
+    if total is not None and done < total:
+        stats['incomplete_chunks'] += 1
+        stats['missing_chunks'] += int(total) - int(done)
+
+    if status == 'PROCESSING':
+        created = parse_timestamp(row.get('CreatedAt'))
+        if created is None or created < stuck_before:
+            stats['stuck_processing'].append({
+                'VideoID': row.get('VideoID'),
+                'CreatedAt': row.get('CreatedAt'),
+                'ChunksCompleted': done,
+                'TotalChunks': total
+            })
+
+def merge_stats(segment_stats):
+    """Merges the per-segment aggregates into one summary."""
+    summary = new_stats()
+    for stats in segment_stats:
+        summary['items'] += stats['items']
+        summary['incomplete_chunks'] += stats['incomplete_chunks']
+        summary['missing_chunks'] += stats['missing_chunks']
+        summary['stuck_processing'].extend(stats['stuck_processing'])
+        for status, entry in stats['by_status'].items():
+            merged = summary['by_status'].setdefault(status, {'count': 0, 'duration_sec': 0.0})
+            merged['count'] += entry['count']
+            merged['duration_sec'] += entry['duration_sec']
+    summary['stuck_processing'].sort(key=lambda v: str(v.get('CreatedAt')))
+    return summary
+
+
+class PartWriter:
+    """Streams rows of one segment into a JSON-lines or CSV part file."""
+
+    def __init__(self, path, fmt, columns, compress):
+        self.path = path + ('.gz' if compress else '')
+        self.file = gzip.open(self.path, 'wt', newline='') if compress else open(self.path, 'w', newline='')
+        self.fmt = fmt
+        self.csv = None
+        if fmt == 'csv':
+            self.csv = csv.DictWriter(self.file, fieldnames=columns, extrasaction='ignore')
+            self.csv.writeheader()
+
+    def write(self, row):
+        if self.csv:
+            self.csv.writerow(row)
+        else:
+            self.file.write(json.dumps(row, separators=(',', ':'), default=str))
+            self.file.write('\n')
+
+    def close(self):
+        self.file.close()
+
+
+def scan_segment(client_factory, table_name, segment, total_segments, writer, stuck_before, all_attributes):
+    """Scans one segment page by page, writing rows as they arrive. Returns the segment's aggregates."""
+    client = client_factory()
+    stats = new_stats()
+    params = {'TableName': table_name, 'Segment': segment, 'TotalSegments': total_segments, 'Limit': PAGE_LIMIT}
+    if not all_attributes:
+        # Reserved words (Status, ...) make placeholders mandatory
+        params['ProjectionExpression'] = ', '.join(f"#f{i}" for i in range(len(EXPORT_FIELDS)))
+        params['ExpressionAttributeNames'] = {f"#f{i}": field for i, field in enumerate(EXPORT_FIELDS)}
+
+    while True:
+        response = client.scan(**params)
+        for raw_item in response.get('Items', []):
+            row = export_row({k: deserializer.deserialize(v) for k, v in raw_item.items()})
+            writer.write(row)
+            update_stats(stats, row, stuck_before)
+
+        if 'LastEvaluatedKey' not in response:
+            return stats
+        params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def export_table(table_name, output_dir, client_factory, segments=DEFAULT_SEGMENTS, fmt='jsonl',
+                 compress=False, all_attributes=False, stuck_minutes=STUCK_AFTER_MINUTES):
+    """
+    Exports the whole table with a parallel scan into output_dir (one part file per segment)
+    and writes summary.json. Returns the summary.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.time()
+    stuck_before = datetime.now(timezone.utc) - timedelta(minutes=stuck_minutes)
+    extension = 'csv' if fmt == 'csv' else 'jsonl'
+
+    writers = [PartWriter(os.path.join(output_dir, f"part-{segment:04d}.{extension}"), fmt, EXPORT_FIELDS, compress)
+               for segment in range(segments)]
+    try:
+        with ThreadPoolExecutor(max_workers=segments) as executor:
+            futures = [executor.submit(scan_segment, client_factory, table_name, segment, segments,
+                                       writers[segment], stuck_before, all_attributes)
+                       for segment in range(segments)]
+            segment_stats = [future.result() for future in futures]
+    finally:
+        for writer in writers:
+            writer.close()
+
+    summary = merge_stats(segment_stats)
+    summary.update({
+        'table': table_name,
+        'segments': segments,
+        'elapsed_sec': round(time.time() - started, 3),
+        'exported_at': datetime.now(timezone.utc).isoformat(),
+        'parts': [os.path.basename(writer.path) for writer in writers]
+    })
+    with open(os.path.join(output_dir, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2, default=str)
+    return summary
+
+def seed_table(client, table_name, count, create=True):
+    """
+    Fills a local stand-in table with synthetic video items (for trying the export, not for production).
+    Status mix roughly matches a live pipeline: mostly READY, some PROCESSING and failures.
+    """
+    if create and table_name not in client.list_tables().get('TableNames', []):
+        client.create_table(
+            TableName=table_name,
+            KeySchema=[{'AttributeName': 'VideoID', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'VideoID', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        client.get_waiter('table_exists').wait(TableName=table_name)
+
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+    lock = threading.Lock()
+    written = [0]
+
+    def put_batch(batch):
+        request = {table_name: [{'PutRequest': {'Item': item}} for item in batch]}
+        while request:
+            response = client.batch_write_item(RequestItems=request)
+            request = response.get('UnprocessedItems') or None
+        with lock:
+            written[0] += len(batch)
+
+    batch = []
+    for i in range(count):
+        total = rng.randint(1, 120)
+        status = rng.choices(['READY', 'PROCESSING', 'FAILED_METADATA'], [90, 8, 2])[0]
+        done = total if status == 'READY' else rng.randint(0, total)
+        item = {
+            'VideoID': str(uuid.UUID(int=rng.getrandbits(128))),
+            'Status': status,
+            'CreatedAt': (now - timedelta(minutes=rng.randint(0, 60 * 24 * 30))).isoformat(),
+            'DurationSec': Decimal(str(round(total * 60 - rng.random() * 59, 2))),
+            'TotalChunks': total,
+            'ChunksCompleted': done,
+            'title': f"Synthetic video {i}",
+            'owner': f"owner-{rng.randint(1, 200)}"
+        }
+        batch.append({k: serializer.serialize(v) for k, v in item.items()})
+        if len(batch) == 25:
+            put_batch(batch)
+            batch = []
+    if batch:
+        put_batch(batch)
+    return written[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--table', default=TABLE_NAME, help='Table name (default: $VIDEO_METADATA_TABLE_NAME)')
+    parser.add_argument('--region', default=REGION)
+    parser.add_argument('--endpoint-url', help='DynamoDB endpoint, e.g. http://localhost:8000 for DynamoDB Local')
+    parser.add_argument('--segments', type=int, default=DEFAULT_SEGMENTS, help='Parallel scan segments (= worker threads)')
+    parser.add_argument('--output', default='export', help='Output directory')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl')
+    parser.add_argument('--gzip', action='store_true', help='Gzip the part files')
+    parser.add_argument('--all-attributes', action='store_true', help='Export whole items instead of the audit columns')
+    parser.add_argument('--stuck-minutes', type=int, default=STUCK_AFTER_MINUTES)
+
+    subparsers = parser.add_subparsers(dest='command')
+    seed = subparsers.add_parser('seed', help='Create and fill a table with synthetic items (local testing)')
+    seed.add_argument('--count', type=int, default=10000)
+    args = parser.parse_args()
+
+    if not args.table:
+        parser.error('--table (or VIDEO_METADATA_TABLE_NAME) is required')
+
+    client_factory = make_client_factory(args.region, args.endpoint_url, max_connections=args.segments)
+
+    if args.command == 'seed':
+        started = time.time()
+        written = seed_table(client_factory(), args.table, args.count)
+        print(f"Seeded {written} items into {args.table} in {time.time() - started:.1f}s")
+        return
+
+    summary = export_table(args.table, args.output, client_factory, segments=args.segments, fmt=args.format,
+                           compress=args.gzip, all_attributes=args.all_attributes, stuck_minutes=args.stuck_minutes)
+
+    print(f"Exported {summary['items']} items from {args.table} in {summary['elapsed_sec']}s "
+          f"({args.segments} segments) -> {args.output}")
+    for status, entry in sorted(summary['by_status'].items()):
+        print(f"  {status:<20} {entry['count']:>8}  {entry['duration_sec'] / 3600:>10.1f} h")
+    print(f"  incomplete chunk sets: {summary['incomplete_chunks']} ({summary['missing_chunks']} chunks missing)")
+    print(f"  stuck PROCESSING (> {args.stuck_minutes} min): {len(summary['stuck_processing'])}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,299 @@
+"""
+Pipeline trace report: where each video's time-to-READY went.
+
+Reads the span lines written by backend/common/tracing.py (and the JobWorker's copy of it): one JSON
+object per line with TraceID (= VideoID), Span, Start/End (epoch seconds) and ParentSpanID. Prints:
+  * per-span latency percentiles (and log-scale histograms with --histogram)
+  * the critical path of every READY video: S3 delivery -> metadata -> segmentation queue -> segmentation
+    -> job queue -> transcode of the chunk that finished last -> finalizer queue -> finalizer record/stitch
+  * the full span tree of one video with --trace
+
+Sources are log files (CloudWatch exports, worker stdout, the pipeline benchmark's --trace file; other
+lines are skipped) or CloudWatch log groups:
+
+    python ops/trace_report.py spans.jsonl
+    python ops/trace_report.py --log-group /aws/lambda/ContentMetaDataService --log-group /aws/lambda/SegmentationService \\
+        --log-group /aws/lambda/ManifestFileProcessor --log-group /movieverse/job-worker --since-minutes 120
+    python ops/trace_report.py spans.jsonl --trace 3f0c...-video-id
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from collections import defaultdict
+
+# --- Configuration ---
+REGION = os.environ.get('AWS_REGION')
+STAGE_ORDER = ['metadata', 'segmentation', 'transcode', 'finalize']
+HISTOGRAM_BOUNDS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000, 300000]
+# Critical-path segments in pipeline order. '*' spans are taken from the critical chunk.
+CRITICAL_PATH = ['metadata.queue_wait', 'metadata', 'segmentation.queue_wait', 'segmentation',
+                 'transcode.queue_wait*', 'transcode.chunk*', 'finalize.queue_wait*', 'finalize.record', 'finalize.stitch']
+
+
+# --- Loading ---
+
+def parse_span(line):
+    """The span record on a log line, or None (CloudWatch may prefix lines with a timestamp and request ID)."""
+    start = line.find('{')
+    if start < 0 or '"TraceID"' not in line:
+        return None
+    try:
+        record = json.loads(line[start:])
+    except ValueError:
+        return None
+    if not isinstance(record, dict) or not all(k in record for k in ('TraceID', 'Span', 'Start', 'End')):
+        return None
+    return record
+
+
+def read_files(paths):
+    for path in paths:
+        f = sys.stdin if path == '-' else open(path, encoding='utf-8', errors='replace')
+        try:
+            for line in f:
+                record = parse_span(line)
+                if record:
+                    yield record
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def read_log_groups(log_groups, since_minutes, region=None):
+    """Span lines from CloudWatch Logs (JSON filter pattern, so only span lines are transferred)."""
+    import boto3
+    logs = boto3.client('logs', region_name=region)
+    start_time = int((time.time() - since_minutes * 60) * 1000)
+    for log_group in log_groups:
+        paginator = logs.get_paginator('filter_log_events')
+        for page in paginator.paginate(logGroupName=log_group, startTime=start_time, filterPattern='{ $.TraceID = * }'):
+            for event in page.get('events', []):
+                record = parse_span(event['message'])
+                if record:
+                    yield record
+
+
+def group_traces(records):
+    """TraceID -> spans sorted by start (duplicates from re-read log streams are dropped)."""
+    traces = defaultdict(dict)
+    for record in records:
+        traces[record['TraceID']][record.get('SpanID') or (record['Span'], record['Start'])] = record
+    return {trace_id: sorted(spans.values(), key=lambda s: s['Start']) for trace_id, spans in traces.items()}
+
+
+# --- Statistics ---
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def duration_ms(span):
+    return (span['End'] - span['Start']) * 1000
+
+
+def span_sort_key(name):
+    stage = name.split('.', 1)[0]
+    return (STAGE_ORDER.index(stage) if stage in STAGE_ORDER else len(STAGE_ORDER), name)
+
+
+def span_stats(traces):
+    """Span name -> {count, errors, p50, p90, p95, p99, max} in milliseconds."""
+    durations = defaultdict(list)
+    errors = defaultdict(int)
+    for spans in traces.values():
+        for span in spans:
+            durations[span['Span']].append(duration_ms(span))
+            errors[span['Span']] += bool(span.get('Error'))
+    return {
+        name: {'count': len(values), 'errors': errors[name], 'p50': percentile(values, 50), 'p90': percentile(values, 90),
+               'p95': percentile(values, 95), 'p99': percentile(values, 99), 'max': max(values)}
+        for name, values in sorted(durations.items(), key=lambda item: span_sort_key(item[0]))
+    }
+
+
+def histogram(values):
+    """Counts per HISTOGRAM_BOUNDS_MS bucket (the last bucket is everything above the last bound)."""
+    counts = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+    for value in values:
+        counts[next((i for i, bound in enumerate(HISTOGRAM_BOUNDS_MS) if value <= bound), len(HISTOGRAM_BOUNDS_MS))] += 1
+    return counts
+
+
+def chunk_of(span):
+    return (span.get('Attributes') or {}).get('Chunk')
+
+
+def critical_path(spans):
+    """
+    The critical path of one READY trace: [(segment, span)] in pipeline order plus the total in ms, or None
+    if the video has not been stitched. The critical chunk is the one whose finalizer signal arrived last
+    (or, for untraced signals, the chunk whose transcode ended last).
+    """
+    stitch = next((s for s in reversed(spans) if s['Span'] == 'finalize.stitch'), None)
+    if stitch is None:
+        return None
+
+    signals = [s for s in spans if s['Span'] == 'finalize.queue_wait' and s['End'] <= stitch['Start']]
+    chunks = [s for s in spans if s['Span'] == 'transcode.chunk']
+    critical = (max(signals, key=lambda s: s['End']) if signals else max(chunks, key=lambda s: s['End'], default=None))
+    critical_chunk = chunk_of(critical) if critical else None
+
+    path = []
+    for segment in CRITICAL_PATH:
+        name = segment.rstrip('*')
+        candidates = [s for s in spans if s['Span'] == name and s['Start'] <= stitch['End']]
+        if segment.endswith('*'):
+            candidates = [s for s in candidates if chunk_of(s) == critical_chunk]
+        if segment == 'finalize.record':
+            candidates = [s for s in candidates if s['End'] <= stitch['End']]
+        if candidates:
+            # Retried work leaves several spans: the last attempt is the one on the path
+            path.append((name, max(candidates, key=lambda s: s['Start'])))
+
+    start = min(s['Start'] for _, s in path)
+    return path, (stitch['End'] - start) * 1000, critical_chunk
+
+
+def critical_path_summary(traces):
+    """Per segment: p50/p95 ms and mean share of time-to-READY, over every READY trace."""
+    segments = defaultdict(list)
+    shares = defaultdict(list)
+    totals = {}
+    for trace_id, spans in traces.items():
+        result = critical_path(spans)
+        if not result:
+            continue
+        path, total_ms, _ = result
+        totals[trace_id] = (total_ms, path)
+        accounted = 0.0
+        for name, span in path:
+            segments[name].append(duration_ms(span))
+            shares[name].append(duration_ms(span) / total_ms if total_ms else 0.0)
+            accounted += duration_ms(span)
+        # Hand-offs between spans that no stage measures (Lambda/SQS delivery after SentAt, polling gaps)
+        segments['(untraced)'].append(max(0.0, total_ms - accounted))
+        shares['(untraced)'].append(max(0.0, total_ms - accounted) / total_ms if total_ms else 0.0)
+    summary = {
+        name: {'p50': percentile(values, 50), 'p95': percentile(values, 95), 'mean_share': sum(shares[name]) / len(shares[name])}
+        for name, values in segments.items()
+    }
+    return summary, totals
+
+
+# --- Output ---
+
+def print_span_stats(stats):
+    print(f"{'span':<26} {'count':>6} {'errors':>6} {'p50 ms':>10} {'p90 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for name, s in stats.items():
+        print(f"{name:<26} {s['count']:>6} {s['errors']:>6} {s['p50']:>10.1f} {s['p90']:>10.1f} {s['p95']:>10.1f} "
+              f"{s['p99']:>10.1f} {s['max']:>10.1f}")
+
+
+def print_histograms(traces):
+    durations = defaultdict(list)
+    for spans in traces.values():
+        for span in spans:
+            durations[span['Span']].append(duration_ms(span))
+    labels = [f"<={b / 1000:g}s" if b >= 1000 else f"<={b}ms" for b in HISTOGRAM_BOUNDS_MS] + ['more']
+    print('\nLatency histograms (span count per bucket)')
+    print(f"{'span':<26} " + ' '.join(f"{label:>7}" for label in labels))
+    for name in sorted(durations, key=span_sort_key):
+        print(f"{name:<26} " + ' '.join(f"{count or '.':>7}" for count in histogram(durations[name])))
+
+
+def print_critical_path(summary, totals, slowest):
+    if not totals:
+        print('\nNo READY traces (no finalize.stitch spans) in the input.')
+        return
+    ready = [total for total, _ in totals.values()]
+    print(f"\nCritical path over {len(totals)} READY video(s): time-to-READY p50 {percentile(ready, 50) / 1000:.2f}s, "
+          f"p95 {percentile(ready, 95) / 1000:.2f}s, max {max(ready) / 1000:.2f}s")
+    print(f"{'segment':<26} {'p50 ms':>10} {'p95 ms':>10} {'mean share':>11}")
+    for name in [segment.rstrip('*') for segment in CRITICAL_PATH] + ['(untraced)']:
+        if name in summary:
+            s = summary[name]
+            print(f"{name:<26} {s['p50']:>10.1f} {s['p95']:>10.1f} {s['mean_share']:>11.1%}")
+
+    print(f"\nSlowest {min(slowest, len(totals))} video(s)")
+    print(f"{'video':<38} {'ready s':>8}  largest segment")
+    for trace_id, (total_ms, path) in sorted(totals.items(), key=lambda item: -item[1][0])[:slowest]:
+        name, span = max(path, key=lambda item: duration_ms(item[1]))
+        print(f"{trace_id:<38} {total_ms / 1000:>8.2f}  {name} {duration_ms(span) / 1000:.2f}s")
+
+
+def print_trace(trace_id, spans):
+    """Span tree of one video, times relative to its first span."""
+    if not spans:
+        print(f"No spans for {trace_id}.")
+        return
+    origin = spans[0]['Start']
+    children = defaultdict(list)
+    ids = {s.get('SpanID') for s in spans}
+    for span in spans:
+        children[span.get('ParentSpanID') if span.get('ParentSpanID') in ids else None].append(span)
+
+    print(f"\nTrace {trace_id}")
+    print(f"{'span':<44} {'start s':>9} {'ms':>10}  attributes")
+
+    def walk(parent_id, depth):
+        for span in children.get(parent_id, []):
+            label = ('  ' * depth + span['Span'])[:44]
+            attributes = ' '.join(f"{k}={v}" for k, v in (span.get('Attributes') or {}).items())
+            error = f"  ERROR {span['Error']}" if span.get('Error') else ''
+            print(f"{label:<44} {span['Start'] - origin:>9.3f} {duration_ms(span):>10.1f}  {attributes}{error}")
+            walk(span.get('SpanID'), depth + 1)
+    walk(None, 0)
+
+    result = critical_path(spans)
+    if result:
+        path, total_ms, critical_chunk = result
+        print(f"\nCritical path ({total_ms / 1000:.2f}s to READY, critical chunk {critical_chunk}):")
+        for name, span in path:
+            print(f"  {name:<26} {duration_ms(span):>10.1f} ms  {duration_ms(span) / total_ms:>6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', help="Log files with span lines ('-' for stdin)")
+    parser.add_argument('--log-group', action='append', default=[], help='CloudWatch log group to read (repeatable)')
+    parser.add_argument('--since-minutes', type=int, default=60, help='Look-back window for --log-group')
+    parser.add_argument('--region', default=REGION)
+    parser.add_argument('--trace', help='Print the span tree and critical path of this VideoID')
+    parser.add_argument('--histogram', action='store_true', help='Also print per-span latency histograms')
+    parser.add_argument('--slowest', type=int, default=5, help='Slowest videos to list')
+    parser.add_argument('--json', help='Write span stats and the critical-path summary to this file')
+    args = parser.parse_args()
+
+    if not args.files and not args.log_group:
+        parser.error('give span log files and/or --log-group')
+
+    records = list(read_files(args.files))
+    if args.log_group:
+        records += list(read_log_groups(args.log_group, args.since_minutes, args.region))
+    traces = group_traces(records)
+    print(f"{len(records)} span(s) in {len(traces)} trace(s)\n")
+
+    if args.trace:
+        print_trace(args.trace, traces.get(args.trace, []))
+        return
+
+    stats = span_stats(traces)
+    print_span_stats(stats)
+    if args.histogram:
+        print_histograms(traces)
+    summary, totals = critical_path_summary(traces)
+    print_critical_path(summary, totals, args.slowest)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'spans': stats, 'critical_path': summary,
+                       'time_to_ready_ms': {trace_id: total for trace_id, (total, _) in totals.items()}}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
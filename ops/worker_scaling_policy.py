@@ -0,0 +1,98 @@
+"""
+Target-tracking scaling of the JobWorker Auto Scaling group on predicted queue wait.
+
+The workers publish EstimatedDrainSeconds (MovieVerse/Transcoding, dimension AutoScalingGroupName):
+the seconds the current fleet needs to work off the job queue, from the queue depth and their recent
+chunk times (S3-code/JobWorker.py, set AUTOSCALING_GROUP_NAME on the instances). This puts a
+target-tracking policy on that metric in place of queue-depth alarms. The group then grows when a
+backlog would take longer than --target-seconds to drain and shrinks when it would not.
+
+Only running workers publish the metric, so a group scaled to zero has no data to scale out on (the
+alarm sits in INSUFFICIENT_DATA while the queue grows). The group's MinSize must therefore stay at
+least 1: the script raises a lower MinSize to --min-size (default 1) before applying the policy.
+
+    python ops/worker_scaling_policy.py --asg jobworker-fleet --target-seconds 300
+    python ops/worker_scaling_policy.py --asg jobworker-fleet --target-seconds 300 --dry-run
+"""
+import os
+import json
+import argparse
+
+import boto3
+
+# --- Configuration ---
+REGION = os.environ.get('AWS_REGION')
+METRICS_NAMESPACE = os.environ.get('WORKER_METRICS_NAMESPACE', 'MovieVerse/Transcoding')
+POLICY_NAME = 'jobworker-estimated-drain-time'
+DEFAULT_TARGET_SECONDS = 300
+DEFAULT_WARMUP_SECONDS = 180 # Instance boot + worker start before its chunks count
+DEFAULT_MIN_SIZE = 1 # At least one worker must be up to publish EstimatedDrainSeconds
+
+
+def build_policy(asg_name, target_seconds, warmup_seconds, disable_scale_in=False):
+    """put_scaling_policy arguments for the drain-time target."""
+    return {
+        'AutoScalingGroupName': asg_name,
+        'PolicyName': POLICY_NAME,
+        'PolicyType': 'TargetTrackingScaling',
+        'EstimatedInstanceWarmup': warmup_seconds,
+        'TargetTrackingConfiguration': {
+            'CustomizedMetricSpecification': {
+                'MetricName': 'EstimatedDrainSeconds',
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [{'Name': 'AutoScalingGroupName', 'Value': asg_name}],
+                'Statistic': 'Average', # Every worker publishes the same fleet estimate
+                'Unit': 'Seconds'
+            },
+            'TargetValue': float(target_seconds),
+            'DisableScaleIn': disable_scale_in
+        }
+    }
+
+
+def ensure_min_size(autoscaling, asg_name, min_size, dry_run=False):
+    """Raises the group's MinSize to min_size if it is lower. Returns the MinSize the group ends up with."""
+    groups = autoscaling.describe_auto_scaling_groups(AutoScalingGroupNames=[asg_name])['AutoScalingGroups']
+    if not groups:
+        raise SystemExit(f"Auto Scaling group {asg_name} not found.")
+    current = groups[0]['MinSize']
+    if current >= min_size:
+        return current
+    if dry_run:
+        print(f"Would raise MinSize of {asg_name} from {current} to {min_size}.")
+    else:
+        # DesiredCapacity is raised along with MinSize when it is lower
+        autoscaling.update_auto_scaling_group(AutoScalingGroupName=asg_name, MinSize=min_size)
+        print(f"Raised MinSize of {asg_name} from {current} to {min_size}.")
+    return min_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--asg', required=True, help='JobWorker Auto Scaling group name')
+    parser.add_argument('--target-seconds', type=float, default=DEFAULT_TARGET_SECONDS,
+                        help='Queue drain time the group is scaled to hold')
+    parser.add_argument('--warmup-seconds', type=int, default=DEFAULT_WARMUP_SECONDS)
+    parser.add_argument('--disable-scale-in', action='store_true', help='Only ever add instances')
+    parser.add_argument('--min-size', type=int, default=DEFAULT_MIN_SIZE,
+                        help='Lowest MinSize the group may have (at least 1)')
+    parser.add_argument('--region', default=REGION)
+    parser.add_argument('--dry-run', action='store_true', help='Print the policy instead of applying it')
+    args = parser.parse_args()
+    if args.min_size < 1:
+        parser.error('--min-size must be at least 1 (a group at zero publishes no metric to scale out on)')
+
+    autoscaling = boto3.client('autoscaling', region_name=args.region)
+    ensure_min_size(autoscaling, args.asg, args.min_size, args.dry_run)
+
+    policy = build_policy(args.asg, args.target_seconds, args.warmup_seconds, args.disable_scale_in)
+    if args.dry_run:
+        print(json.dumps(policy, indent=2))
+        return
+
+    response = autoscaling.put_scaling_policy(**policy)
+    print(f"Applied {POLICY_NAME} to {args.asg} (target {args.target_seconds:g}s): {response['PolicyARN']}")
+
+
+if __name__ == '__main__':
+    main()